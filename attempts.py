@@ -0,0 +1,27 @@
+# История попыток теста: строка в results на каждую отправку теста
+# и строка в result_answers на каждый выданный вопрос.
+# course_progress хранит только последний балл, а по этой истории
+# item_analysis.py считает статистику вопросов и вариантов ответов.
+
+import datetime
+
+INSERT_RESULT_QUERY = "INSERT INTO results (user_id, topic_id, score, created_at) VALUES (%s, %s, %s, %s)"
+INSERT_ANSWERS_QUERY = """
+    INSERT INTO result_answers (result_id, question_id, answer_id, is_correct) VALUES (%s, %s, %s, %s)
+"""
+
+
+def record(cursor, user_id, topic_id, score, attempt):
+    """Записывает попытку; attempt — список из quiz.responses().
+
+    Ответы вставляются одним многострочным INSERT. Не коммитит:
+    вызывается в транзакции progress.record_test.
+    """
+    cursor.execute(INSERT_RESULT_QUERY, (user_id, topic_id, score, datetime.datetime.now().replace(microsecond=0)))
+    result_id = cursor.lastrowid
+    if attempt:
+        cursor.executemany(
+            INSERT_ANSWERS_QUERY,
+            [(result_id, q_id, answer_id, correct) for q_id, answer_id, correct in attempt]
+        )
+    return result_id
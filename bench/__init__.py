@@ -0,0 +1,3 @@
+# Нагрузочное тестирование: генератор синтетических данных (bench.seed),
+# сценарии пользователей (bench.journeys) и прогон с отчётом по
+# перцентилям и сравнением с базовой линией (bench.run).
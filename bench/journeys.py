@@ -0,0 +1,185 @@
+# Сценарии пользователей для нагрузочного прогона.
+# Каждый сценарий — последовательность HTTP-запросов; время каждого
+# запроса пишется в Recorder под меткой маршрута.
+
+import http.cookiejar
+import random
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import database
+from bench.seed import ADMIN, USER_PASSWORD
+
+RADIO_RE = re.compile(r'name="question_(\d+)" value="(\d+)"')
+CURSOR_RE = re.compile(r'\bafter=([\w\-=%]+)')
+# Страница фонового отчёта: адрес статуса и готового файла; или редирект на готовый файл
+STATUS_RE = re.compile(r'fetch\("([^"]+)"\)')
+DONE_RE = re.compile(r'window\.location = "([^"]+)"')
+REPORT_HREF_RE = re.compile(r'href="(/admin/reports/[^"]+)"')
+# Пауза между опросами статуса отчёта, сек
+POLL_INTERVAL = 0.5
+# Сколько ждать готовности отчёта, прежде чем считать выгрузку неудачной, сек
+POLL_TIMEOUT = 300
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = []   # (метка, сек, ok); list.append потокобезопасен
+
+    def add(self, label, seconds, ok):
+        self.samples.append((label, seconds, ok))
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """Клиент к запущенному серверу (gunicorn, nginx) по --url."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect)
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace')
+
+
+class InProcessClient:
+    """Клиент через app.test_client(): без сети, меряет приложение и БД."""
+
+    def __init__(self):
+        from app import app
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        # close() — как у WSGI-сервера: потоковые ответы возвращают соединение в пул
+        try:
+            return response.status_code, response.get_data().decode('utf-8', 'replace')
+        finally:
+            response.close()
+
+
+class Session:
+    def __init__(self, client, recorder):
+        self.client = client
+        self.recorder = recorder
+
+    def call(self, label, method, path, data=None):
+        started = time.perf_counter()
+        try:
+            status, text = self.client.request(method, path, data)
+        except Exception:
+            self.recorder.add(label, time.perf_counter() - started, False)
+            return None
+        self.recorder.add(label, time.perf_counter() - started, status < 400)
+        return text
+
+    def get(self, label, path):
+        return self.call(label, 'GET', path)
+
+    def post(self, label, path, data):
+        return self.call(label, 'POST', path, data)
+
+
+class Dataset:
+    """id из БД, по которым ходят сценарии."""
+
+    def __init__(self, sample=2000):
+        with database.connection() as db:
+            cursor = db.cursor()
+            cursor.execute("SELECT email FROM users WHERE email LIKE %s LIMIT %s", ('%@bench.local', sample))
+            self.users = [row['email'] for row in cursor.fetchall()]
+            cursor.execute("SELECT id, topic_id FROM materials")
+            self.materials = {}
+            for row in cursor.fetchall():
+                self.materials.setdefault(row['topic_id'], []).append(row['id'])
+            cursor.execute("SELECT DISTINCT topic_id FROM questions")
+            self.test_topics = [row['topic_id'] for row in cursor.fetchall()]
+            cursor.close()
+        self.topics = sorted(self.materials)
+        if not self.users or not self.topics:
+            raise SystemExit("Нет данных для сценариев: сначала python -m bench.seed")
+
+
+def employee(session, data, rng):
+    """Сотрудник: вход, каталог, материалы темы, материал, тест."""
+    session.post('login', '/login', {'email': rng.choice(data.users), 'password': USER_PASSWORD})
+    session.get('user_courses', '/user/courses')
+
+    topic_id = rng.choice(data.topics)
+    session.get('user_view_materials', f'/user/topic/{topic_id}/materials')
+    session.get('view_course_materials', f'/courses/{topic_id}/materials')
+    session.get('view_material', f'/material/{rng.choice(data.materials[topic_id])}')
+
+    topic_id = rng.choice(data.test_topics or data.topics)
+    page = session.get('user_test', f'/user/test/{topic_id}')
+    if page:
+        questions = {}
+        for question_id, answer_id in RADIO_RE.findall(page):
+            questions.setdefault(question_id, []).append(answer_id)
+        answers = {f'question_{q}': rng.choice(ids) for q, ids in questions.items()}
+        session.post('user_test_submit', f'/user/test/{topic_id}', answers)
+
+
+def admin(session, data, rng, xlsx=False):
+    """Администратор: прогресс, следующая страница, диаграмма, выгрузка."""
+    session.post('login', '/login', {'email': ADMIN[0], 'password': ADMIN[1]})
+    page = session.get('admin_progress', '/admin/progress')
+    match = CURSOR_RE.search(page or '')
+    if match:
+        session.get('admin_progress_next', f'/admin/progress?after={match.group(1)}')
+    session.get('progress_chart', '/admin/progress/chart')
+    download_report(session, 'export_csv', '/admin/progress/export?format=csv')
+    if xlsx:
+        download_report(session, 'export_xlsx', '/admin/progress/export')
+
+
+def download_report(session, label, path):
+    """Выгрузка через фоновое задание: поставить, дождаться, скачать."""
+    page = session.get(label, path)
+    if not page:
+        return
+    status = STATUS_RE.search(page)
+    if status:
+        done = DONE_RE.search(page).group(1)
+        deadline = time.monotonic() + POLL_TIMEOUT
+        while True:
+            state = session.get(f'{label}_status', status.group(1))
+            if not state or '"pending"' not in state:
+                break
+            if time.monotonic() > deadline:
+                session.recorder.add(f'{label}_timeout', POLL_TIMEOUT, False)
+                return
+            time.sleep(POLL_INTERVAL)
+    else:
+        # Файл уже построен — ответ 302 на него
+        match = REPORT_HREF_RE.search(page)
+        if not match:
+            return
+        done = match.group(1)
+    session.get(f'{label}_download', done)
+
+
+JOURNEYS = {'employee': employee, 'admin': admin}
+
+
+def pick(mix, rng):
+    names = list(mix)
+    return rng.choices(names, weights=[mix[n] for n in names])[0]
+
+
+def make_rng(seed, worker):
+    return random.Random(f"{seed}-{worker}")
@@ -0,0 +1,48 @@
+# Имитация удалённой БД для нагрузочных прогонов: каждый запрос и COMMIT
+# ждут заданное время, как сетевой round trip до MySQL-хоста.
+# Включается в воркерах gunicorn через BENCH_DB_LATENCY_MS (gunicorn.conf.py),
+# так профили воркеров можно сравнить и на локальной SQLite.
+#
+# time.sleep под gevent кооперативный, в gthread отпускает GIL —
+# воркеры ведут себя так же, как при ожидании ответа из сокета.
+
+import time
+
+import pymysql
+
+import sqlite_backend
+
+
+def _before(method, seconds):
+    def wrapper(*args, **kwargs):
+        time.sleep(seconds)
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def _sqlite_execute(method, seconds):
+    def wrapper(self, *args, **kwargs):
+        # SQLite блокирует на запись весь файл: задержка внутри транзакции
+        # мерила бы очередь к файлу, а не воркеры, поэтому ждём только вне её
+        if not self._db.in_transaction:
+            time.sleep(seconds)
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _sqlite_commit(method, seconds):
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        time.sleep(seconds)
+        return result
+    return wrapper
+
+
+def install(seconds):
+    connection = pymysql.connections.Connection
+    connection.query = _before(connection.query, seconds)
+    connection.commit = _before(connection.commit, seconds)
+
+    connection = sqlite_backend._Connection
+    connection.raw_execute = _sqlite_execute(connection.raw_execute, seconds)
+    connection.commit = _sqlite_commit(connection.commit, seconds)
@@ -0,0 +1,158 @@
+# Нагрузочный прогон: N потоков гоняют сценарии заданное время и
+# считают p50/p95/p99 и пропускную способность по каждому маршруту.
+#
+#   python -m bench.run --concurrency 20 --duration 60 --save before.json
+#   python -m bench.run --url http://127.0.0.1:8000 --baseline before.json
+#
+# Без --url запросы идут в приложение напрямую через test_client.
+# С --baseline печатается сравнение, и при ухудшении p95 или пропускной
+# способности больше чем на --tolerance процесс завершается с кодом 1.
+
+import argparse
+import functools
+import json
+import math
+import platform
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from bench import journeys
+
+
+def percentile(sorted_values, p):
+    """Перцентиль методом ближайшего ранга."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    by_label = defaultdict(list)
+    errors = defaultdict(int)
+    for label, seconds, ok in samples:
+        by_label[label].append(seconds)
+        if not ok:
+            errors[label] += 1
+
+    routes = {}
+    for label, values in sorted(by_label.items()):
+        values.sort()
+        routes[label] = {
+            'count': len(values),
+            'errors': errors[label],
+            'rps': round(len(values) / elapsed, 2),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+        }
+    total = {
+        'count': len(samples),
+        'errors': sum(errors.values()),
+        'rps': round(len(samples) / elapsed, 2),
+    }
+    return routes, total
+
+
+def print_report(routes, total):
+    print(f"{'маршрут':<24}{'запросов':>10}{'ошибок':>8}{'rps':>9}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}")
+    for label, r in routes.items():
+        print(f"{label:<24}{r['count']:>10}{r['errors']:>8}{r['rps']:>9}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+    print(f"{'всего':<24}{total['count']:>10}{total['errors']:>8}{total['rps']:>9}")
+
+
+def compare(routes, baseline, tolerance):
+    """Печатает изменения относительно базовой линии; возвращает число регрессий."""
+    regressions = 0
+    print(f"\n{'маршрут':<24}{'p95 было':>10}{'стало':>10}{'Δ%':>8}{'rps было':>10}{'стало':>9}{'Δ%':>8}")
+    for label, r in routes.items():
+        base = baseline['routes'].get(label)
+        if not base:
+            continue
+        p95_delta = (r['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100 if base['p95_ms'] else 0.0
+        rps_delta = (r['rps'] - base['rps']) / base['rps'] * 100 if base['rps'] else 0.0
+        worse = p95_delta > tolerance * 100 or rps_delta < -tolerance * 100
+        regressions += worse
+        print(f"{label:<24}{base['p95_ms']:>10}{r['p95_ms']:>10}{p95_delta:>+8.1f}"
+              f"{base['rps']:>10}{r['rps']:>9}{rps_delta:>+8.1f}{'  ← хуже' if worse else ''}")
+    return regressions
+
+
+def run(make_client, mix, concurrency, duration, seed, xlsx):
+    data = journeys.Dataset()
+    recorder = journeys.Recorder()
+    scenarios = dict(journeys.JOURNEYS, admin=functools.partial(journeys.admin, xlsx=xlsx))
+    deadline = time.monotonic() + duration
+
+    def worker(number):
+        rng = journeys.make_rng(seed, number)
+        session = journeys.Session(make_client(), recorder)
+        while time.monotonic() < deadline:
+            scenarios[journeys.pick(mix, rng)](session, data, rng)
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder.samples, time.monotonic() - started
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in journeys.JOURNEYS:
+            raise argparse.ArgumentTypeError(f"неизвестный сценарий {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон сценариев сотрудника и администратора")
+    parser.add_argument('--url', help="адрес запущенного сервера; без него — test_client в этом процессе")
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=30, help="сек")
+    parser.add_argument('--mix', type=parse_mix, default={'employee': 9, 'admin': 1},
+                        help="веса сценариев, например employee=9,admin=1")
+    parser.add_argument('--xlsx', action='store_true', help="добавить XLSX-выгрузку в сценарий администратора")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help="записать результат в JSON")
+    parser.add_argument('--baseline', help="JSON прошлого прогона для сравнения")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="допустимое ухудшение, доля")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        make_client = functools.partial(journeys.HttpClient, args.url)
+    else:
+        make_client = journeys.InProcessClient
+
+    samples, elapsed = run(make_client, args.mix, args.concurrency, args.duration, args.seed, args.xlsx)
+    routes, total = summarize(samples, elapsed)
+    print_report(routes, total)
+
+    if args.save:
+        result = {
+            'meta': {
+                'url': args.url, 'concurrency': args.concurrency, 'duration': round(elapsed, 1),
+                'mix': args.mix, 'python': platform.python_version(), 'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'routes': routes,
+            'total': total,
+        }
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(routes, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
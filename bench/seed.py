@@ -0,0 +1,184 @@
+# Генератор синтетической базы «как у большой компании».
+# Пишет в ту БД, на которую настроено приложение (config.py / переменные
+# окружения), многострочными INSERT пачками по --batch строк.
+#
+#   python -m bench.seed --reset --users 50000 --topics 500 --questions 20000 --progress 2000000
+#
+# Данные детерминированы (--seed), id задаются явно: admin — 1,
+# сотрудники — 2..N+1 (user<N>@bench.local, пароль bench).
+
+import argparse
+import datetime
+import random
+import sys
+import time
+
+import database
+import migrations
+import rollup
+
+WORDS = (
+    "охрана труда безопасность пожарная эвакуация инструктаж регламент сотрудник "
+    "оборудование допуск проверка журнал средства защиты электробезопасность первая помощь "
+    "склад погрузка транспорт отчёт документ процедура риск контроль аудит обучение"
+).split()
+
+ADMIN = ('admin@corp.com', 'admin')
+USER_PASSWORD = 'bench'
+
+# Порядок удаления с учётом внешних ключей
+TABLES = ('result_answers', 'item_stats', 'answer_stats', 'topic_score_stats', 'results', 'course_progress', 'progress_rollup', 'answers', 'questions',
+          'materials', 'topics', 'courses', 'users')
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+class Seeder:
+    def __init__(self, db, batch, seed):
+        self.db = db
+        self.batch = batch
+        self.rng = random.Random(seed)
+
+    def insert(self, table, columns, rows):
+        """Вставляет строки пачками; rows может быть генератором."""
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        cursor = self.db.cursor()
+        started = time.perf_counter()
+        total = 0
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.batch:
+                cursor.executemany(sql, chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            cursor.executemany(sql, chunk)
+            total += len(chunk)
+        self.db.commit()
+        cursor.close()
+        print(f"{table}: {total} строк за {time.perf_counter() - started:.1f} с")
+        return total
+
+    def users(self, count):
+        rows = [(1, 'Администратор', ADMIN[0], ADMIN[1], 'admin', True)]
+        rows += ((i, f"Сотрудник {i}", f"user{i}@bench.local", USER_PASSWORD, 'user', True)
+                 for i in range(2, count + 2))
+        self.insert('users', ('id', 'full_name', 'email', 'password', 'role', 'is_confirmed'), rows)
+
+    def catalog(self, courses, topics, materials_per_topic):
+        self.insert('courses', ('id', 'name'), ((i, f"Курс {i}: {_text(self.rng, 2)}") for i in range(1, courses + 1)))
+        self.insert('topics', ('id', 'title', 'course_id'),
+                    ((i, f"Тема {i}: {_text(self.rng, 3)}", (i - 1) % courses + 1) for i in range(1, topics + 1)))
+        self.insert('materials', ('topic_id', 'content', 'body'),
+                    ((t, f"Материал {t}.{m}: {_text(self.rng, 3)}", _text(self.rng, 80))
+                     for t in range(1, topics + 1) for m in range(1, materials_per_topic + 1)))
+
+    def questions(self, count, topics, answers_per_question):
+        self.insert('questions', ('id', 'topic_id', 'question_text'),
+                    ((i, (i - 1) % topics + 1, f"Вопрос {i}: {_text(self.rng, 8)}?") for i in range(1, count + 1)))
+
+        # id ответов явные: варианты вопроса q — (q - 1) * A + 1 .. q * A
+        self.correct = {}
+
+        def answers():
+            for q in range(1, count + 1):
+                correct = self.correct[q] = self.rng.randrange(answers_per_question)
+                for a in range(answers_per_question):
+                    yield (q - 1) * answers_per_question + a + 1, q, _text(self.rng, 3), a == correct
+        self.insert('answers', ('id', 'question_id', 'answer_text', 'is_correct'), answers())
+
+    def progress(self, count, users, topics):
+        per_user = min(topics, max(1, count // users))
+
+        def rows():
+            produced = 0
+            for user_id in range(2, users + 2):
+                for topic_id in self.rng.sample(range(1, topics + 1), per_user):
+                    if produced >= count:
+                        return
+                    produced += 1
+                    score = self.rng.choice((None, self.rng.randint(0, 100)))
+                    yield user_id, topic_id, True, score is not None and score >= 50, score
+        self.insert('course_progress', ('user_id', 'topic_id', 'viewed_materials', 'passed_test', 'test_score'), rows())
+
+
+    def attempts(self, count, per_attempt, users, topics, questions, answers_per_question):
+        """История попыток: сильные сотрудники и лёгкие вопросы чаще дают верный ответ."""
+        if not count:
+            return
+        ability = [self.rng.random() for _ in range(users + 2)]
+        easiness = [self.rng.random() for _ in range(questions + 1)]
+        pools = [list(range(t, questions + 1, topics)) for t in range(topics + 1)]
+        started = datetime.datetime(2026, 1, 1)
+        results = []
+
+        def answers():
+            for result_id in range(1, count + 1):
+                user_id = self.rng.randrange(2, users + 2)
+                topic_id = self.rng.randrange(1, topics + 1)
+                pool = pools[topic_id]
+                right = answered = 0
+                for q in self.rng.sample(pool, min(per_attempt, len(pool))):
+                    if self.rng.random() < 0.02:
+                        yield result_id, q, None, False
+                        continue
+                    answered += 1
+                    first = (q - 1) * answers_per_question + 1
+                    if self.rng.random() < min(0.95, max(0.05, ability[user_id] + easiness[q] - 0.5)):
+                        right += 1
+                        yield result_id, q, first + self.correct[q], True
+                    else:
+                        wrong = self.rng.randrange(answers_per_question - 1)
+                        yield result_id, q, first + wrong + (wrong >= self.correct[q]), False
+                score = round(right / answered * 100) if answered else 0
+                created_at = started + datetime.timedelta(minutes=result_id)
+                results.append((result_id, user_id, topic_id, score, created_at))
+        self.insert('result_answers', ('result_id', 'question_id', 'answer_id', 'is_correct'), answers())
+        self.insert('results', ('id', 'user_id', 'topic_id', 'score', 'created_at'), results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Заполнить БД синтетическими данными для нагрузочных тестов")
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--courses', type=int, default=50)
+    parser.add_argument('--topics', type=int, default=500)
+    parser.add_argument('--materials-per-topic', type=int, default=5)
+    parser.add_argument('--questions', type=int, default=20000)
+    parser.add_argument('--answers-per-question', type=int, default=4)
+    parser.add_argument('--progress', type=int, default=2000000)
+    parser.add_argument('--attempts', type=int, default=0, help="попыток теста в истории (results)")
+    parser.add_argument('--questions-per-attempt', type=int, default=10)
+    parser.add_argument('--batch', type=int, default=5000, help="строк в одном INSERT")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--reset', action='store_true', help="удалить существующие данные")
+    args = parser.parse_args(argv)
+
+    with database.connection() as db:
+        migrations.upgrade(db)
+        cursor = db.cursor()
+        if args.reset:
+            for table in TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+            db.commit()
+        cursor.execute("SELECT COUNT(*) AS n FROM users")
+        if cursor.fetchone()['n']:
+            sys.exit("В БД уже есть пользователи; запустите с --reset")
+        cursor.close()
+
+        started = time.perf_counter()
+        seeder = Seeder(db, args.batch, args.seed)
+        seeder.users(args.users)
+        seeder.catalog(args.courses, args.topics, args.materials_per_topic)
+        seeder.questions(args.questions, args.topics, args.answers_per_question)
+        seeder.progress(args.progress, args.users, args.topics)
+        seeder.attempts(args.attempts, args.questions_per_attempt, args.users, args.topics,
+                        args.questions, args.answers_per_question)
+        rollup.rebuild(db)
+        print(f"Готово за {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == '__main__':
+    main()
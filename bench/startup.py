@@ -0,0 +1,102 @@
+# Время запуска приложения и память воркеров gunicorn.
+#
+#   python -m bench.startup                  # импорт приложения, 5 холодных запусков
+#   python -m bench.startup --workers 4      # + RSS/PSS воркеров с --preload и без
+#
+# PSS делит общие страницы между процессами: при --preload код и данные,
+# загруженные мастером до fork, воркеры делят copy-on-write, и PSS воркера
+# заметно меньше его RSS.
+
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = (
+    "import resource, time\n"
+    "started = time.perf_counter()\n"
+    "import app\n"
+    "app = getattr(app, 'app', None) or app.create_app()\n"
+    "print(time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+)
+
+WARMUP_PATHS = ('/', '/login', '/metrics')
+
+
+def import_cost(runs):
+    """(медиана сек, медиана пикового RSS КБ) импорта приложения в чистом процессе."""
+    seconds, rss = [], []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout.split()
+        seconds.append(float(out[0]))
+        rss.append(int(out[1]))
+    return statistics.median(seconds), statistics.median(rss)
+
+
+def _memory(pid):
+    """{'Rss': КБ, 'Pss': КБ} процесса из /proc/<pid>/smaps_rollup."""
+    result = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                result[key] = int(value.split()[0])
+    return result
+
+
+def _children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def worker_memory(workers, preload, port):
+    """Средние RSS и PSS воркера (КБ) после нескольких запросов."""
+    env = dict(os.environ, GUNICORN_PROFILE='sync', GUNICORN_WORKERS=str(workers),
+               GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_PRELOAD='1' if preload else '0')
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 30
+        while len(_children(server.pid)) < workers:
+            if time.monotonic() > deadline:
+                raise SystemExit("gunicorn не запустил воркеры за 30 с")
+            time.sleep(0.2)
+        for _ in range(workers * 5):
+            for path in WARMUP_PATHS:
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=10).read()
+                except OSError:
+                    time.sleep(0.2)
+        usage = [_memory(pid) for pid in _children(server.pid)]
+        return (statistics.mean(u['Rss'] for u in usage), statistics.mean(u['Pss'] for u in usage))
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Время импорта приложения и память воркеров gunicorn")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=0, help="замерить память N воркеров (нужен Linux)")
+    parser.add_argument('--port', type=int, default=8131)
+    args = parser.parse_args(argv)
+
+    seconds, rss = import_cost(args.runs)
+    print(f"импорт приложения: {seconds * 1000:.0f} мс, пиковый RSS {rss / 1024:.1f} МБ")
+
+    if args.workers:
+        for preload in (False, True):
+            rss, pss = worker_memory(args.workers, preload, args.port)
+            print(f"{args.workers} воркеров{' с --preload' if preload else ''}: "
+                  f"RSS {rss / 1024:.1f} МБ, PSS {pss / 1024:.1f} МБ на воркер")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+# Хранилище загруженных файлов с адресацией по содержимому.
+# Файл лежит в BLOB_DIR/<2 символа>/<sha256><расширение>, одинаковые
+# загрузки схлопываются в один файл. Ссылки на файл — строки materials
+# с тем же file_sha256: когда их не остаётся, файл удаляется.
+#
+# В materials.file_path пишется логический путь uploads/blobs/..., сам
+# каталог лежит вне static, чтобы файлы не отдавались без входа.
+
+import fcntl
+import hashlib
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from flask import Request
+from werkzeug.utils import secure_filename
+
+import config
+
+BLOB_PREFIX = 'uploads/blobs'
+CHUNK_SIZE = 64 * 1024
+# Права опубликованного файла: его читает и nginx/Apache (X-Accel, X-Sendfile)
+FILE_MODE = 0o644
+
+# FOR UPDATE — мимо кэша запросов и по последним закоммиченным данным
+REFS_QUERY = "SELECT COUNT(*) AS refs FROM materials WHERE file_sha256 = %s FOR UPDATE"
+LEGACY_FILES_QUERY = "SELECT id, file_path FROM materials WHERE file_path IS NOT NULL AND file_sha256 IS NULL"
+SET_BLOB_QUERY = "UPDATE materials SET file_path = %s, file_sha256 = %s WHERE id = %s"
+
+# Подсказки для flask db-check (migrations.route_queries): перенос старых
+# загрузок (flask import-blobs) один раз проходит по всем материалам
+EXPLAIN_HINTS = {
+    'LEGACY_FILES_QUERY': {'scans': {'materials'}},
+}
+
+_static_folder = None
+
+
+def init_app(app):
+    global _static_folder
+    _static_folder = app.static_folder
+    app.request_class = BlobRequest
+
+
+def blob_root():
+    return config.BLOB_DIR
+
+
+def _static_blob_root():
+    # Где хранилище лежало раньше — внутри static
+    return os.path.join(_static_folder, *BLOB_PREFIX.split('/'))
+
+
+def _tmp_dir():
+    # Временные файлы в том же разделе, что и хранилище, — чтобы работал os.link
+    path = os.path.join(blob_root(), 'tmp')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class HashingFile:
+    """Временный файл, который считает SHA-256 по мере записи.
+
+    Werkzeug пишет в него загрузку кусками прямо при разборе multipart,
+    так что файл не держится в памяти и не читается повторно ради хэша.
+    """
+
+    def __init__(self):
+        self._file = tempfile.NamedTemporaryFile(dir=_tmp_dir(), prefix='upload-')
+        self._hash = hashlib.sha256()
+        self.name = self._file.name
+
+    def write(self, data):
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class BlobRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if filename and _static_folder:
+            return HashingFile()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+def blob_path(sha256, ext):
+    return f"{BLOB_PREFIX}/{sha256[:2]}/{sha256}{ext}"
+
+
+def full_path(rel_path):
+    """Путь на диске: файлы хранилища — в BLOB_DIR, старые загрузки — в static."""
+    if rel_path.startswith(BLOB_PREFIX + '/'):
+        return os.path.join(blob_root(), *rel_path[len(BLOB_PREFIX) + 1:].split('/'))
+    return os.path.join(_static_folder, *rel_path.split('/'))
+
+
+def blob_name(rel_path):
+    """<2 символа>/<sha256><расширение> для пути хранилища, иначе None."""
+    if rel_path.startswith(BLOB_PREFIX + '/'):
+        return rel_path[len(BLOB_PREFIX) + 1:]
+    return None
+
+
+def static_path(file_path):
+    # Старые записи встречаются с обратными слэшами и префиксом static/
+    return file_path.replace('\\', '/').split('static/')[-1]
+
+
+def find(sha256):
+    """Путь (относительно static) уже сохранённого файла с таким хэшем или None."""
+    shard = os.path.join(blob_root(), sha256[:2])
+    try:
+        names = os.listdir(shard)
+    except FileNotFoundError:
+        return None
+    for name in names:
+        if name.startswith(sha256):
+            return f"{BLOB_PREFIX}/{sha256[:2]}/{name}"
+    return None
+
+
+def _copy_hashing(src, dst):
+    digest = hashlib.sha256()
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        dst.write(chunk)
+    return digest.hexdigest()
+
+
+def _umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+@contextmanager
+def locked(sha256):
+    """Межпроцессная блокировка файла хранилища (одна на шард <2 символа>).
+
+    collect() проверяет ссылки и удаляет файл под ней, а добавление ссылки
+    перепроверяет файл под ней же после COMMIT (см. ensure()).
+    """
+    path = os.path.join(blob_root(), 'locks', f"{sha256[:2]}.lock")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _place(tmp_path, sha256, ext):
+    existing = find(sha256)
+    if existing:
+        return existing
+
+    rel_path = blob_path(sha256, ext)
+    target = full_path(rel_path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # NamedTemporaryFile создаётся с правами 0600, а жёсткая ссылка их наследует
+    os.chmod(tmp_path, FILE_MODE & ~_umask())
+    try:
+        os.link(tmp_path, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(tmp_path, target)
+    return rel_path
+
+
+def store(file_storage):
+    """Сохраняет загрузку и возвращает (sha256, путь относительно static)."""
+    ext = os.path.splitext(secure_filename(file_storage.filename or ''))[1].lower()
+    stream = file_storage.stream
+
+    if isinstance(stream, HashingFile):
+        stream.flush()
+        sha256 = stream.hexdigest()
+        return sha256, _place(stream.name, sha256, ext)
+
+    # Загрузка пришла не через BlobRequest (маленький файл в памяти и т.п.)
+    with tempfile.NamedTemporaryFile(dir=_tmp_dir(), prefix='upload-') as tmp:
+        sha256 = _copy_hashing(stream, tmp)
+        tmp.flush()
+        return sha256, _place(tmp.name, sha256, ext)
+
+
+def store_path(path):
+    """Кладёт в хранилище уже существующий файл (перенос старых загрузок)."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, 'rb') as src, tempfile.NamedTemporaryFile(dir=_tmp_dir(), prefix='import-') as tmp:
+        sha256 = _copy_hashing(src, tmp)
+        tmp.flush()
+        return sha256, _place(tmp.name, sha256, ext)
+
+
+def ensure(file_storage, sha256):
+    """Вызывается после COMMIT новой ссылки на файл.
+
+    Если параллельный collect() успел удалить файл между store() и COMMIT,
+    кладёт его заново из той же загрузки.
+    """
+    with locked(sha256):
+        if find(sha256) is None:
+            file_storage.stream.seek(0)
+            store(file_storage)
+
+
+def collect(cursor, sha256):
+    """Удаляет файл, если на него больше не ссылается ни один материал."""
+    if not sha256:
+        return False
+    with locked(sha256):
+        cursor.execute(REFS_QUERY, (sha256,))
+        if cursor.fetchone()['refs']:
+            return False
+
+        rel_path = find(sha256)
+        if rel_path:
+            try:
+                os.unlink(full_path(rel_path))
+            except FileNotFoundError:
+                pass
+    return rel_path is not None
+
+
+def relocate_static_blobs():
+    """Переносит файлы хранилища из static/uploads/blobs в BLOB_DIR."""
+    old_root = _static_blob_root()
+    moved = 0
+    if not os.path.isdir(old_root) or os.path.abspath(old_root) == os.path.abspath(blob_root()):
+        return moved
+    for shard in os.listdir(old_root):
+        old_shard = os.path.join(old_root, shard)
+        if shard == 'tmp' or not os.path.isdir(old_shard):
+            continue
+        os.makedirs(os.path.join(blob_root(), shard), exist_ok=True)
+        for name in os.listdir(old_shard):
+            target = os.path.join(blob_root(), shard, name)
+            if os.path.exists(target):
+                os.unlink(os.path.join(old_shard, name))
+            else:
+                shutil.move(os.path.join(old_shard, name), target)
+            moved += 1
+        os.rmdir(old_shard)
+    return moved
+
+
+def import_legacy(db):
+    """Переносит файлы, загруженные до появления хранилища, в хранилище.
+
+    Одинаковые файлы схлопываются, старые копии удаляются.
+    """
+    cursor = db.cursor()
+    cursor.execute(LEGACY_FILES_QUERY)
+    migrated = 0
+    old_files = set()
+    for row in cursor.fetchall():
+        old_path = full_path(static_path(row['file_path']))
+        if not os.path.isfile(old_path):
+            continue
+        sha256, rel_path = store_path(old_path)
+        cursor.execute(SET_BLOB_QUERY, (rel_path, sha256, row['id']))
+        old_files.add(old_path)
+        migrated += 1
+    db.commit()
+
+    for path in old_files:
+        os.unlink(path)
+    return migrated
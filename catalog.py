@@ -0,0 +1,67 @@
+# Каталог курсов для сотрудников (курс -> темы).
+# Меняется только из админки, поэтому читается одним запросом и держится
+# в памяти воркера до смены версии 'catalog' (см. versions.py).
+# Загружается всегда с основной БД: отстающая реплика сохранила бы старый
+# каталог под новой версией, и другие воркеры взяли бы его из общего каталога.
+
+import threading
+import time
+
+import config
+import database
+import versions
+
+CATALOG_QUERY = """
+    SELECT c.id, c.name, c.title, t.id AS topic_id, t.title AS topic_title
+    FROM courses c
+    LEFT JOIN topics t ON t.course_id = c.id
+    ORDER BY c.id, t.id
+"""
+
+# Подсказки для flask db-check (migrations.route_queries): параметры EXPLAIN
+# и таблицы, которые запрос намеренно читает целиком
+EXPLAIN_HINTS = {
+    'CATALOG_QUERY': {'scans': {'c'}},
+}
+
+# (версия, время загрузки, список курсов)
+_cache = None
+_lock = threading.Lock()
+
+
+def load(cursor):
+    """Курсы с вложенными темами одним запросом."""
+    cursor.execute(CATALOG_QUERY)
+    courses = []
+    for row in cursor.fetchall():
+        if not courses or courses[-1]['id'] != row['id']:
+            courses.append({'id': row['id'], 'name': row['name'], 'title': row['title'], 'topics': []})
+        if row['topic_id'] is not None:
+            courses[-1]['topics'].append({'id': row['topic_id'], 'title': row['topic_title'],
+                                          'course_id': row['id']})
+    return courses
+
+
+def get_catalog():
+    global _cache
+    version = versions.current('catalog')
+    with _lock:
+        cached = _cache
+    if cached and cached[0] == version and time.monotonic() - cached[1] < config.CATALOG_CACHE_TTL:
+        return cached[2]
+
+    courses = versions.load_shared('catalog', version)
+    if courses is None:
+        with database.get_primary_db().cursor() as cursor:
+            courses = load(cursor)
+        versions.store_shared('catalog', version, courses)
+    with _lock:
+        _cache = (version, time.monotonic(), courses)
+    return courses
+
+
+def invalidate():
+    global _cache
+    versions.bump('catalog')
+    with _lock:
+        _cache = None
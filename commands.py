@@ -0,0 +1,105 @@
+# Команды flask --app app ...: миграции, проверки БД, обслуживание данных.
+
+import click
+from flask import Blueprint
+
+import blobstore
+import item_analysis
+import migrations
+import progress
+import question_import
+import rollup
+import tabular
+from database import get_db, replica_status
+
+# cli_group=None: команды верхнего уровня (flask db-upgrade), а не flask commands db-upgrade
+bp = Blueprint('commands', __name__, cli_group=None)
+
+
+@bp.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Применить недостающие миграции схемы БД."""
+    applied = migrations.upgrade(get_db())
+    for version, description in applied:
+        print(f"{version}: {description}")
+    print("Схема актуальна" if not applied else f"Применено миграций: {len(applied)}")
+
+
+@bp.cli.command('db-check')
+def db_check_command():
+    """Проверить через EXPLAIN, что запросы маршрутов не сканируют таблицы целиком."""
+    problems = migrations.check_query_plans(get_db())
+    for route, table, sql in problems:
+        print(f"[{route}] полный скан {table}: {sql}")
+    if problems:
+        raise SystemExit(1)
+    print("Полных сканов нет")
+
+
+@bp.cli.command('db-replicas')
+def db_replicas_command():
+    """Проверить реплики из DB_REPLICAS: доступность и отставание от основной БД."""
+    status = replica_status()
+    if not status:
+        print("Реплики не настроены (DB_REPLICAS)")
+        return
+    for address, lag, error in status:
+        if error:
+            print(f"{address}: недоступна ({error})")
+        elif lag is None:
+            print(f"{address}: репликация не идёт")
+        else:
+            print(f"{address}: отставание {lag} с")
+    if any(error or lag is None for address, lag, error in status):
+        raise SystemExit(1)
+
+
+@bp.cli.command('blobs-import')
+def blobs_import_command():
+    """Перенести ранее загруженные файлы материалов в хранилище по SHA-256."""
+    relocated = blobstore.relocate_static_blobs()
+    migrated = blobstore.import_legacy(get_db())
+    print(f"Перенесено из static/uploads/blobs: {relocated}, перенесено файлов: {migrated}")
+
+
+@bp.cli.command('progress-unique-key')
+def progress_unique_key_command():
+    """Убрать дубликаты course_progress и добавить уникальный ключ (user_id, topic_id)."""
+    db = get_db()
+    merged = progress.ensure_unique_key(db)
+    rollup.rebuild(db)
+    print(f"Уникальный ключ добавлен, схлопнуто дубликатов: {merged}")
+
+
+@bp.cli.command('rebuild-rollup')
+def rebuild_rollup_command():
+    """Пересчитать сводку progress_rollup по course_progress."""
+    topics = rollup.rebuild(get_db())
+    print(f"Сводка пересчитана: {topics} тем")
+
+
+@bp.cli.command('item-analysis')
+def item_analysis_command():
+    """Пересчитать статистику вопросов и баллов по истории попыток."""
+    summary = item_analysis.run(get_db())
+    print(f"Попыток: {summary['attempts']}, ответов: {summary['responses']}, "
+          f"вопросов: {summary['questions']}, тем: {summary['topics']}")
+    print(f"Чтение {summary['read_seconds']:.2f} с, расчёт {summary['compute_seconds']:.2f} с, "
+          f"запись {summary['save_seconds']:.2f} с")
+
+
+@bp.cli.command('import-questions')
+@click.argument('topic_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_questions_command(topic_id, path):
+    """Импортировать вопросы теста из XLSX/CSV в тему TOPIC_ID."""
+    with open(path, 'rb') as f:
+        rows = tabular.read_rows(f, path)
+    try:
+        report = question_import.import_rows(get_db(), topic_id, rows)
+    except question_import.QuestionImportError as e:
+        for error in e.errors:
+            print(error)
+        raise SystemExit(1)
+    print(f"Импортировано вопросов: {report['questions']}, ответов: {report['answers']} "
+          f"за {report['seconds']} с")
@@ -1,8 +1,131 @@
-import mysql.connector
+import os
 
 DB_CONFIG = {
-    'host': 'sql7.freesqldatabase.com',
-    'user': 'sql7786198',
-    'password': "pm8haR585d",
-    'database': 'sql7786198'
-}
\ No newline at end of file
+    'host': os.environ.get('DB_HOST', 'sql7.freesqldatabase.com'),
+    'user': os.environ.get('DB_USER', 'sql7786198'),
+    'password': os.environ.get('DB_PASSWORD', "pm8haR585d"),
+    'database': os.environ.get('DB_NAME', 'sql7786198'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+}
+
+# Реплики MySQL для чтения: "host:port,host:port" (логин, пароль и база — из DB_CONFIG).
+# GET-запросы без записи читают с реплики, запись и всё остальное — основная БД
+DB_REPLICAS = [address.strip() for address in os.environ.get('DB_REPLICAS', '').split(',') if address.strip()]
+# Сколько секунд после записи сессия читает только с основной БД (видит свои изменения);
+# должно быть больше обычного отставания реплик
+DB_REPLICA_PIN_SECONDS = float(os.environ.get('DB_REPLICA_PIN_SECONDS', 10))
+
+# Хранилище: 'mysql' (DB_CONFIG) или 'sqlite' — файл SQLITE_PATH рядом с приложением,
+# для небольших установок на одном сервере без отдельной СУБД
+DB_BACKEND = os.environ.get('DB_BACKEND', 'mysql')
+SQLITE_PATH = os.environ.get(
+    'SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'training.sqlite3'))
+# Сколько секунд ждать, пока другой воркер держит блокировку на запись
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 5))
+# WAL: читатели не ждут писателя; synchronous=NORMAL в WAL не теряет целостность при сбое
+SQLITE_PRAGMAS = (
+    "journal_mode = WAL",
+    "synchronous = NORMAL",
+    "foreign_keys = ON",
+    f"busy_timeout = {int(SQLITE_BUSY_TIMEOUT * 1000)}",
+    f"cache_size = -{int(os.environ.get('SQLITE_CACHE_KB', 64000))}",
+    "temp_store = MEMORY",
+    # Обновляет статистику планировщика, если таблицы заметно выросли
+    "optimize = 0x10002",
+    f"mmap_size = {int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+)
+
+# Пул соединений (на каждый воркер gunicorn)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+# Сколько секунд ждать свободного соединения, прежде чем вернуть ошибку
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+# Соединение старше этого возраста (сек) закрывается и открывается заново
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 3600))
+# Если соединение простаивало дольше (сек), перед выдачей делаем ping
+DB_POOL_PING_INTERVAL = int(os.environ.get('DB_POOL_PING_INTERVAL', 30))
+
+# Сколько секунд воркер доверяет закэшированному ключу ответов теста
+QUIZ_CACHE_TTL = int(os.environ.get('QUIZ_CACHE_TTL', 300))
+# Сколько секунд начатая попытка теста с выборкой вопросов хранится в сессии
+QUIZ_ATTEMPT_TTL = int(os.environ.get('QUIZ_ATTEMPT_TTL', 86400))
+# То же для каталога курсов на странице сотрудника
+CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 300))
+
+# Общий для воркеров gunicorn каталог с версиями кэшей (versions.py).
+# Не задан — каждый воркер видит только свои сбросы кэша, остальное решает TTL
+CACHE_SHARED_DIR = os.environ.get('CACHE_SHARED_DIR') or None
+
+# Кэш результатов SELECT (querycache.py): число записей (0 — выключен),
+# срок жизни записи и таблицы, запросы к которым можно кэшировать
+QUERY_CACHE_SIZE = int(os.environ.get('QUERY_CACHE_SIZE', 1000))
+QUERY_CACHE_TTL = int(os.environ.get('QUERY_CACHE_TTL', 60))
+QUERY_CACHE_TABLES = frozenset(
+    os.environ.get('QUERY_CACHE_TABLES', 'courses,topics,materials,questions,answers').split(','))
+
+# Сколько отрисованных страниц сотрудника держать в памяти воркера (pagecache.py)
+PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 500))
+PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 60))
+
+# Строк на странице /admin/progress
+PROGRESS_PAGE_SIZE = int(os.environ.get('PROGRESS_PAGE_SIZE', 50))
+# Сколько секунд хранить посчитанное общее число строк отчёта для набора фильтров
+PROGRESS_COUNT_TTL = int(os.environ.get('PROGRESS_COUNT_TTL', 60))
+
+# Отложенная запись просмотров материалов: события копятся в памяти воркера
+# и пишутся пачкой раз в PROGRESS_FLUSH_INTERVAL сек или по PROGRESS_BATCH_SIZE штук
+PROGRESS_WRITE_BEHIND = os.environ.get('PROGRESS_WRITE_BEHIND', '0') == '1'
+PROGRESS_FLUSH_INTERVAL = float(os.environ.get('PROGRESS_FLUSH_INTERVAL', 5))
+PROGRESS_BATCH_SIZE = int(os.environ.get('PROGRESS_BATCH_SIZE', 200))
+
+# Хранилище файлов материалов (blobstore.py). Вне static: иначе Flask отдал
+# бы их по /static/... без входа, мимо проверки прав в material_file
+BLOB_DIR = os.environ.get(
+    'BLOB_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'blobs'))
+# Кто отдаёт байты файлов материалов: None — сам Flask (с Range/ETag),
+# 'x-accel' — nginx через X-Accel-Redirect, 'x-sendfile' — Apache/lighttpd
+FILE_SENDFILE_MODE = os.environ.get('FILE_SENDFILE_MODE') or None
+# internal-location nginx, которая смотрит в BLOB_DIR
+FILE_ACCEL_PREFIX = os.environ.get('FILE_ACCEL_PREFIX', '/protected-uploads/')
+# Срок кэширования файла по URL с хэшем содержимого (сек)
+FILE_IMMUTABLE_MAX_AGE = int(os.environ.get('FILE_IMMUTABLE_MAX_AGE', 365 * 24 * 3600))
+
+# Превью страниц PDF и слайдов PPTX (нужны poppler-utils и libreoffice)
+PREVIEW_CACHE_DIR = os.environ.get(
+    'PREVIEW_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'previews'))
+PREVIEW_WORKERS = int(os.environ.get('PREVIEW_WORKERS', 2))
+PREVIEW_WIDTH = int(os.environ.get('PREVIEW_WIDTH', 1280))
+PREVIEW_THUMB_WIDTH = int(os.environ.get('PREVIEW_THUMB_WIDTH', 320))
+PREVIEW_TIMEOUT = int(os.environ.get('PREVIEW_TIMEOUT', 300))
+# Через сколько секунд после неудачного рендера превью можно заказать заново
+PREVIEW_RETRY_AFTER = int(os.environ.get('PREVIEW_RETRY_AFTER', 900))
+PREVIEW_PDFTOPPM = os.environ.get('PREVIEW_PDFTOPPM', 'pdftoppm')
+PREVIEW_SOFFICE = os.environ.get('PREVIEW_SOFFICE', 'soffice')
+
+# Поиск: индекс строится в памяти воркера и полностью пересобирается
+# раз в SEARCH_REBUILD_INTERVAL сек (изменения из других воркеров)
+SEARCH_REBUILD_INTERVAL = int(os.environ.get('SEARCH_REBUILD_INTERVAL', 600))
+SEARCH_TEXT_CACHE_DIR = os.environ.get(
+    'SEARCH_TEXT_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'text'))
+SEARCH_PDFTOTEXT = os.environ.get('SEARCH_PDFTOTEXT', 'pdftotext')
+
+# Отчёты (jobs.py): готовые файлы лежат в REPORT_DIR под ключом версии данных
+# и отдаются повторно, пока данные не изменились. Без CACHE_SHARED_DIR
+# воркер не видит записей других воркеров, и файл живёт не дольше REPORT_CACHE_TTL
+REPORT_DIR = os.environ.get(
+    'REPORT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'reports'))
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 1))
+REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 300))
+# Задание дольше этого считается зависшим и запускается заново
+REPORT_JOB_TIMEOUT = int(os.environ.get('REPORT_JOB_TIMEOUT', 1800))
+
+# Массовые приглашения: строк в одном многострочном INSERT
+INVITE_BATCH_SIZE = int(os.environ.get('INVITE_BATCH_SIZE', 500))
+
+# Метрики (/metrics): каталог, куда воркеры сбрасывают счётчики для общей
+# картины (не задан — /metrics показывает только ответивший воркер)
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_DUMP_INTERVAL = float(os.environ.get('METRICS_DUMP_INTERVAL', 5))
+# Сколько раз один и тот же SQL за HTTP-запрос считается N+1
+N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5))
+# Писать в лог запросы дольше стольких мс вместе с их SQL (0 — не писать)
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 0))
@@ -1,15 +1,358 @@
-import pymysql
-from flask import g
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_request_context, request, session
+
+import config
+import metrics
+import querycache
+import sqlite_backend
+
+log = logging.getLogger(__name__)
+
+# Методы, которые не пишут в БД: их можно отдавать с реплики
+READ_METHODS = ('GET', 'HEAD')
+# Ключ сессии: до какого времени (unix) читать только с основной БД
+PIN_SESSION_KEY = '_db_primary_until'
+
+
+class PoolTimeout(Exception):
+    """Не удалось получить соединение из пула за DB_POOL_TIMEOUT секунд."""
+
+
+def _connect():
+    if config.DB_BACKEND == 'sqlite':
+        return sqlite_backend.connect(metrics.InstrumentedCursor)
+    # Курсор по умолчанию читает через кэш запросов и считает запросы для /metrics,
+    # commit() сбрасывает кэш по изменённым таблицам
+    return querycache.CachingConnection(
+        charset='utf8mb4',
+        cursorclass=metrics.InstrumentedCursor,
+        **config.DB_CONFIG
+    )
+
+
+def _connect_replica(address):
+    host, _, port = address.partition(':')
+    conn = querycache.CachingConnection(
+        charset='utf8mb4',
+        cursorclass=metrics.InstrumentedCursor,
+        # Случайная запись на реплику должна падать, а не расходиться с основной БД.
+        # init_command выполняется и при переподключении в ping(reconnect=True)
+        init_command="SET SESSION TRANSACTION READ ONLY",
+        **dict(config.DB_CONFIG, host=host, port=int(port or 3306))
+    )
+    conn.fills_cache = False
+    return conn
+
+
+class ConnectionPool:
+    """Пул соединений с MySQL внутри одного процесса (воркера gunicorn).
+
+    Соединение выдаётся на время контекста приложения и возвращается
+    в пул в teardown_appcontext. Устаревшие соединения пересоздаются,
+    простаивавшие — проверяются ping'ом перед выдачей.
+    """
+
+    def __init__(self, connect=_connect, size=5, timeout=10, recycle=3600, ping_interval=30):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self.pid = os.getpid()
+
+        self._idle = deque()   # (conn, last_used)
+        self._born = {}        # id(conn) -> время создания
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'hits': 0,          # выдано готовое соединение из пула
+            'misses': 0,        # пришлось открыть новое соединение
+            'waits': 0,         # сколько раз ждали свободное соединение
+            'wait_time': 0.0,   # суммарное время ожидания, сек
+            'timeouts': 0,
+            'recycled': 0,
+            'ping_failures': 0,
+        }
+
+    def _open(self):
+        try:
+            conn = self.connect()
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
+        self._born[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        self._born.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def checkout(self):
+        deadline = time.monotonic() + self.timeout
+        waited = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self._stats['hits'] += 1
+                    break
+                if self._opened < self.size:
+                    self._opened += 1
+                    self._stats['misses'] += 1
+                    conn = None
+                    break
+
+                now = time.monotonic()
+                if waited is None:
+                    waited = now
+                    self._stats['waits'] += 1
+                if now >= deadline:
+                    self._stats['timeouts'] += 1
+                    self._stats['wait_time'] += now - waited
+                    raise PoolTimeout(f"Нет свободных соединений с БД ({self.size} заняты)")
+                self._cond.wait(deadline - now)
+
+            if waited is not None:
+                self._stats['wait_time'] += time.monotonic() - waited
+
+        if conn is None:
+            return self._open()
+        return self._validate(conn, last_used)
+
+    def _validate(self, conn, last_used):
+        now = time.monotonic()
+
+        if now - self._born.get(id(conn), now) > self.recycle:
+            self._stats['recycled'] += 1
+            self._discard(conn)
+            return self._open()
+
+        if now - last_used > self.ping_interval:
+            try:
+                conn.ping(reconnect=True)
+            except Exception:
+                self._stats['ping_failures'] += 1
+                self._discard(conn)
+                return self._open()
+
+        return conn
+
+    def checkin(self, conn):
+        healthy = conn.open
+        if healthy:
+            try:
+                # Незакоммиченные изменения не должны достаться следующему запросу
+                conn.rollback()
+            except Exception:
+                healthy = False
+
+        with self._cond:
+            if healthy:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._opened -= 1
+            self._cond.notify()
+
+        if not healthy:
+            self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update(size=self.size, opened=self._opened, idle=len(self._idle))
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    # После fork (gunicorn --preload) у каждого воркера должен быть свой пул
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                _pool = ConnectionPool(
+                    size=config.DB_POOL_SIZE,
+                    timeout=config.DB_POOL_TIMEOUT,
+                    recycle=config.DB_POOL_RECYCLE,
+                    ping_interval=config.DB_POOL_PING_INTERVAL,
+                )
+    return _pool
+
+
+_replica_pools = None
+_next_replica = itertools.count()
+_routes = Counter()   # решения маршрутизации: replica, primary:<причина>, fallback
+_routes_lock = threading.Lock()
+
+
+def replica_pools():
+    """Пулы реплик из DB_REPLICAS (для SQLite реплик нет)."""
+    global _replica_pools
+    if not config.DB_REPLICAS or config.DB_BACKEND == 'sqlite':
+        return []
+    if _replica_pools is None or _replica_pools[0].pid != os.getpid():
+        with _pool_lock:
+            if _replica_pools is None or _replica_pools[0].pid != os.getpid():
+                _replica_pools = [
+                    ConnectionPool(
+                        connect=lambda address=address: _connect_replica(address),
+                        size=config.DB_POOL_SIZE,
+                        timeout=config.DB_POOL_TIMEOUT,
+                        recycle=config.DB_POOL_RECYCLE,
+                        ping_interval=config.DB_POOL_PING_INTERVAL,
+                    )
+                    for address in config.DB_REPLICAS
+                ]
+    return _replica_pools
+
+
+def _replica_lag(conn):
+    """Отставание реплики от основной БД в секундах (None — репликация не идёт)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SHOW REPLICA STATUS")
+    except Exception:
+        # MySQL до 8.0.22 и MariaDB
+        cursor.execute("SHOW SLAVE STATUS")
+    row = cursor.fetchone()
+    cursor.close()
+    if not row:
+        return None
+    return row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+
+
+def replica_status():
+    """[(адрес, отставание в сек или None, ошибка или None)] по каждой реплике."""
+    status = []
+    for address, pool in zip(config.DB_REPLICAS, replica_pools()):
+        try:
+            conn = pool.checkout()
+        except Exception as e:
+            status.append((address, None, str(e)))
+            continue
+        try:
+            status.append((address, _replica_lag(conn), None))
+        finally:
+            pool.checkin(conn)
+    return status
+
+
+def primary_db(f):
+    """Маршрут всегда читает с основной БД (например, только что созданные другим данные)."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.db_primary = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def _route():
+    """Куда идти за соединением текущего запроса: ('replica', None) или ('primary', причина)."""
+    if not has_request_context():
+        return 'primary', 'no-request'
+    if request.method not in READ_METHODS:
+        return 'primary', 'method'
+    if g.get('db_primary'):
+        return 'primary', 'route'
+    if session.get(PIN_SESSION_KEY, 0) > time.time():
+        return 'primary', 'pinned'
+    return 'replica', None
+
+
+def _count_route(name):
+    with _routes_lock:
+        _routes[name] += 1
+
+
+def route_stats():
+    with _routes_lock:
+        return dict(_routes)
+
+
+def _checkout_replica():
+    pools = replica_pools()
+    if not pools:
+        return None
+    target, reason = _route()
+    if target != 'replica':
+        log.debug("БД: %s %s -> основная (%s)", request.method, request.path, reason)
+        _count_route(f"primary_{reason}")
+        return None
+
+    number = next(_next_replica) % len(pools)
+    pool = pools[number]
+    try:
+        conn = pool.checkout()
+    except Exception:
+        log.warning("Реплика %s недоступна, читаем с основной БД", config.DB_REPLICAS[number], exc_info=True)
+        _count_route("fallback")
+        return None
+    log.debug("БД: %s %s -> реплика %s", request.method, request.path, config.DB_REPLICAS[number])
+    _count_route("replica")
+    g.db_replica = (pool, conn)
+    return conn
+
+
+def get_primary_db():
+    """Соединение с основной БД — для записи внутри GET-маршрута, который читает с реплики."""
+    if 'db_primary_conn' not in g:
+        g.db_primary_conn = get_pool().checkout()
+    return g.db_primary_conn
+
 
 def get_db():
+    """Соединение текущего запроса: реплика, если запрос только читает, иначе основная БД."""
     if 'db' not in g:
-        g.db = pymysql.connect(
-            host='sql7.freesqldatabase.com',
-            user='sql7786198',
-            password='pm8haR585d',
-            database='sql7786198',
-            port=3306,
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
-    return g.db
\ No newline at end of file
+        g.db = _checkout_replica() or get_primary_db()
+    return g.db
+
+
+@contextmanager
+def connection():
+    """Соединение из пула вне запроса (фоновые потоки, CLI)."""
+    pool = get_pool()
+    conn = pool.checkout()
+    try:
+        yield conn
+    finally:
+        pool.checkin(conn)
+
+
+def _pin_after_write(response):
+    # querycache.InvalidateOnCommit ставит g.db_wrote после COMMIT с записью
+    if g.pop('db_wrote', False) and replica_pools():
+        session[PIN_SESSION_KEY] = time.time() + config.DB_REPLICA_PIN_SECONDS
+    return response
+
+
+def close_db(exc=None):
+    g.pop('db', None)
+    replica = g.pop('db_replica', None)
+    if replica is not None:
+        pool, conn = replica
+        pool.checkin(conn)
+    conn = g.pop('db_primary_conn', None)
+    if conn is not None:
+        get_pool().checkin(conn)
+
+
+def init_app(app):
+    app.after_request(_pin_after_write)
+    app.teardown_appcontext(close_db)
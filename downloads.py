@@ -0,0 +1,89 @@
+# Отдача файлов материалов: Range-запросы (перемотка в PDF), сильный ETag
+# по SHA-256 содержимого и долгий кэш для URL, в которых есть этот хэш.
+# Байты может отдавать фронтовой прокси (X-Accel-Redirect / X-Sendfile),
+# тогда воркер Python только проверяет права и ставит заголовки.
+
+import mimetypes
+import os
+
+from flask import Response, abort, request, send_file, url_for
+
+import blobstore
+import config
+
+
+def init_app(app):
+    if config.FILE_SENDFILE_MODE == 'x-sendfile':
+        app.config['USE_X_SENDFILE'] = True
+    app.jinja_env.globals['material_file_url'] = material_file_url
+
+
+def material_file_url(material):
+    """URL файла материала; с хэшем содержимого, если он известен."""
+    if material.get('file_sha256'):
+        return url_for('user.material_file', material_id=material['id'], version=material['file_sha256'])
+    return url_for('user.material_file', material_id=material['id'])
+
+
+def set_private_cache(response, immutable):
+    # Материалы доступны только после входа — общим кэшам их хранить нельзя
+    response.cache_control.public = False
+    response.cache_control.private = True
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.max_age = config.FILE_IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.max_age = 0
+        response.cache_control.no_cache = True
+
+
+def _accel_response(rel_path, mimetype, etag, immutable):
+    response = Response(mimetype=mimetype)
+    if etag:
+        response.set_etag(etag)
+        if request.if_none_match.contains(etag):
+            response.status_code = 304
+            set_private_cache(response, immutable)
+            return response
+    # nginx сам обработает Range и отдаст файл из internal-location (alias на BLOB_DIR)
+    response.headers['X-Accel-Redirect'] = config.FILE_ACCEL_PREFIX + blobstore.blob_name(rel_path)
+    set_private_cache(response, immutable)
+    return response
+
+
+def send_material_file(material, version=None):
+    if not material.get('file_path'):
+        abort(404)
+
+    rel_path = blobstore.static_path(material['file_path'])
+    path = blobstore.full_path(rel_path)
+    if not os.path.isfile(path):
+        abort(404)
+
+    etag = material.get('file_sha256')
+    immutable = bool(etag) and version == etag
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    # Старые загрузки вне хранилища (до blobs-import) отдаёт сам Flask
+    if config.FILE_SENDFILE_MODE == 'x-accel' and blobstore.blob_name(rel_path):
+        return _accel_response(rel_path, mimetype, etag, immutable)
+
+    # send_file обрабатывает Range, If-None-Match и If-Modified-Since;
+    # при USE_X_SENDFILE тело отдаёт веб-сервер по заголовку X-Sendfile
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        download_name=f"material-{material['id']}{os.path.splitext(path)[1]}",
+        conditional=True,
+        etag=etag or True,
+    )
+    set_private_cache(response, immutable)
+    return response
+
+
+def send_preview_image(path, etag):
+    """Картинка превью: имя файла в кэше привязано к хэшу, поэтому она неизменна."""
+    response = send_file(path, mimetype='image/png', conditional=True, etag=etag)
+    set_private_cache(response, immutable=True)
+    return response
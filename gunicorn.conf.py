@@ -0,0 +1,52 @@
+# Настройки gunicorn. Профиль воркеров задаётся GUNICORN_PROFILE:
+#
+#   gthread (по умолчанию) — процессы по числу ядер, в каждом GUNICORN_THREADS
+#       потоков. Пока один поток ждёт ответа MySQL, другие обслуживают запросы.
+#   gevent — один процесс на ядро держит до GUNICORN_WORKER_CONNECTIONS запросов
+#       одновременно; pymysql написан на чистом Python, и после monkey-patch
+#       его сокеты не блокируют воркер. Нужен pip install gevent; с DB_BACKEND=sqlite
+#       не даёт выигрыша (запросы к файлу блокируют весь воркер), берите gthread.
+#   sync — прежнее поведение: один запрос на процесс.
+#
+# Пул соединений (DB_POOL_SIZE) по умолчанию подгоняется под число
+# одновременных запросов в воркере, чтобы потоки не стояли в очереди к пулу.
+
+import multiprocessing
+import os
+
+PROFILE = os.environ.get('GUNICORN_PROFILE', 'gthread')
+CPUS = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:' + os.environ.get('PORT', '8000'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+# Мастер импортирует приложение до fork, воркеры делят эту память copy-on-write.
+# С gevent выключено: monkey-patch должен пройти до импорта приложения
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0' if PROFILE == 'gevent' else '1') == '1'
+
+if PROFILE == 'gevent':
+    worker_class = 'gevent'
+    workers = int(os.environ.get('GUNICORN_WORKERS', CPUS))
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 200))
+    # Соединения с MySQL дороже гринлетов: часть запросов подождёт свободное в пуле
+    os.environ.setdefault('DB_POOL_SIZE', '20')
+elif PROFILE == 'gthread':
+    worker_class = 'gthread'
+    workers = int(os.environ.get('GUNICORN_WORKERS', CPUS))
+    threads = int(os.environ.get('GUNICORN_THREADS', 16))
+    os.environ.setdefault('DB_POOL_SIZE', str(threads))
+elif PROFILE == 'sync':
+    worker_class = 'sync'
+    workers = int(os.environ.get('GUNICORN_WORKERS', 2 * CPUS + 1))
+else:
+    raise RuntimeError(f"Неизвестный GUNICORN_PROFILE={PROFILE}: gthread, gevent или sync")
+
+
+def post_worker_init(worker):
+    # Только для нагрузочных прогонов (bench/): имитация задержки сети до БД
+    latency_ms = float(os.environ.get('BENCH_DB_LATENCY_MS', 0))
+    if latency_ms:
+        from bench import latency
+        latency.install(latency_ms / 1000)
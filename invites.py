@@ -0,0 +1,121 @@
+# Массовое приглашение сотрудников из XLSX/CSV.
+# Формат: по строке на сотрудника «ФИО | Email», строка заголовка необязательна.
+# Существующие email отсеиваются одним запросом, токены генерируются разом,
+# вставка идёт пачками по INVITE_BATCH_SIZE строк в одной транзакции.
+
+import os
+import re
+import secrets
+import tempfile
+
+import pymysql
+
+import config
+
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+TOKEN_BYTES = 16
+
+RESULT_HEADER = ["ФИО", "Email", "Статус", "Ссылка приглашения"]
+
+EXISTING_EMAILS_QUERY = "SELECT email FROM users WHERE email IN ({placeholders})"
+INSERT_INVITES_QUERY = """
+    INSERT INTO users (email, role, is_confirmed, invite_token, full_name) VALUES (%s, 'user', FALSE, %s, %s)
+"""
+
+
+class InviteImportError(ValueError):
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def parse(rows):
+    """Проверяет таблицу и возвращает [(ФИО, email)] без повторов внутри файла."""
+    first = 1
+    if rows and not EMAIL_RE.match(rows[0][1] if len(rows[0]) > 1 else ''):
+        rows, first = rows[1:], 2  # заголовок
+    if not rows:
+        raise InviteImportError(["В файле нет ни одного сотрудника"])
+
+    people = []
+    seen = set()
+    errors = []
+    for line, row in enumerate(rows, start=first):
+        full_name, email = (row + ['', ''])[:2]
+        if not full_name:
+            errors.append(f"Строка {line}: пустое ФИО")
+        elif not EMAIL_RE.match(email):
+            errors.append(f"Строка {line}: некорректный email «{email}»")
+        elif email.lower() not in seen:
+            seen.add(email.lower())
+            people.append((full_name, email))
+
+    if errors:
+        raise InviteImportError(errors)
+    return people
+
+
+def generate_tokens(count):
+    # Один вызов к источнику случайности на всю пачку вместо count вызовов
+    raw = secrets.token_bytes(TOKEN_BYTES * count)
+    return [raw[i:i + TOKEN_BYTES].hex() for i in range(0, len(raw), TOKEN_BYTES)]
+
+
+def existing_emails(cursor, emails):
+    """Email из списка, которые уже есть в users (в нижнем регистре)."""
+    if not emails:
+        return set()
+    placeholders = ", ".join(["%s"] * len(emails))
+    cursor.execute(EXISTING_EMAILS_QUERY.format(placeholders=placeholders), list(emails))
+    return {row['email'].lower() for row in cursor.fetchall()}
+
+
+def invite_many(db, people):
+    """Создаёт приглашения одной транзакцией.
+
+    Возвращает (новые [(ФИО, email, токен)], уже зарегистрированные [(ФИО, email)]).
+    """
+    cursor = db.cursor()
+    try:
+        existing = existing_emails(cursor, [email for _, email in people])
+        new = [(name, email) for name, email in people if email.lower() not in existing]
+        skipped = [(name, email) for name, email in people if email.lower() in existing]
+
+        invited = [(name, email, token) for (name, email), token in zip(new, generate_tokens(len(new)))]
+        for start in range(0, len(invited), config.INVITE_BATCH_SIZE):
+            cursor.executemany(
+                INSERT_INVITES_QUERY,
+                [(email, token, name) for name, email, token in invited[start:start + config.INVITE_BATCH_SIZE]]
+            )
+        db.commit()
+    except pymysql.err.IntegrityError:
+        # Кто-то успел пригласить тот же email между проверкой и вставкой
+        db.rollback()
+        raise InviteImportError(["Часть адресов была приглашена параллельно, загрузите файл ещё раз"])
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    return invited, skipped
+
+
+def build_result_xlsx(invited, skipped, invite_url):
+    """Таблица со ссылками приглашений во временном файле; возвращает путь."""
+    import openpyxl
+
+    fd, path = tempfile.mkstemp(prefix='invites_', suffix='.xlsx')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            wb = openpyxl.Workbook(write_only=True)
+            ws = wb.create_sheet("Приглашения")
+            ws.append(RESULT_HEADER)
+            for name, email, token in invited:
+                ws.append([name, email, "Приглашён", invite_url(token)])
+            for name, email in skipped:
+                ws.append([name, email, "Уже зарегистрирован", ""])
+            wb.save(f)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path
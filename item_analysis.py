@@ -0,0 +1,229 @@
+# Анализ вопросов тестов по истории попыток (results + result_answers).
+#
+# Задание читает всю историю небуферизованными курсорами и считает всё
+# на массивах NumPy, без циклов Python по строкам:
+#   difficulty      — доля верных ответов на вопрос (меньше — труднее);
+#   discrimination  — индекс дискриминации: доля верных в верхних 27 %
+#                     попыток темы по баллу минус доля в нижних 27 %;
+#   skip_rate       — доля выдач вопроса, оставленных без ответа;
+#   selection_rate  — доля выдач вопроса, в которых выбран вариант
+#                     (у неверных вариантов — привлекательность дистрактора);
+# и распределение баллов попыток по темам. Итог целиком перезаписывает
+# item_stats, answer_stats и topic_score_stats — отчёт читает только их.
+#
+#   flask --app app item-analysis
+
+import datetime
+import time
+
+import pymysql
+
+import rollup
+
+# Доля попыток темы в верхней и нижней группах для индекса дискриминации
+GROUP_SHARE = 0.27
+# При меньшем числе попыток по теме индекс дискриминации не считается
+MIN_ATTEMPTS = 10
+# Строк за один fetchmany и в одном INSERT
+BATCH = 10000
+# Ниже этого индекса вопрос плохо отличает подготовленных от неподготовленных
+WEAK_DISCRIMINATION = 0.2
+
+ITEMS_QUERY = """
+    SELECT q.id, q.question_text, s.responses, s.difficulty, s.discrimination, s.skip_rate
+    FROM item_stats s
+    JOIN questions q ON q.id = s.question_id
+    WHERE s.topic_id = %s
+    ORDER BY q.id
+"""
+
+# {placeholders} — по %s на каждый вопрос темы
+ITEM_ANSWERS_QUERY = """
+    SELECT a.question_id, a.id, a.answer_text, a.is_correct, COALESCE(s.selection_rate, 0) AS selection_rate
+    FROM answers a
+    LEFT JOIN answer_stats s ON s.answer_id = a.id
+    WHERE a.question_id IN ({placeholders})
+    ORDER BY a.question_id, a.id
+"""
+
+
+def _read(db, query, columns):
+    """Результат запроса из целых чисел — массивом (columns, строк)."""
+    import numpy as np
+
+    cursor = db.cursor(pymysql.cursors.SSCursor)
+    chunks = []
+    try:
+        cursor.execute(query)
+        while True:
+            rows = cursor.fetchmany(BATCH)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64))
+    finally:
+        cursor.close()
+    if not chunks:
+        return np.empty((columns, 0), dtype=np.int64)
+    return np.concatenate(chunks).T
+
+
+def _share_correct(q_inv, correct, mask, size):
+    """Доля верных ответов по вопросам среди ответов под маской (NaN — ответов нет)."""
+    import numpy as np
+
+    given = np.bincount(q_inv[mask], minlength=size)
+    right = np.bincount(q_inv[mask], weights=correct[mask], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(given > 0, right / given, np.nan)
+
+
+def analyze(results, responses):
+    """Считает статистику по массивам.
+
+    results   — (id, topic_id, score) попыток, по возрастанию id;
+    responses — (result_id, question_id, answer_id или 0, is_correct).
+    Возвращает словарь массивов NumPy для таблиц статистики.
+    """
+    import numpy as np
+
+    result_ids, result_topics, scores = results
+    scores = np.clip(scores, 0, 100)
+
+    # Распределение баллов: попытки, отсортированные по (тема, балл)
+    order = np.lexsort((scores, result_topics))
+    sorted_scores = scores[order]
+    topics, first, counts = np.unique(result_topics[order], return_index=True, return_counts=True)
+    group = np.repeat(np.arange(len(topics)), counts)
+    buckets = np.minimum(sorted_scores // 10, rollup.HISTOGRAM_BUCKETS - 1)
+    histogram = np.bincount(group * rollup.HISTOGRAM_BUCKETS + buckets,
+                            minlength=len(topics) * rollup.HISTOGRAM_BUCKETS)
+
+    # Верхняя и нижняя группы — по рангу попытки внутри своей темы
+    rank = np.arange(len(order)) - first[group]
+    size = np.ceil(GROUP_SHARE * counts).astype(np.int64)[group]
+    enough = (counts >= MIN_ATTEMPTS)[group]
+    upper = np.zeros(len(order), dtype=bool)
+    lower = np.zeros(len(order), dtype=bool)
+    upper[order] = enough & (rank >= counts[group] - size)
+    lower[order] = enough & (rank < size)
+
+    # Ответы без своей попытки (удалённой вручную) не учитываем
+    result_id, question_id, answer_id, correct = responses
+    attempt = np.searchsorted(result_ids, result_id)
+    known = attempt < len(result_ids)
+    known[known] = result_ids[attempt[known]] == result_id[known]
+    attempt, question_id, answer_id, correct = attempt[known], question_id[known], answer_id[known], correct[known]
+
+    questions, q_first, q_inv = np.unique(question_id, return_index=True, return_inverse=True)
+    given = np.bincount(q_inv, minlength=len(questions))
+    everyone = np.ones(len(q_inv), dtype=bool)
+    chosen = answer_id != 0
+    answers, a_first, a_inv = np.unique(answer_id[chosen], return_index=True, return_inverse=True)
+
+    return {
+        'topics': topics,
+        'attempts': counts,
+        'mean_score': np.bincount(group, weights=sorted_scores, minlength=len(topics)) / counts,
+        'median_score': (sorted_scores[first + (counts - 1) // 2] + sorted_scores[first + counts // 2]) / 2,
+        'histogram': histogram.reshape(-1, rollup.HISTOGRAM_BUCKETS),
+        'questions': questions,
+        'question_topics': result_topics[attempt[q_first]],
+        'responses': given,
+        'difficulty': _share_correct(q_inv, correct, everyone, len(questions)),
+        'discrimination': (_share_correct(q_inv, correct, upper[attempt], len(questions))
+                           - _share_correct(q_inv, correct, lower[attempt], len(questions))),
+        'skip_rate': np.bincount(q_inv, weights=~chosen, minlength=len(questions)) / np.maximum(given, 1),
+        'answers': answers,
+        'answer_questions': questions[q_inv[chosen][a_first]],
+        'selection_rate': np.bincount(a_inv, minlength=len(answers)) / given[q_inv[chosen][a_first]],
+    }
+
+
+def _number(value):
+    # NaN (статистики нет) пишем как NULL
+    return None if value != value else round(value, 4)
+
+
+def _insert(cursor, table, columns, rows):
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    for start in range(0, len(rows), BATCH):
+        cursor.executemany(sql, rows[start:start + BATCH])
+
+
+def save(db, stats):
+    """Перезаписывает таблицы статистики одной транзакцией."""
+    computed_at = datetime.datetime.now().replace(microsecond=0)
+    cursor = db.cursor()
+    for table in ('item_stats', 'answer_stats', 'topic_score_stats'):
+        cursor.execute(f"DELETE FROM {table}")
+
+    _insert(cursor, 'item_stats',
+            ('question_id', 'topic_id', 'responses', 'difficulty', 'discrimination', 'skip_rate'),
+            [(q, t, n, _number(p), _number(d), _number(s)) for q, t, n, p, d, s in zip(
+                stats['questions'].tolist(), stats['question_topics'].tolist(), stats['responses'].tolist(),
+                stats['difficulty'].tolist(), stats['discrimination'].tolist(), stats['skip_rate'].tolist())])
+    _insert(cursor, 'answer_stats', ('answer_id', 'question_id', 'selection_rate'),
+            [(a, q, _number(r)) for a, q, r in zip(
+                stats['answers'].tolist(), stats['answer_questions'].tolist(), stats['selection_rate'].tolist())])
+    _insert(cursor, 'topic_score_stats',
+            ('topic_id', 'attempts', 'mean_score', 'median_score', *rollup.HIST_COLUMNS, 'computed_at'),
+            [(t, n, _number(mean), _number(median), *hist, computed_at) for t, n, mean, median, hist in zip(
+                stats['topics'].tolist(), stats['attempts'].tolist(), stats['mean_score'].tolist(),
+                stats['median_score'].tolist(), stats['histogram'].tolist())])
+    db.commit()
+    cursor.close()
+
+
+def run(db):
+    """Полный пересчёт: читает историю попыток, считает, сохраняет. Возвращает сводку."""
+    started = time.perf_counter()
+    results = _read(db, "SELECT id, COALESCE(topic_id, 0), COALESCE(score, 0) FROM results ORDER BY id", 3)
+    responses = _read(db, "SELECT result_id, question_id, COALESCE(answer_id, 0), is_correct "
+                          "FROM result_answers", 4)
+    loaded = time.perf_counter()
+    stats = analyze(results, responses)
+    computed = time.perf_counter()
+    save(db, stats)
+    return {
+        'attempts': results.shape[1],
+        'responses': responses.shape[1],
+        'questions': len(stats['questions']),
+        'topics': len(stats['topics']),
+        'read_seconds': loaded - started,
+        'compute_seconds': computed - loaded,
+        'save_seconds': time.perf_counter() - computed,
+    }
+
+
+def read_topics(cursor):
+    """Распределение баллов по темам для отчёта (из topic_score_stats)."""
+    cursor.execute(f"""
+        SELECT s.topic_id, t.title, s.attempts, s.mean_score, s.median_score,
+               {", ".join(f"s.{col}" for col in rollup.HIST_COLUMNS)}, s.computed_at
+        FROM topic_score_stats s
+        LEFT JOIN topics t ON t.id = s.topic_id
+        ORDER BY s.topic_id
+    """)
+    rows = []
+    for row in cursor.fetchall():
+        row['histogram'] = [row[col] for col in rollup.HIST_COLUMNS]
+        rows.append(row)
+    return rows
+
+
+def read_items(cursor, topic_id):
+    """Вопросы темы со статистикой и долями выбора вариантов ответа."""
+    cursor.execute(ITEMS_QUERY, (topic_id,))
+    items = cursor.fetchall()
+    if not items:
+        return []
+    for item in items:
+        item['answers'] = []
+        item['weak'] = item['discrimination'] is not None and item['discrimination'] < WEAK_DISCRIMINATION
+    by_id = {item['id']: item for item in items}
+
+    placeholders = ", ".join(["%s"] * len(by_id))
+    cursor.execute(ITEM_ANSWERS_QUERY.format(placeholders=placeholders), list(by_id))
+    for row in cursor.fetchall():
+        by_id[row['question_id']]['answers'].append(row)
+    return items
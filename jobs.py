@@ -0,0 +1,264 @@
+# Фоновая генерация отчётов с кэшем готовых файлов на диске.
+#
+# Файл отчёта лежит в REPORT_DIR/<вид>-<ключ>.<расширение>, где ключ —
+# хэш версий таблиц, из которых отчёт читает (versions.py; версию таблицы
+# поднимает каждый COMMIT с записью в неё, см. querycache). Пока данные
+# не менялись, повторная выгрузка отдаётся с диска без запросов к БД.
+#
+# Задания выполняет пул потоков воркера, HTTP-запрос только ставит задание
+# и опрашивает статус, поэтому долгая выгрузка не упирается в timeout
+# gunicorn. Статус виден всем воркерам: рядом с файлом лежит манифест
+# <вид>-<ключ>.job ({'status': 'pending'|'failed', ...}).
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import database
+import item_analysis
+import querycache
+import reports
+import rollup
+import versions
+
+log = logging.getLogger(__name__)
+
+# tables — таблицы, от которых зависит содержимое; build(db, fileobj) пишет файл
+Report = namedtuple('Report', 'ext mimetype download_name tables build')
+
+
+def _build_progress_xlsx(db, fileobj):
+    reports.write_progress_xlsx(reports.iter_progress_rows(db), fileobj)
+
+
+def _build_progress_csv(db, fileobj):
+    for chunk in reports.iter_progress_csv(reports.iter_progress_rows(db)):
+        fileobj.write(chunk)
+
+
+def _build_progress_chart(db, fileobj):
+    data = rollup.read_rollup(db.cursor())
+    chart = {
+        'labels': [row['title'] for row in data],
+        'values': [row['viewed_count'] for row in data],
+        'passed': [row['passed_count'] for row in data],
+    }
+    fileobj.write(json.dumps(chart, ensure_ascii=False).encode('utf-8'))
+
+
+def _build_item_analysis(db, fileobj):
+    # Сама статистика сохраняется в таблицы; файл отмечает, для какой версии
+    # истории попыток она посчитана, и хранит сводку прогона
+    summary = item_analysis.run(db)
+    fileobj.write(json.dumps(summary).encode('utf-8'))
+
+
+REPORTS = {
+    'progress_xlsx': Report('xlsx', reports.XLSX_MIMETYPE, 'progress_report.xlsx',
+                            sorted(querycache.tables(reports.PROGRESS_EXPORT_QUERY)), _build_progress_xlsx),
+    'progress_csv': Report('csv', 'text/csv; charset=utf-8', 'progress_report.csv',
+                           sorted(querycache.tables(reports.PROGRESS_EXPORT_QUERY)), _build_progress_csv),
+    'progress_chart': Report('json', 'application/json', 'progress_chart.json',
+                             ['progress_rollup', 'topics'], _build_progress_chart),
+    'item_analysis': Report('json', 'application/json', 'item_analysis.json',
+                            ['results', 'result_answers'], _build_item_analysis),
+}
+
+
+def version_key(kind):
+    """Ключ текущей версии данных отчёта: меняется при записи в любую из его таблиц."""
+    version = ".".join(versions.current(querycache.table_tag(t)) for t in REPORTS[kind].tables)
+    return hashlib.sha1(version.encode('utf-8')).hexdigest()[:16]
+
+
+def is_valid_key(key):
+    return len(key) == 16 and all(c in '0123456789abcdef' for c in key)
+
+
+def _path(kind, key):
+    return os.path.join(config.REPORT_DIR, f"{kind}-{key}.{REPORTS[kind].ext}")
+
+
+def _manifest_path(kind, key):
+    return os.path.join(config.REPORT_DIR, f"{kind}-{key}.job")
+
+
+def _write_manifest(kind, key, manifest):
+    path = _manifest_path(kind, key)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read_manifest(kind, key):
+    try:
+        with open(_manifest_path(kind, key), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _is_stale(manifest):
+    """Задание осталось от упавшего процесса или зависло."""
+    if time.time() - manifest.get('started', 0) > config.REPORT_JOB_TIMEOUT:
+        return True
+    if manifest.get('host') != socket.gethostname():
+        return False
+    try:
+        os.kill(manifest['pid'], 0)
+    except ProcessLookupError:
+        return True
+    except (KeyError, PermissionError):
+        pass
+    return False
+
+
+def status(kind, key):
+    """{'status': 'ready'|'pending'|'failed', ...}; None — отчёта для этого ключа нет.
+
+    Сообщение об ошибке отдаётся один раз: следующий запрос поставит задание заново.
+    """
+    path = _path(kind, key)
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except FileNotFoundError:
+        pass
+    else:
+        # Без общего каталога версий записи других воркеров сюда не доходят
+        if config.CACHE_SHARED_DIR or age < config.REPORT_CACHE_TTL:
+            _touch(path)
+            return {'status': 'ready'}
+
+    manifest = _read_manifest(kind, key)
+    if manifest is None:
+        return None
+    if manifest['status'] == 'failed' or _is_stale(manifest):
+        try:
+            os.unlink(_manifest_path(kind, key))
+        except FileNotFoundError:
+            pass
+        return manifest if manifest['status'] == 'failed' else None
+    return manifest
+
+
+def _touch(path):
+    # Время последнего обращения — в atime: mtime остаётся временем построения
+    try:
+        os.utime(path, (time.time(), os.path.getmtime(path)))
+    except FileNotFoundError:
+        pass
+
+
+def result_path(kind, key):
+    """Путь к готовому файлу отчёта или None."""
+    state = status(kind, key)
+    return _path(kind, key) if state and state['status'] == 'ready' else None
+
+
+_executor = None
+_executor_pid = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=config.REPORT_WORKERS, thread_name_prefix='report')
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def _remove_old(kind, key):
+    """Удаляет файлы других версий, к которым не обращались REPORT_CACHE_TTL секунд.
+
+    Свежие не трогаем: их может ждать или скачивать другой администратор.
+    """
+    prefix, keep = f"{kind}-", os.path.basename(_path(kind, key))
+    ext = '.' + REPORTS[kind].ext
+    deadline = time.time() - config.REPORT_CACHE_TTL
+    for name in os.listdir(config.REPORT_DIR):
+        if not name.startswith(prefix) or not name.endswith(ext) or name == keep:
+            continue
+        path = os.path.join(config.REPORT_DIR, name)
+        if os.path.exists(path[:-len(ext)] + '.job'):
+            continue
+        try:
+            info = os.stat(path)
+            if max(info.st_mtime, info.st_atime) < deadline:
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def build(kind, key):
+    """Строит отчёт в этом потоке и атомарно публикует файл."""
+    report = REPORTS[kind]
+    started = time.perf_counter()
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=f".{kind}-", suffix='.tmp', dir=config.REPORT_DIR)
+        with os.fdopen(fd, 'wb') as f, database.connection() as db:
+            report.build(db, f)
+        os.replace(tmp, _path(kind, key))
+    except Exception as e:
+        log.exception("Не удалось построить отчёт %s", kind)
+        if tmp and os.path.exists(tmp):
+            os.unlink(tmp)
+        _write_manifest(kind, key, {'status': 'failed', 'error': str(e)})
+        return None
+    try:
+        os.unlink(_manifest_path(kind, key))
+    except FileNotFoundError:
+        pass
+    _remove_old(kind, key)
+    log.info("Отчёт %s построен за %.1f с", kind, time.perf_counter() - started)
+    return _path(kind, key)
+
+
+def submit(kind, key=None):
+    """Ставит построение отчёта в очередь, если его нет и он не строится.
+
+    Возвращает (ключ, статус). Повторный вызов из любого воркера,
+    пока задание идёт, только вернёт его статус.
+    """
+    key = key or version_key(kind)
+    state = status(kind, key)
+    if state is not None:
+        return key, state
+
+    os.makedirs(config.REPORT_DIR, exist_ok=True)
+    manifest = {'status': 'pending', 'pid': os.getpid(), 'host': socket.gethostname(), 'started': time.time()}
+    try:
+        # O_EXCL: из нескольких воркеров задание поставит только один
+        fd = os.open(_manifest_path(kind, key), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        return key, status(kind, key) or {'status': 'pending'}
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    with _lock:
+        _get_executor().submit(build, kind, key)
+    return key, manifest
+
+
+def load_json(kind):
+    """Данные JSON-отчёта текущей версии; строит его в этом потоке, если файла нет.
+
+    Для отчётов, которые считаются быстро (диаграмма по сводке)."""
+    key = version_key(kind)
+    path = result_path(kind, key)
+    if path is None:
+        os.makedirs(config.REPORT_DIR, exist_ok=True)
+        path = build(kind, key)
+        if path is None:
+            raise RuntimeError(f"Не удалось построить отчёт {kind}")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,240 @@
+# Метрики запросов: время ответа по маршрутам, число и время запросов к БД,
+# поиск N+1 (один и тот же SQL в цикле) и журнал медленных запросов с SQL.
+# /metrics отдаёт всё в текстовом формате Prometheus.
+#
+# Каждый воркер gunicorn копит свои счётчики. Если задан METRICS_DIR,
+# воркеры периодически сбрасывают их туда, и /metrics суммирует файлы
+# всех воркеров, так что не важно, в какой воркер пришёл сборщик.
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+
+import config
+import querycache
+
+log = logging.getLogger(__name__)
+
+# Границы корзин гистограммы времени ответа, сек
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_SPACES_RE = re.compile(r"\s+")
+_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+\b")
+
+
+def normalize(sql):
+    """Шаблон запроса: литералы заменены на ?, пробелы схлопнуты."""
+    return _SPACES_RE.sub(" ", _LITERAL_RE.sub("?", sql)).strip()
+
+
+class InstrumentedCursor(querycache.CachingCursor):
+    """Курсор, который считает запросы и их время в рамках текущего HTTP-запроса."""
+
+    def execute(self, query, args=None):
+        if not has_request_context() or 'db_stats' not in g:
+            return super().execute(query, args)
+
+        query = querycache.as_text(query, self._get_db().encoding)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            elapsed = time.perf_counter() - started
+            stats = g.db_stats
+            stats['count'] += 1
+            stats['seconds'] += elapsed
+            # Шаблон до подстановки параметров: запрос в цикле даёт один и тот же текст
+            stats['statements'][normalize(query)] += 1
+            if elapsed > stats['slowest'][0]:
+                stats['slowest'] = (elapsed, self._executed or query)
+
+
+def _empty_route():
+    return {'buckets': [0] * len(BUCKETS), 'count': 0, 'seconds': 0.0,
+            'db_queries': 0, 'db_seconds': 0.0, 'n_plus_one': 0}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._responses = Counter()   # (маршрут, статус) -> число ответов
+        self._dumped_at = 0.0
+
+    def _route(self, route):
+        data = self._routes.get(route)
+        if data is None:
+            data = self._routes[route] = _empty_route()
+        return data
+
+    def observe(self, route, status, seconds, db_queries, db_seconds, n_plus_one):
+        with self._lock:
+            data = self._route(route)
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    data['buckets'][i] += 1
+            data['count'] += 1
+            data['seconds'] += seconds
+            data['db_queries'] += db_queries
+            data['db_seconds'] += db_seconds
+            data['n_plus_one'] += n_plus_one
+            self._responses[(route, status)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'routes': {route: dict(data, buckets=list(data['buckets'])) for route, data in self._routes.items()},
+                'responses': [[route, status, n] for (route, status), n in self._responses.items()],
+            }
+
+    def dump(self, force=False):
+        """Сбрасывает счётчики воркера в METRICS_DIR (не чаще раза в METRICS_DUMP_INTERVAL)."""
+        if not config.METRICS_DIR:
+            return
+        now = time.monotonic()
+        if not force and now - self._dumped_at < config.METRICS_DUMP_INTERVAL:
+            return
+        self._dumped_at = now
+        os.makedirs(config.METRICS_DIR, exist_ok=True)
+        path = os.path.join(config.METRICS_DIR, f"worker-{os.getpid()}.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+
+_registry = None
+_registry_pid = None
+
+
+def get_registry():
+    global _registry, _registry_pid
+    # Счётчики, унаследованные от мастера при fork, воркеру не нужны
+    if _registry is None or _registry_pid != os.getpid():
+        _registry = Registry()
+        _registry_pid = os.getpid()
+    return _registry
+
+
+def _merge(target, snapshot):
+    for route, data in snapshot['routes'].items():
+        merged = target['routes'].setdefault(route, _empty_route())
+        for key, value in data.items():
+            if key == 'buckets':
+                merged['buckets'] = [a + b for a, b in zip(merged['buckets'], value)]
+            else:
+                merged[key] += value
+    for route, status, n in snapshot['responses']:
+        target['responses'][(route, status)] = target['responses'].get((route, status), 0) + n
+
+
+def collect():
+    """Счётчики всех воркеров (из METRICS_DIR) или только текущего."""
+    result = {'routes': {}, 'responses': {}}
+    own = get_registry().snapshot()
+    if config.METRICS_DIR and os.path.isdir(config.METRICS_DIR):
+        own_file = f"worker-{os.getpid()}.json"
+        for name in os.listdir(config.METRICS_DIR):
+            if not name.endswith(".json") or name == own_file:
+                continue
+            try:
+                with open(os.path.join(config.METRICS_DIR, name), encoding="utf-8") as f:
+                    _merge(result, json.load(f))
+            except (OSError, ValueError):
+                continue
+    _merge(result, own)
+    return result
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render(pool_stats=None, cache_stats=None, route_stats=None):
+    data = collect()
+    lines = [
+        "# HELP http_request_duration_seconds Время ответа по маршрутам",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for route, d in sorted(data['routes'].items()):
+        r = _label(route)
+        # Корзины уже накопительные: observe() увеличивает все границы >= времени ответа
+        for bound, n in zip(BUCKETS, d['buckets']):
+            lines.append(f'http_request_duration_seconds_bucket{{route="{r}",le="{bound}"}} {n}')
+        lines.append(f'http_request_duration_seconds_bucket{{route="{r}",le="+Inf"}} {d["count"]}')
+        lines.append(f'http_request_duration_seconds_sum{{route="{r}"}} {d["seconds"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{route="{r}"}} {d["count"]}')
+
+    lines += ["# HELP http_responses_total Ответы по маршрутам и статусам", "# TYPE http_responses_total counter"]
+    for (route, status), n in sorted(data['responses'].items()):
+        lines.append(f'http_responses_total{{route="{_label(route)}",status="{status}"}} {n}')
+
+    for name, key, help_text in (
+        ("db_queries_total", "db_queries", "Запросов к БД"),
+        ("db_query_seconds_total", "db_seconds", "Суммарное время запросов к БД, сек"),
+        ("db_n_plus_one_total", "n_plus_one", "HTTP-запросов с признаками N+1"),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for route, d in sorted(data['routes'].items()):
+            lines.append(f'{name}{{route="{_label(route)}"}} {d[key]}')
+
+    # Пул, кэш запросов и выбор реплики/основной БД — по текущему воркеру
+    for prefix, stats in (("db_pool", pool_stats), ("query_cache", cache_stats), ("db_route", route_stats)):
+        for key, value in sorted((stats or {}).items()):
+            lines.append(f"# TYPE {prefix}_{key} gauge")
+            lines.append(f"{prefix}_{key} {value}")
+
+    return "\n".join(lines) + "\n"
+
+
+def _route_name():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.db_stats = {'count': 0, 'seconds': 0.0, 'statements': Counter(), 'slowest': (0.0, None)}
+
+
+def _after_request(response):
+    g.response_status = response.status_code
+    return response
+
+
+def _teardown_request(exc=None):
+    started = g.pop('request_started', None)
+    stats = g.pop('db_stats', None)
+    if started is None or stats is None:
+        return
+    elapsed = time.perf_counter() - started
+    route = _route_name()
+    status = g.pop('response_status', 500)
+
+    repeated = [(sql, n) for sql, n in stats['statements'].items() if n >= config.N_PLUS_ONE_THRESHOLD]
+    for sql, n in repeated:
+        log.warning("N+1 в %s: запрос выполнен %d раз: %s", route, n, sql)
+
+    registry = get_registry()
+    registry.observe(route, status, elapsed, stats['count'], stats['seconds'], 1 if repeated else 0)
+    registry.dump()
+
+    if config.SLOW_REQUEST_MS and elapsed * 1000 >= config.SLOW_REQUEST_MS:
+        slowest_time, slowest_sql = stats['slowest']
+        log.warning(
+            "Медленный запрос %s %s: %.0f мс, запросов к БД %d (%.0f мс), самый долгий %.0f мс: %s\n%s",
+            request.method, request.full_path, elapsed * 1000, stats['count'], stats['seconds'] * 1000,
+            slowest_time * 1000, slowest_sql,
+            "\n".join(f"  {n} × {sql}" for sql, n in stats['statements'].most_common()),
+        )
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,436 @@
+# Версионные миграции схемы БД.
+# Каждый шаг идемпотентен: проверяет information_schema и ничего не делает,
+# если таблица/колонка/индекс уже на месте. Применённые версии хранятся
+# в таблице schema_version, поэтому повторный запуск upgrade() безопасен.
+# Для DB_BACKEND=sqlite итоговая схема создаётся из schema_sqlite.sql, а
+# недостающие в ней версии sqlite_backend.ensure_schema() применяет через
+# upgrade() при подключении; проверки колонок и индексов идут через PRAGMA.
+# Новую миграцию стоит отразить и в schema.sql, и в schema_sqlite.sql.
+
+import attempts
+import blobstore
+import catalog
+import config
+import invites
+import item_analysis
+import progress
+import question_import
+import quiz
+import reports
+import rollup
+import search
+from views import admin as admin_views
+from views import auth as auth_views
+from views import reports as report_views
+from views import user as user_views
+
+TABLES = {
+    'users': """
+        CREATE TABLE IF NOT EXISTS users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255),
+            full_name VARCHAR(255),
+            email VARCHAR(255) UNIQUE,
+            password VARCHAR(255),
+            role ENUM('user', 'admin') DEFAULT 'user',
+            is_confirmed BOOLEAN DEFAULT FALSE,
+            invite_token VARCHAR(64)
+        )
+    """,
+    'courses': """
+        CREATE TABLE IF NOT EXISTS courses (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(255),
+            title VARCHAR(255)
+        )
+    """,
+    'topics': """
+        CREATE TABLE IF NOT EXISTS topics (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            title VARCHAR(255),
+            course_id INT
+        )
+    """,
+    'materials': """
+        CREATE TABLE IF NOT EXISTS materials (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            topic_id INT,
+            content TEXT,
+            body TEXT,
+            file_path VARCHAR(512)
+        )
+    """,
+    'questions': """
+        CREATE TABLE IF NOT EXISTS questions (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            topic_id INT,
+            question_text TEXT
+        )
+    """,
+    'answers': """
+        CREATE TABLE IF NOT EXISTS answers (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            question_id INT,
+            answer_text TEXT,
+            is_correct BOOLEAN
+        )
+    """,
+    'results': """
+        CREATE TABLE IF NOT EXISTS results (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT,
+            topic_id INT,
+            score INT
+        )
+    """,
+    'course_progress': """
+        CREATE TABLE IF NOT EXISTS course_progress (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            topic_id INT NOT NULL,
+            viewed_materials BOOLEAN DEFAULT FALSE,
+            passed_test BOOLEAN DEFAULT FALSE,
+            test_score INT
+        )
+    """,
+}
+
+# Колонки, которых нет в исходном schema.sql, но которые использует app.py
+COLUMNS = [
+    ('users', 'full_name', "VARCHAR(255)"),
+    ('users', 'invite_token', "VARCHAR(64)"),
+    ('users', 'is_confirmed', "BOOLEAN DEFAULT FALSE"),
+    ('courses', 'name', "VARCHAR(255)"),
+    ('courses', 'title', "VARCHAR(255)"),
+    ('topics', 'course_id', "INT"),
+    ('materials', 'body', "TEXT"),
+    ('materials', 'file_path', "VARCHAR(512)"),
+]
+
+# Колонки, переименованные относительно исходного schema.sql: (таблица, было, стало, тип)
+RENAMES = [
+    ('questions', 'question', 'question_text', "TEXT"),
+    ('answers', 'answer', 'answer_text', "TEXT"),
+]
+
+INDEXES = [
+    ('topics', 'idx_topics_course', ['course_id']),
+    ('materials', 'idx_materials_topic', ['topic_id']),
+    ('questions', 'idx_questions_topic', ['topic_id']),
+    ('answers', 'idx_answers_question', ['question_id']),
+    ('users', 'idx_users_invite_token', ['invite_token']),
+    ('course_progress', 'idx_course_progress_topic', ['topic_id']),
+]
+
+
+def _column_exists(cursor, table, column):
+    if config.DB_BACKEND == 'sqlite':
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row['name'] == column for row in cursor.fetchall())
+    cursor.execute(
+        "SELECT COUNT(*) AS cnt FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        (table, column)
+    )
+    return cursor.fetchone()['cnt'] > 0
+
+
+def _has_index_on(cursor, table, columns):
+    # Подходит любой индекс, который начинается с нужных колонок
+    # (например, созданный InnoDB для внешнего ключа)
+    if config.DB_BACKEND == 'sqlite':
+        cursor.execute(f"PRAGMA index_list({table})")
+        names = [row['name'] for row in cursor.fetchall()]
+        indexes = {}
+        for name in names:
+            cursor.execute(f"PRAGMA index_info({name})")
+            indexes[name] = [row['name'] for row in sorted(cursor.fetchall(), key=lambda r: r['seqno'])]
+        return any(cols[:len(columns)] == columns for cols in indexes.values())
+    cursor.execute(
+        "SELECT index_name, seq_in_index, column_name FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s ORDER BY index_name, seq_in_index",
+        (table,)
+    )
+    indexes = {}
+    for row in cursor.fetchall():
+        indexes.setdefault(row['index_name'], []).append(row['column_name'])
+    return any(cols[:len(columns)] == columns for cols in indexes.values())
+
+
+def _index_exists(cursor, table, name):
+    if config.DB_BACKEND == 'sqlite':
+        cursor.execute(f"PRAGMA index_list({table})")
+        return any(row['name'] == name for row in cursor.fetchall())
+    cursor.execute(
+        "SELECT COUNT(*) AS cnt FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+        (table, name)
+    )
+    return cursor.fetchone()['cnt'] > 0
+
+
+def _create_tables(db):
+    cursor = db.cursor()
+    for ddl in TABLES.values():
+        cursor.execute(ddl)
+
+
+def _add_columns(db):
+    cursor = db.cursor()
+    for table, old, new, column_type in RENAMES:
+        if _column_exists(cursor, table, old) and not _column_exists(cursor, table, new):
+            cursor.execute(f"ALTER TABLE {table} CHANGE {old} {new} {column_type}")
+    for table, column, column_type in COLUMNS:
+        if not _column_exists(cursor, table, column):
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def _add_indexes(db):
+    cursor = db.cursor()
+    for table, name, columns in INDEXES:
+        if not _has_index_on(cursor, table, columns):
+            cursor.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+
+
+def _unique_progress(db):
+    progress.ensure_unique_key(db)
+
+
+def _progress_rollup(db):
+    cursor = db.cursor()
+    columns = ",\n".join(f"{col} INT NOT NULL DEFAULT 0" for col in rollup.HIST_COLUMNS)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS progress_rollup (
+            topic_id INT PRIMARY KEY,
+            viewed_count INT NOT NULL DEFAULT 0,
+            passed_count INT NOT NULL DEFAULT 0,
+            score_sum BIGINT NOT NULL DEFAULT 0,
+            score_count INT NOT NULL DEFAULT 0,
+            {columns}
+        )
+    """)
+    rollup.rebuild(db)
+
+
+def _material_blobs(db):
+    cursor = db.cursor()
+    if not _column_exists(cursor, 'materials', 'file_sha256'):
+        cursor.execute("ALTER TABLE materials ADD COLUMN file_sha256 CHAR(64)")
+    if not _has_index_on(cursor, 'materials', ['file_sha256']):
+        cursor.execute("CREATE INDEX idx_materials_file_sha256 ON materials (file_sha256)")
+
+
+def _test_settings(db):
+    cursor = db.cursor()
+    if not _column_exists(cursor, 'topics', 'questions_per_test'):
+        cursor.execute("ALTER TABLE topics ADD COLUMN questions_per_test INT")
+    if not _column_exists(cursor, 'topics', 'shuffle_answers'):
+        cursor.execute("ALTER TABLE topics ADD COLUMN shuffle_answers BOOLEAN NOT NULL DEFAULT FALSE")
+
+
+def _attempt_history(db):
+    cursor = db.cursor()
+    if not _column_exists(cursor, 'results', 'created_at'):
+        cursor.execute("ALTER TABLE results ADD COLUMN created_at DATETIME")
+    if not _has_index_on(cursor, 'results', ['topic_id']):
+        cursor.execute("CREATE INDEX idx_results_topic ON results (topic_id)")
+    if not _has_index_on(cursor, 'results', ['user_id', 'topic_id']):
+        cursor.execute("CREATE INDEX idx_results_user_topic ON results (user_id, topic_id)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS result_answers (
+            result_id INT NOT NULL,
+            question_id INT NOT NULL,
+            answer_id INT,
+            is_correct BOOLEAN NOT NULL DEFAULT FALSE,
+            PRIMARY KEY (result_id, question_id)
+        )
+    """)
+    # Результаты item_analysis.run(): таблицы целиком пересчитываются заданием
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS item_stats (
+            question_id INT PRIMARY KEY,
+            topic_id INT NOT NULL,
+            responses INT NOT NULL,
+            difficulty DOUBLE,
+            discrimination DOUBLE,
+            skip_rate DOUBLE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS answer_stats (
+            answer_id INT PRIMARY KEY,
+            question_id INT NOT NULL,
+            selection_rate DOUBLE NOT NULL
+        )
+    """)
+    columns = ",\n".join(f"{col} INT NOT NULL DEFAULT 0" for col in rollup.HIST_COLUMNS)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS topic_score_stats (
+            topic_id INT PRIMARY KEY,
+            attempts INT NOT NULL,
+            mean_score DOUBLE,
+            median_score DOUBLE,
+            {columns},
+            computed_at DATETIME
+        )
+    """)
+    if not _has_index_on(cursor, 'item_stats', ['topic_id']):
+        cursor.execute("CREATE INDEX idx_item_stats_topic ON item_stats (topic_id)")
+    if not _has_index_on(cursor, 'answer_stats', ['question_id']):
+        cursor.execute("CREATE INDEX idx_answer_stats_question ON answer_stats (question_id)")
+
+
+def _report_plans(db):
+    # Фильтр отчёта о прогрессе по началу ФИО (LIKE 'префикс%') без индекса
+    # сканирует users; в SQLite такой LIKE идёт по индексу только с NOCASE
+    cursor = db.cursor()
+    if not _has_index_on(cursor, 'users', ['full_name']):
+        collate = " COLLATE NOCASE" if config.DB_BACKEND == 'sqlite' else ""
+        cursor.execute(f"CREATE INDEX idx_users_full_name ON users (full_name{collate})")
+
+
+def _unique_invite_token(db):
+    # У подтверждённых сотрудников invite_token пуст (NULL), и по статистике
+    # обычного индекса значение выглядит неизбирательным: SQLite сканирует users.
+    # Уникальный индекс — поиск ссылки приглашения одной строкой; в SQLite он
+    # частичный (без NULL), в MySQL уникальный индекс и так допускает много NULL
+    cursor = db.cursor()
+    if _index_exists(cursor, 'users', 'uq_users_invite_token'):
+        return
+    cursor.execute("UPDATE users SET invite_token = NULL WHERE invite_token = ''")
+    if config.DB_BACKEND == 'sqlite':
+        cursor.execute("DROP INDEX IF EXISTS idx_users_invite_token")
+        cursor.execute("CREATE UNIQUE INDEX uq_users_invite_token ON users (invite_token) "
+                       "WHERE invite_token IS NOT NULL")
+        return
+    cursor.execute("CREATE UNIQUE INDEX uq_users_invite_token ON users (invite_token)")
+    if _index_exists(cursor, 'users', 'idx_users_invite_token'):
+        cursor.execute("DROP INDEX idx_users_invite_token ON users")
+
+
+# (версия, описание, шаг) — новые миграции только дописываются в конец
+MIGRATIONS = [
+    (1, "Таблицы, которые использует app.py", _create_tables),
+    (2, "Недостающие и переименованные колонки", _add_columns),
+    (3, "Вторичные индексы для выборок по id", _add_indexes),
+    (4, "Уникальный ключ course_progress (user_id, topic_id)", _unique_progress),
+    (5, "Сводка progress_rollup", _progress_rollup),
+    (6, "Хэш файла материала (хранилище загрузок)", _material_blobs),
+    (7, "Настройки теста темы: число вопросов и перемешивание ответов", _test_settings),
+    (8, "История попыток и статистика вопросов", _attempt_history),
+    (9, "Индекс ФИО для фильтра отчёта о прогрессе", _report_plans),
+    (10, "Уникальный индекс ссылки приглашения", _unique_invite_token),
+]
+
+
+def applied_versions(db):
+    cursor = db.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description VARCHAR(255),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_version")
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def upgrade(db):
+    """Применяет все ещё не применённые миграции по порядку, возвращает их список."""
+    done = applied_versions(db)
+    applied = []
+    for version, description, step in MIGRATIONS:
+        if version in done:
+            continue
+        step(db)
+        cursor = db.cursor()
+        cursor.execute(
+            "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+            (version, description)
+        )
+        db.commit()
+        applied.append((version, description))
+    return applied
+
+
+# Модули, чьи константы *_QUERY выполняют маршруты и фоновые задания —
+# и чтения, и записи. Проверяется ровно тот SQL, который они выполняют:
+# новая или изменённая константа попадает в flask db-check сама. Подсказки —
+# в EXPLAIN_HINTS модуля: 'params' (по умолчанию 1 на каждый %s), 'scans' —
+# таблицы (или их псевдонимы в запросе), которые запрос намеренно читает
+# целиком, и 'format' — чем заменить {поля} шаблона (по умолчанию
+# {placeholders} -> %s).
+QUERY_MODULES = (auth_views, user_views, admin_views, report_views,
+                 catalog, quiz, progress, rollup, attempts, invites, blobstore,
+                 question_import, search, reports, item_analysis)
+
+
+def _sample_filters(**values):
+    filters = reports.progress_filters({})
+    filters.update(values)
+    return filters
+
+
+def route_queries():
+    """[(имя, SQL, параметры, таблицы, которые можно сканировать)] для check_query_plans()."""
+    queries = []
+    for module in QUERY_MODULES:
+        hints = getattr(module, 'EXPLAIN_HINTS', {})
+        for name in sorted(vars(module)):
+            sql = getattr(module, name)
+            if not name.endswith('_QUERY') or not isinstance(sql, str):
+                continue
+            hint = hints.get(name, {})
+            for field, value in hint.get('format', {'placeholders': '%s'}).items():
+                sql = sql.replace('{' + field + '}', value)
+            params = hint.get('params', (1,) * sql.count('%s'))
+            queries.append((f"{module.__name__}.{name}", sql, params, hint.get('scans', set())))
+
+    # Страница и счётчик отчёта о прогрессе собираются из фильтров — проверяем
+    # те же построители, что и admin_progress, на типичных фильтрах
+    after = ('user@corp.com', 'Тема', 1)
+    for label, filters in (('topic', _sample_filters(topic_id=1)), ('name', _sample_filters(name='Ива'))):
+        sql, params = reports.progress_page_sql(filters)
+        queries.append((f"admin_progress page {label}", sql, params, set()))
+        sql, params = reports.progress_page_sql(filters, after=after)
+        queries.append((f"admin_progress next {label}", sql, params, set()))
+        sql, params = reports.progress_count_sql(filters)
+        queries.append((f"admin_progress count {label}", sql, params, set()))
+    # Без фильтров отчёт листает весь прогресс по индексу email,
+    # а общий счётчик считает все строки
+    sql, params = reports.progress_page_sql(_sample_filters(), after=after)
+    queries.append(("admin_progress next", sql, params, set()))
+    sql, params = reports.progress_count_sql(_sample_filters())
+    queries.append(("admin_progress count", sql, params, {'users', 'course_progress'}))
+    return queries
+
+
+def check_query_plans(db):
+    """EXPLAIN для запросов маршрутов; возвращает список полных сканов.
+
+    Имеет смысл на заполненной БД: на почти пустых таблицах оптимизатор
+    MySQL вправе выбрать полный скан даже при наличии индекса.
+    """
+    cursor = db.cursor()
+    problems = []
+    if config.DB_BACKEND == 'sqlite':
+        for route, sql, params, scans in route_queries():
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            for row in cursor.fetchall():
+                # "SCAN t" — полный проход, "SEARCH t USING INDEX ..." — по индексу,
+                # "SCAN n CONSTANT ROWS" — строки VALUES многострочного INSERT
+                detail = row['detail']
+                if (detail.startswith('SCAN ') and 'USING' not in detail and 'CONSTANT ROW' not in detail
+                        and detail.split()[1] not in scans):
+                    problems.append((route, detail.split()[1], " ".join(sql.split())))
+        return problems
+    for route, sql, params, scans in route_queries():
+        cursor.execute("EXPLAIN " + sql, params)
+        for row in cursor.fetchall():
+            # У INSERT ... VALUES целевая таблица всегда с type ALL, чтения в нём нет
+            if row.get('select_type') == 'INSERT':
+                continue
+            if row.get('type') == 'ALL' and row.get('table') not in scans:
+                problems.append((route, row.get('table'), " ".join(sql.split())))
+    return problems
@@ -0,0 +1,80 @@
+# Кэш отрисованных страниц сотрудника (каталог, материалы темы, материал).
+# Страница зависит только от контента курсов, поэтому ключ — (страница, id)
+# плюс версия контента: версии таблиц courses/topics/materials, которые
+# поднимаются при каждом COMMIT записи в них (см. querycache.py).
+# Браузер получает ETag/Last-Modified и при повторном визите получает 304
+# без обращения к БД и без рендеринга шаблона. Без CACHE_SHARED_DIR
+# правки из других воркеров видны не позже чем через PAGE_CACHE_TTL.
+# Страницы, отрисованные по данным реплики, не кэшируются и отдаются без
+# ETag: отстающая реплика закрепила бы старый контент под новой версией.
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import g, make_response, request
+
+import config
+import querycache
+import versions
+
+CONTENT_TABLES = ('courses', 'topics', 'materials')
+
+# (ключ, версия) -> (html, время рендеринга)
+_pages = OrderedDict()
+_lock = threading.Lock()
+
+
+def content_version():
+    version = ".".join(versions.current(querycache.table_tag(t)) for t in CONTENT_TABLES)
+    if not config.CACHE_SHARED_DIR:
+        # Сбросы из других воркеров сюда не доходят, поэтому версия
+        # дополнительно меняется раз в PAGE_CACHE_TTL секунд
+        version += f".{int(time.time() // config.PAGE_CACHE_TTL)}"
+    return version
+
+
+def _validators(response, etag, rendered_at=None):
+    response.set_etag(etag)
+    if rendered_at is not None:
+        response.last_modified = rendered_at
+    # Браузер хранит страницу, но каждый раз сверяется с сервером
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def cached_page(key, render):
+    """Ответ со страницей key; render() вызывается, только если кэш устарел.
+
+    render возвращает то же, что и view-функция. Ответы не 200 не кэшируются.
+    """
+    version = content_version()
+    etag = hashlib.sha1(repr((key, version)).encode()).hexdigest()
+    if etag in request.if_none_match:
+        return _validators(make_response('', 304), etag)
+
+    with _lock:
+        entry = _pages.get((key, version))
+        if entry is not None:
+            _pages.move_to_end((key, version))
+
+    if entry is None:
+        response = make_response(render())
+        if response.status_code != 200:
+            return response
+        # database._checkout_replica: страница читала с реплики
+        if g.get('db_replica') is not None:
+            return response
+        entry = (response.get_data(as_text=True), datetime.now(timezone.utc).replace(microsecond=0))
+        with _lock:
+            # Версия снята до рендеринга: правка во время него даст новый ключ
+            _pages[(key, version)] = entry
+            while len(_pages) > config.PAGE_CACHE_SIZE:
+                _pages.popitem(last=False)
+
+    html, rendered_at = entry
+    response = _validators(make_response(html), etag, rendered_at)
+    return response.make_conditional(request)
@@ -0,0 +1,189 @@
+# Фоновая генерация превью для файлов материалов.
+# PDF режется на PNG постранично через pdftoppm (poppler-utils),
+# PPTX сначала конвертируется в PDF через LibreOffice в headless-режиме.
+# Результат лежит в PREVIEW_CACHE_DIR/<sha256>/: page-001.png, ...,
+# thumb.png и manifest.json со статусом. Всё работает офлайн.
+# Неудачный рендер (ошибка с выводом stderr — в логе и в манифесте)
+# через PREVIEW_RETRY_AFTER секунд снова можно поставить в очередь.
+
+import glob
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+log = logging.getLogger(__name__)
+
+PDF_EXTENSIONS = {'.pdf'}
+SLIDE_EXTENSIONS = {'.pptx', '.ppt', '.odp'}
+PREVIEW_EXTENSIONS = PDF_EXTENSIONS | SLIDE_EXTENSIONS
+
+
+def can_preview(file_path):
+    return bool(file_path) and os.path.splitext(file_path)[1].lower() in PREVIEW_EXTENSIONS
+
+
+def _cache_dir(sha256):
+    return os.path.join(config.PREVIEW_CACHE_DIR, sha256)
+
+
+# Сколько последних символов stderr утилиты сохранять в сообщении об ошибке
+STDERR_TAIL = 2000
+
+
+def _run(args, cwd=None):
+    try:
+        subprocess.run(args, cwd=cwd, check=True, timeout=config.PREVIEW_TIMEOUT,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        stderr = (e.stderr or b'').decode('utf-8', 'replace').strip()[-STDERR_TAIL:]
+        if isinstance(e, subprocess.TimeoutExpired):
+            reason = f"не уложился в {config.PREVIEW_TIMEOUT} с"
+        else:
+            reason = f"завершился с кодом {e.returncode}"
+        raise RuntimeError(f"{os.path.basename(args[0])} {reason}: {stderr or 'stderr пуст'}") from e
+
+
+def _to_pdf(src_path, work_dir):
+    ext = os.path.splitext(src_path)[1].lower()
+    if ext in PDF_EXTENSIONS:
+        return src_path
+
+    # Отдельный профиль LibreOffice, чтобы параллельные конвертации не мешали друг другу
+    profile = os.path.join(work_dir, 'lo-profile')
+    _run([config.PREVIEW_SOFFICE, f'-env:UserInstallation=file://{profile}',
+          '--headless', '--convert-to', 'pdf', '--outdir', work_dir, src_path])
+    pdf_path = os.path.join(work_dir, os.path.splitext(os.path.basename(src_path))[0] + '.pdf')
+    if not os.path.isfile(pdf_path):
+        raise RuntimeError("LibreOffice не создал PDF")
+    return pdf_path
+
+
+def render(src_path, out_dir):
+    """Рендерит превью файла в out_dir и возвращает число страниц."""
+    with tempfile.TemporaryDirectory(prefix='preview-') as work_dir:
+        pdf_path = _to_pdf(src_path, work_dir)
+
+        _run([config.PREVIEW_PDFTOPPM, '-png', '-scale-to', str(config.PREVIEW_WIDTH),
+              pdf_path, os.path.join(work_dir, 'page')])
+        # pdftoppm дополняет номер нулями в зависимости от числа страниц
+        pages = sorted(glob.glob(os.path.join(work_dir, 'page-*.png')),
+                       key=lambda p: int(p.rsplit('-', 1)[1].split('.')[0]))
+        if not pages:
+            raise RuntimeError("pdftoppm не создал ни одной страницы")
+        for number, page in enumerate(pages, start=1):
+            shutil.move(page, os.path.join(out_dir, f'page-{number:03d}.png'))
+
+        _run([config.PREVIEW_PDFTOPPM, '-png', '-singlefile', '-f', '1', '-l', '1',
+              '-scale-to', str(config.PREVIEW_THUMB_WIDTH), pdf_path, os.path.join(out_dir, 'thumb')])
+
+    return len(pages)
+
+
+def _write_manifest(directory, manifest):
+    with open(os.path.join(directory, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+
+def build(sha256, src_path):
+    """Строит превью и атомарно публикует каталог в кэше."""
+    target = _cache_dir(sha256)
+    os.makedirs(config.PREVIEW_CACHE_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f'.{sha256[:8]}-', dir=config.PREVIEW_CACHE_DIR)
+    try:
+        pages = render(src_path, tmp_dir)
+        manifest = {'status': 'ready', 'pages': pages}
+    except Exception as e:
+        log.warning("Не удалось построить превью %s: %s", src_path, e)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        manifest = {'status': 'failed', 'pages': 0, 'error': str(e), 'failed_at': time.time()}
+
+    _write_manifest(tmp_dir, manifest)
+    if _is_expired(_read_manifest(target)):
+        # Повтор после неудачи: старый каталог с манифестом 'failed' убираем
+        shutil.rmtree(target, ignore_errors=True)
+    try:
+        os.rename(tmp_dir, target)
+    except OSError:
+        # Каталог уже опубликовал другой воркер
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return manifest
+
+
+_executor = None
+_executor_pid = None
+_in_flight = set()
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=config.PREVIEW_WORKERS, thread_name_prefix='preview')
+        _executor_pid = os.getpid()
+        _in_flight.clear()
+    return _executor
+
+
+def _build_and_release(sha256, src_path):
+    try:
+        build(sha256, src_path)
+    finally:
+        with _lock:
+            _in_flight.discard(sha256)
+
+
+def submit(sha256, src_path):
+    """Ставит файл в очередь на рендер, если превью ещё нет и оно не строится."""
+    if not sha256 or not can_preview(src_path) or status(sha256):
+        return
+    with _lock:
+        executor = _get_executor()
+        if sha256 in _in_flight:
+            return
+        _in_flight.add(sha256)
+    executor.submit(_build_and_release, sha256, src_path)
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, 'manifest.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _is_expired(manifest):
+    """Неудачный рендер, который пора повторить."""
+    return (manifest is not None and manifest['status'] == 'failed'
+            and time.time() - manifest.get('failed_at', 0) > config.PREVIEW_RETRY_AFTER)
+
+
+def status(sha256):
+    """Манифест превью; {'status': 'pending'} пока строится; None — если не заказано
+    или прошлая неудача старше PREVIEW_RETRY_AFTER."""
+    with _lock:
+        if sha256 in _in_flight:
+            return {'status': 'pending', 'pages': 0}
+    manifest = _read_manifest(_cache_dir(sha256))
+    if _is_expired(manifest):
+        return None
+    return manifest
+
+
+def page_path(sha256, page):
+    path = os.path.join(_cache_dir(sha256), f'page-{page:03d}.png')
+    return path if os.path.isfile(path) else None
+
+
+def thumbnail_path(sha256):
+    path = os.path.join(_cache_dir(sha256), 'thumb.png')
+    return path if os.path.isfile(path) else None
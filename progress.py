@@ -0,0 +1,197 @@
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+
+import config
+import database
+import rollup
+
+log = logging.getLogger(__name__)
+
+# Требует уникального ключа (user_id, topic_id), см. ensure_unique_key().
+# Без флага CLIENT.FOUND_ROWS MySQL возвращает rowcount 1 для новой строки,
+# 2 — если строка изменилась и 0 — если материалы уже были отмечены.
+UPSERT_VIEW_QUERY = """
+    INSERT INTO course_progress (user_id, topic_id, viewed_materials)
+    VALUES (%s, %s, TRUE)
+    ON DUPLICATE KEY UPDATE viewed_materials = TRUE
+"""
+
+# Прежняя строка прогресса — ради сводки progress_rollup в record_test()
+PROGRESS_ROW_QUERY = """
+    SELECT viewed_materials, passed_test, test_score FROM course_progress
+    WHERE user_id = %s AND topic_id = %s FOR UPDATE
+"""
+
+# Отложенная запись просмотров (_write_views): какие из пар уже отмечены
+VIEWED_PAIRS_QUERY = """
+    SELECT user_id, topic_id FROM course_progress
+    WHERE (user_id, topic_id) IN ({pairs}) AND viewed_materials = TRUE FOR UPDATE
+"""
+
+UPSERT_TEST_QUERY = """
+    INSERT INTO course_progress (user_id, topic_id, passed_test, viewed_materials, test_score)
+    VALUES (%s, %s, TRUE, FALSE, %s)
+    ON DUPLICATE KEY UPDATE passed_test = TRUE, test_score = VALUES(test_score)
+"""
+
+# Подсказки для flask db-check (migrations.route_queries): как подставить
+# список пар в VIEWED_PAIRS_QUERY для EXPLAIN
+EXPLAIN_HINTS = {
+    'VIEWED_PAIRS_QUERY': {'format': {'pairs': '(%s, %s)'}},
+}
+
+
+def record_view(db, user_id, topic_id):
+    """Отмечает, что сотрудник открыл материалы темы."""
+    if config.PROGRESS_WRITE_BEHIND:
+        get_view_buffer().add(user_id, topic_id)
+        return
+
+    cursor = db.cursor()
+    cursor.execute(UPSERT_VIEW_QUERY, (user_id, topic_id))
+    if cursor.rowcount:
+        rollup.record_views(cursor, {topic_id: 1})
+    db.commit()
+    cursor.close()
+
+
+def record_test(db, user_id, topic_id, score):
+    """Сохраняет результат теста одним upsert'ом.
+
+    Старая строка читается с блокировкой только ради сводки progress_rollup:
+    ей нужен прежний балл, чтобы поправить гистограмму.
+    """
+    cursor = db.cursor()
+    cursor.execute(PROGRESS_ROW_QUERY, (user_id, topic_id))
+    existing = cursor.fetchone()
+    cursor.execute(UPSERT_TEST_QUERY, (user_id, topic_id, score))
+
+    updated = dict(existing or {'viewed_materials': False}, passed_test=True, test_score=score)
+    rollup.record_change(cursor, topic_id, existing, updated)
+    db.commit()
+    cursor.close()
+
+
+def _write_views(db, pairs):
+    cursor = db.cursor()
+    # Блокируем уже существующие строки, чтобы точно знать, какие просмотры новые
+    pair_placeholders = ", ".join(["(%s, %s)"] * len(pairs))
+    cursor.execute(VIEWED_PAIRS_QUERY.format(pairs=pair_placeholders), [value for pair in pairs for value in pair])
+    already_viewed = {(row['user_id'], row['topic_id']) for row in cursor.fetchall()}
+
+    cursor.executemany(UPSERT_VIEW_QUERY, pairs)
+
+    new_views = Counter(topic_id for user_id, topic_id in pairs if (user_id, topic_id) not in already_viewed)
+    rollup.record_views(cursor, new_views)
+    db.commit()
+    cursor.close()
+
+
+class ViewBuffer:
+    """Буфер событий «материалы просмотрены» для отложенной записи.
+
+    Повторные просмотры одной темы одним сотрудником схлопываются.
+    Фоновый поток пишет буфер раз в interval секунд или сразу,
+    как только набралось batch_size событий.
+    """
+
+    def __init__(self, batch_size, interval):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pid = os.getpid()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='progress-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def add(self, user_id, topic_id):
+        with self._lock:
+            self._pending.add((user_id, topic_id))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Не удалось записать просмотры материалов")
+
+    def flush(self):
+        with self._lock:
+            pairs, self._pending = sorted(self._pending), set()
+        if not pairs:
+            return 0
+
+        try:
+            with database.connection() as db:
+                _write_views(db, pairs)
+        except Exception:
+            # Вернём события в буфер, попробуем в следующий раз
+            with self._lock:
+                self._pending.update(pairs)
+            raise
+        return len(pairs)
+
+
+_view_buffer = None
+_view_buffer_lock = threading.Lock()
+
+
+def get_view_buffer():
+    global _view_buffer
+    if _view_buffer is None or _view_buffer.pid != os.getpid():
+        with _view_buffer_lock:
+            if _view_buffer is None or _view_buffer.pid != os.getpid():
+                _view_buffer = ViewBuffer(config.PROGRESS_BATCH_SIZE, config.PROGRESS_FLUSH_INTERVAL)
+    return _view_buffer
+
+
+def ensure_unique_key(db):
+    """Схлопывает дубликаты course_progress и добавляет уникальный ключ (user_id, topic_id)."""
+    if config.DB_BACKEND == 'sqlite':
+        # В schema_sqlite.sql ключ создаётся вместе с таблицей
+        return 0
+    cursor = db.cursor()
+    cursor.execute("""
+        SELECT COUNT(*) AS cnt FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'course_progress'
+          AND index_name = 'uq_course_progress_user_topic'
+    """)
+    if cursor.fetchone()['cnt']:
+        return 0
+
+    cursor.execute("""
+        CREATE TEMPORARY TABLE course_progress_dups AS
+        SELECT user_id, topic_id,
+               MAX(viewed_materials) AS viewed_materials,
+               MAX(passed_test) AS passed_test,
+               MAX(test_score) AS test_score
+        FROM course_progress
+        GROUP BY user_id, topic_id
+        HAVING COUNT(*) > 1
+    """)
+    merged = cursor.rowcount
+    cursor.execute("""
+        DELETE course_progress FROM course_progress
+        JOIN course_progress_dups USING (user_id, topic_id)
+    """)
+    cursor.execute("""
+        INSERT INTO course_progress (user_id, topic_id, viewed_materials, passed_test, test_score)
+        SELECT user_id, topic_id, viewed_materials, passed_test, test_score FROM course_progress_dups
+    """)
+    db.commit()
+    cursor.execute("DROP TEMPORARY TABLE course_progress_dups")
+    cursor.execute(
+        "ALTER TABLE course_progress ADD UNIQUE KEY uq_course_progress_user_topic (user_id, topic_id)"
+    )
+    cursor.close()
+    return merged
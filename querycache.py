@@ -0,0 +1,214 @@
+# Кэш результатов SELECT на уровне курсора (read-through).
+#
+# Ключ — итоговый текст запроса с подставленными параметрами. Результат
+# помечается тегами — таблицами, из которых он читает. Запись в таблицу
+# (INSERT/UPDATE/DELETE, изменившие строки, и DDL) после COMMIT поднимает версию тега
+# (versions.bump('table:<имя>')), и записи с устаревшей версией больше не
+# отдаются. Вытеснение — LRU по QUERY_CACHE_SIZE плюс TTL.
+#
+# Кэшируются только запросы к таблицам из QUERY_CACHE_TABLES (контент,
+# который правит админка); пользователи, прогресс и т.п. всегда читаются
+# из БД. Маршрут может отказаться от кэша декоратором @no_query_cache.
+# Соединения с репликами читают из кэша, но не пишут в него: отстающая
+# реплика вернула бы старые строки под только что поднятой версией тега.
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import pymysql
+from flask import g, has_app_context
+
+import config
+import versions
+
+TABLE_RE = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+`?(\w+)`?", re.IGNORECASE)
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+# DDL в MySQL коммитит транзакцию неявно
+DDL_PREFIXES = ('ALTER', 'CREATE', 'DROP', 'TRUNCATE', 'RENAME')
+LOCKING_RE = re.compile(r"\bFOR\s+UPDATE\b|\bLOCK\s+IN\s+SHARE\s+MODE\b", re.IGNORECASE)
+
+
+def tables(sql):
+    return {name.lower() for name in TABLE_RE.findall(sql)}
+
+
+def as_text(query, encoding):
+    # executemany склеивает многострочный INSERT в bytearray
+    if isinstance(query, (bytes, bytearray)):
+        return bytes(query).decode(encoding, 'surrogateescape')
+    return query
+
+
+def table_tag(table):
+    return 'table:' + table
+
+
+class QueryCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()   # sql -> (expires, {тег: версия}, description, rows)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0, 'bypassed': 0}
+
+    def get(self, sql):
+        with self._lock:
+            entry = self._entries.get(sql)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+        expires, tag_versions, description, rows = entry
+        # С CACHE_SHARED_DIR версии читаются из файлов, поэтому не под блокировкой
+        fresh = time.monotonic() < expires and all(versions.current(t) == v for t, v in tag_versions.items())
+
+        with self._lock:
+            if fresh:
+                if sql in self._entries:
+                    self._entries.move_to_end(sql)
+                self._stats['hits'] += 1
+                return description, rows
+            if self._entries.get(sql) is entry:
+                del self._entries[sql]
+            self._stats['stale'] += 1
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, sql, tag_versions, description, rows):
+        with self._lock:
+            self._entries[sql] = (time.monotonic() + self.ttl, tag_versions, description, rows)
+            self._entries.move_to_end(sql)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def bypass(self):
+        with self._lock:
+            self._stats['bypassed'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(size=len(self._entries), maxsize=self.maxsize, ttl=self.ttl)
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = QueryCache(config.QUERY_CACHE_SIZE, config.QUERY_CACHE_TTL)
+    return _cache
+
+
+def invalidate_tables(names):
+    for name in names:
+        versions.bump(table_tag(name))
+
+
+def no_query_cache(f):
+    """Маршрут всегда читает из БД, минуя кэш запросов."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.no_query_cache = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def _enabled():
+    if not config.QUERY_CACHE_SIZE:
+        return False
+    return not (has_app_context() and g.get('no_query_cache'))
+
+
+class CachingCursor(pymysql.cursors.DictCursor):
+    """DictCursor, который отдаёт SELECT из кэша и помечает таблицы для сброса."""
+
+    def execute(self, query, args=None):
+        if args is not None:
+            query = self.mogrify(query, args)
+        conn = self._get_db()
+        query = as_text(query, conn.encoding)
+        head = query.lstrip()[:8].upper()
+
+        if head.startswith(WRITE_PREFIXES):
+            result = super().execute(query)
+            # Запись, не изменившая ни одной строки (повторный upsert просмотра),
+            # не сбрасывает кэши, версии отчётов и не закрепляет сессию за основной БД
+            if self.rowcount:
+                conn.dirty_tables.update(tables(query))
+            return result
+        if head.startswith(DDL_PREFIXES):
+            result = super().execute(query)
+            dirty, conn.dirty_tables = conn.dirty_tables | tables(query), set()
+            invalidate_tables(dirty)
+            return result
+
+        names = tables(query) if head.startswith('SELECT') else None
+        # Внутри транзакции с незакоммиченной записью читаем свои изменения из БД
+        if (not names or conn.dirty_tables or not names <= config.QUERY_CACHE_TABLES
+                or LOCKING_RE.search(query) or not _enabled()):
+            if names:
+                get_cache().bypass()
+            return super().execute(query)
+
+        cache = get_cache()
+        cached = cache.get(query)
+        if cached is not None:
+            while self.nextset():
+                pass
+            self._clear_result()
+            self.description, rows = cached
+            self._rows = [dict(row) for row in rows]
+            self.rowcount = len(rows)
+            self._executed = query
+            return self.rowcount
+
+        # Версии снимаются до запроса: если запись закоммитят, пока он идёт,
+        # результат сразу окажется устаревшим, а не закэшируется надолго
+        tag_versions = {table_tag(name): versions.current(table_tag(name)) for name in names}
+        result = super().execute(query)
+        if not conn.fills_cache:
+            return result
+        rows = tuple(dict(row) for row in self._rows or ())
+        cache.put(query, tag_versions, self.description, rows)
+        return result
+
+
+class InvalidateOnCommit:
+    """Примесь к соединению: после COMMIT сбрасывает кэш по изменённым таблицам."""
+
+    # False у реплик: их результаты могут отставать от версий тегов
+    fills_cache = True
+
+    def __init__(self, *args, **kwargs):
+        self.dirty_tables = set()
+        super().__init__(*args, **kwargs)
+
+    def commit(self):
+        super().commit()
+        dirty, self.dirty_tables = self.dirty_tables, set()
+        invalidate_tables(dirty)
+        if dirty and has_app_context():
+            # По этому флагу database.py закрепляет сессию за основной БД
+            g.db_wrote = True
+
+    def rollback(self):
+        self.dirty_tables = set()
+        super().rollback()
+
+
+class CachingConnection(InvalidateOnCommit, pymysql.connections.Connection):
+    """Соединение с MySQL, которое после COMMIT сбрасывает кэш по изменённым таблицам."""
@@ -0,0 +1,117 @@
+# Массовый импорт вопросов теста из XLSX/CSV.
+# Формат: первая строка — заголовок, далее по строке на вопрос:
+#   Вопрос | Ответ 1 | Ответ 2 | ... | Ответ N | Номер правильного ответа
+# Число колонок с ответами берётся из заголовка (минимум два).
+
+import time
+
+import quiz
+import search
+
+# Блокировка темы: пока идёт импорт, другой импорт в ту же тему ждёт
+LOCK_TOPIC_QUERY = "SELECT id FROM topics WHERE id = %s FOR UPDATE"
+INSERT_QUESTIONS_QUERY = "INSERT INTO questions (topic_id, question_text) VALUES (%s, %s)"
+# Только что вставленные вопросы — последние по id в этой теме
+INSERTED_QUESTIONS_QUERY = "SELECT id, question_text FROM questions WHERE topic_id = %s ORDER BY id DESC LIMIT %s"
+INSERT_ANSWERS_QUERY = "INSERT INTO answers (question_id, answer_text, is_correct) VALUES (%s, %s, %s)"
+
+MIN_ANSWERS = 2
+
+
+class QuestionImportError(ValueError):
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def parse(rows):
+    """Проверяет таблицу и возвращает [(текст, [ответы], индекс правильного)]."""
+    if not rows:
+        raise QuestionImportError(["Файл пустой"])
+
+    header, data = rows[0], rows[1:]
+    answer_count = len(header) - 2
+    if answer_count < MIN_ANSWERS:
+        raise QuestionImportError([
+            "В заголовке должны быть колонки: вопрос, не меньше двух ответов и номер правильного"
+        ])
+    if not data:
+        raise QuestionImportError(["В файле нет ни одного вопроса"])
+
+    questions = []
+    errors = []
+    for line, row in enumerate(data, start=2):
+        row = (row + [''] * len(header))[:len(header)]
+        text, answers, correct = row[0], row[1:-1], row[-1]
+
+        if not text:
+            errors.append(f"Строка {line}: пустой текст вопроса")
+            continue
+        empty = [str(i) for i, a in enumerate(answers, start=1) if not a]
+        if empty:
+            errors.append(f"Строка {line}: пустые варианты ответа {', '.join(empty)}")
+            continue
+        try:
+            correct_index = int(correct) - 1
+        except ValueError:
+            errors.append(f"Строка {line}: должен быть указан ровно один номер правильного ответа, а не «{correct}»")
+            continue
+        if not 0 <= correct_index < answer_count:
+            errors.append(f"Строка {line}: номер правильного ответа должен быть от 1 до {answer_count}")
+            continue
+
+        questions.append((text, answers, correct_index))
+
+    if errors:
+        raise QuestionImportError(errors)
+    return questions
+
+
+def import_questions(db, topic_id, questions):
+    """Вставляет вопросы и ответы одной транзакцией.
+
+    executemany в pymysql склеивает INSERT в многострочные VALUES,
+    так что 200 вопросов — это несколько запросов, а не тысяча.
+    Возвращает список (id вопроса, текст) и отчёт с числом строк и временем.
+    """
+    started = time.perf_counter()
+    cursor = db.cursor()
+    try:
+        cursor.execute(LOCK_TOPIC_QUERY, (topic_id,))
+        if not cursor.fetchone():
+            raise QuestionImportError(["Тема не найдена"])
+
+        cursor.executemany(INSERT_QUESTIONS_QUERY, [(topic_id, text) for text, _, _ in questions])
+        cursor.execute(INSERTED_QUESTIONS_QUERY, (topic_id, len(questions)))
+        inserted = list(reversed(cursor.fetchall()))
+        if [row['question_text'] for row in inserted] != [text for text, _, _ in questions]:
+            raise RuntimeError("Не удалось сопоставить id вставленных вопросов")
+
+        answer_rows = [
+            (row['id'], answer, 1 if i == correct_index else 0)
+            for row, (_, answers, correct_index) in zip(inserted, questions)
+            for i, answer in enumerate(answers)
+        ]
+        cursor.executemany(INSERT_ANSWERS_QUERY, answer_rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    report = {
+        'questions': len(inserted),
+        'answers': len(answer_rows),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    return [(row['id'], row['question_text']) for row in inserted], report
+
+
+def import_rows(db, topic_id, rows):
+    """Импорт строк таблицы в тему: сбрасывает ключ ответов теста и дополняет поиск."""
+    inserted, report = import_questions(db, topic_id, parse(rows))
+    quiz.invalidate(topic_id)
+    for question_id, question_text in inserted:
+        search.index_question({'id': question_id, 'topic_id': topic_id, 'question_text': question_text})
+    return report
@@ -0,0 +1,190 @@
+import random
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+import config
+import database
+
+# Пул вопросов темы в компактном виде, собирается одним запросом:
+#   questions — {question_id: (текст, ((answer_id, текст ответа), ...))} в порядке id
+#   key       — {question_id: frozenset(id правильных ответов)}
+#   per_test  — сколько вопросов выдавать в попытке (None — все)
+#   shuffle   — перемешивать ли порядок ответов
+#   version   — контрольная сумма набора вопросов, ответов и per_test
+TopicPool = namedtuple('TopicPool', 'questions key per_test shuffle version')
+
+# Ключ сессии: {str(topic_id): [зерно выборки, время выдачи, версия пула]} —
+# начатые попытки. Сессия живёт в cookie (до ~4 КБ), поэтому id вопросов
+# не храним: draw() повторяет выборку по зерну, а версия пула гарантирует,
+# что пул с момента выдачи не менялся и выборка та же
+ATTEMPTS_SESSION_KEY = '_quiz_attempts_v2'
+# Прежние ключи (списки id вопросов; зерно без версии пула) — убираем из сессий
+LEGACY_SESSION_KEYS = ('_quiz_attempts', '_quiz_draws')
+# Больше начатых попыток в сессии не держим: вытесняется самая старая
+MAX_OPEN_ATTEMPTS = 20
+
+SETTINGS_QUERY = "SELECT questions_per_test, shuffle_answers FROM topics WHERE id = %s"
+
+POOL_QUERY = """
+    SELECT q.id AS question_id, q.question_text,
+           a.id AS answer_id, a.answer_text, a.is_correct
+    FROM questions q
+    LEFT JOIN answers a ON a.question_id = q.id
+    WHERE q.topic_id = %s
+    ORDER BY q.id, a.id
+"""
+
+# topic_id -> (время загрузки, TopicPool)
+_pools = {}
+_lock = threading.Lock()
+
+
+def load_pool(cursor, topic_id):
+    """Загружает настройки теста и вопросы темы с ответами, обновляет кэш."""
+    cursor.execute(SETTINGS_QUERY, (topic_id,))
+    settings = cursor.fetchone() or {}
+
+    cursor.execute(POOL_QUERY, (topic_id,))
+
+    texts = {}
+    answers = {}
+    key = {}
+    for row in cursor.fetchall():
+        q_id = row['question_id']
+        if q_id not in texts:
+            texts[q_id] = row['question_text']
+            answers[q_id] = []
+            key[q_id] = set()
+        if row['answer_id'] is None:
+            continue
+        answers[q_id].append((row['answer_id'], row['answer_text']))
+        if row['is_correct']:
+            key[q_id].add(row['answer_id'])
+
+    questions = {q_id: (text, tuple(answers[q_id])) for q_id, text in texts.items()}
+    per_test = settings.get('questions_per_test') or None
+    # Правка текста не меняет выборку и проверку, поэтому в версию идут только id
+    shape = (per_test, [(q_id, [a_id for a_id, _ in q_answers], sorted(key[q_id]))
+                        for q_id, (_, q_answers) in questions.items()])
+    pool = TopicPool(
+        questions=questions,
+        key={q_id: frozenset(ids) for q_id, ids in key.items()},
+        per_test=per_test,
+        shuffle=bool(settings.get('shuffle_answers')),
+        version=zlib.crc32(repr(shape).encode()),
+    )
+    with _lock:
+        _pools[topic_id] = (time.monotonic(), pool)
+    return pool
+
+
+def get_pool(topic_id):
+    with _lock:
+        cached = _pools.get(topic_id)
+    # TTL ограничивает устаревание в других воркерах gunicorn,
+    # куда не доходит invalidate() из админки
+    if cached and time.monotonic() - cached[0] < config.QUIZ_CACHE_TTL:
+        return cached[1]
+    # Ключ ответов кэшируется на QUIZ_CACHE_TTL, поэтому читаем его с основной БД:
+    # с отстающей реплики проверка шла бы по старому ключу
+    with database.get_primary_db().cursor() as cursor:
+        return load_pool(cursor, topic_id)
+
+
+def is_sampled(pool):
+    """В попытке выдаётся случайная часть вопросов темы, а не все."""
+    return bool(pool.per_test and pool.per_test < len(pool.questions))
+
+
+def draw(pool, seed=None):
+    """Id вопросов попытки: per_test случайных (одни и те же для одного seed) или все по порядку."""
+    ids = list(pool.questions)
+    if is_sampled(pool):
+        return random.Random(seed).sample(ids, pool.per_test)
+    return ids
+
+
+def started_attempt(drawn, topic_id):
+    """(зерно, версия пула) начатой попытки по теме из словаря сессии или None."""
+    entry = drawn.get(str(topic_id))
+    if entry and time.time() - entry[1] <= config.QUIZ_ATTEMPT_TTL:
+        return entry[0], entry[2]
+    return None
+
+
+def issued_questions(pool, attempt):
+    """Id вопросов, выданных в попытке, или None, если пул с момента выдачи изменился."""
+    if attempt is None:
+        return None
+    seed, version = attempt
+    if version != pool.version:
+        return None
+    return draw(pool, seed)
+
+
+def open_attempt(drawn, topic_id, pool):
+    """Начинает попытку: кладёт зерно и версию пула в словарь сессии, убирая просроченные записи."""
+    now = int(time.time())
+    for name, entry in list(drawn.items()):
+        if now - entry[1] > config.QUIZ_ATTEMPT_TTL:
+            del drawn[name]
+    while len(drawn) >= MAX_OPEN_ATTEMPTS:
+        del drawn[min(drawn, key=lambda name: drawn[name][1])]
+    seed = random.getrandbits(32)
+    drawn[str(topic_id)] = [seed, now, pool.version]
+    return seed
+
+
+def render_questions(pool, question_ids, rng=random):
+    """Вопросы попытки в виде, который ждёт user_test.html."""
+    question_data = []
+    for q_id in question_ids:
+        text, answers = pool.questions[q_id]
+        answers = [{"id": a_id, "text": a_text} for a_id, a_text in answers]
+        if pool.shuffle:
+            rng.shuffle(answers)
+        question_data.append({"id": q_id, "question": text, "answers": answers})
+    return question_data
+
+
+def responses(answer_key, form, question_ids=None):
+    """Ответы попытки: [(question_id, answer_id или None, верно ли)].
+
+    question_ids — вопросы, выданные в попытке; ответы на другие вопросы
+    темы не учитываются. Вопросы, которых уже нет в ключе, пропускаются.
+    """
+    if question_ids is None:
+        question_ids = answer_key
+    result = []
+    for q_id in question_ids:
+        correct_ids = answer_key.get(q_id)
+        if correct_ids is None:
+            continue
+        selected = form.get(f"question_{q_id}")
+        if not selected:
+            result.append((q_id, None, False))
+            continue
+        try:
+            selected = int(selected)
+        except ValueError:
+            # Испорченная форма — как вопрос без ответа
+            result.append((q_id, None, False))
+            continue
+        result.append((q_id, selected, selected in correct_ids))
+    return result
+
+
+def grade(attempt):
+    """Процент верных ответов попытки (список из responses()) без обращений к БД.
+
+    Как и раньше, считаются только вопросы, на которые дан ответ.
+    """
+    answered = [correct for q_id, answer_id, correct in attempt if answer_id is not None]
+    return round(sum(answered) / len(answered) * 100) if answered else 0
+
+
+def invalidate(topic_id):
+    with _lock:
+        _pools.pop(topic_id, None)
@@ -0,0 +1,259 @@
+import base64
+import csv
+import io
+import json
+import os
+import threading
+import time
+
+import pymysql
+
+import config
+
+PROGRESS_EXPORT_QUERY = """
+    SELECT users.full_name, topics.title AS course, course_progress.viewed_materials,
+           course_progress.passed_test, course_progress.test_score
+    FROM users
+    JOIN course_progress ON users.id = course_progress.user_id
+    JOIN topics ON topics.id = course_progress.topic_id
+    ORDER BY users.email, topics.title
+"""
+
+# Подсказки для flask db-check (migrations.route_queries): выгрузка читает
+# весь прогресс, полный проход по course_progress здесь ожидаем
+EXPLAIN_HINTS = {
+    'PROGRESS_EXPORT_QUERY': {'scans': {'users', 'course_progress'}},
+}
+
+PROGRESS_EXPORT_HEADER = ["ФИО", "Курс", "Материалы просмотрены", "Тест пройден", "Результат (%)"]
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _export_row(row):
+    return [
+        row['full_name'],
+        row['course'],
+        "Да" if row['viewed_materials'] else "Нет",
+        "Да" if row['passed_test'] else "Нет",
+        row['test_score'] if row['test_score'] is not None else ""
+    ]
+
+
+def iter_progress_rows(db):
+    """Построчно читает прогресс через небуферизованный курсор (SSCursor).
+
+    Строки не накапливаются в памяти воркера, но соединение занято,
+    пока генератор не будет исчерпан или закрыт.
+    """
+    cursor = db.cursor(pymysql.cursors.SSDictCursor)
+    try:
+        cursor.execute(PROGRESS_EXPORT_QUERY)
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
+
+
+def write_progress_xlsx(rows, fileobj):
+    import openpyxl
+
+    # write-only книга сбрасывает строки во временный файл, а не держит их в памяти
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Прогресс пользователей")
+    ws.append(PROGRESS_EXPORT_HEADER)
+    for row in rows:
+        ws.append(_export_row(row))
+    wb.save(fileobj)
+
+
+def iter_file_and_remove(path):
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.unlink(path)
+
+
+def iter_progress_csv(rows):
+    # BOM и ';' — чтобы Excel с русской локалью открыл файл без мастера импорта
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=';')
+    buf.write('\ufeff')
+    writer.writerow(PROGRESS_EXPORT_HEADER)
+
+    for row in rows:
+        writer.writerow(_export_row(row))
+        if buf.tell() >= CHUNK_SIZE:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+
+    yield buf.getvalue().encode('utf-8')
+
+
+# CROSS JOIN ... ON в MySQL — обычный INNER JOIN, а в SQLite он закрепляет
+# порядок соединения: users по индексу email (порядок страницы) -> строки
+# прогресса сотрудника -> тема по первичному ключу. Иначе с фильтром по ФИО
+# и ключом страницы планировщик SQLite начинает с прохода по всем темам и
+# для каждой заново ищет сотрудников по ФИО (сотни мс на частом префиксе)
+PROGRESS_PAGE_SELECT = """
+    SELECT
+        users.email,
+        users.full_name,
+        topics.id AS topic_id,
+        topics.title AS course,
+        course_progress.viewed_materials,
+        course_progress.passed_test,
+        course_progress.test_score
+    FROM users
+    CROSS JOIN course_progress ON users.id = course_progress.user_id
+    CROSS JOIN topics ON topics.id = course_progress.topic_id
+"""
+
+PROGRESS_COUNT_SELECT = """
+    SELECT COUNT(*) AS total
+    FROM users
+    JOIN course_progress ON users.id = course_progress.user_id
+    JOIN topics ON topics.id = course_progress.topic_id
+"""
+
+# Ключ keyset-пагинации: (email, название темы) и id темы для однозначности
+KEYSET_COLUMNS = "(users.email, topics.title, topics.id)"
+
+# tuple(фильтры) -> (время подсчёта, количество)
+_count_cache = {}
+_count_lock = threading.Lock()
+
+
+def _int_arg(args, name):
+    value = (args.get(name) or '').strip()
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def progress_filters(args):
+    """Разбирает фильтры отчёта о прогрессе из query string."""
+    passed = args.get('passed')
+    return {
+        'topic_id': _int_arg(args, 'topic_id'),
+        'passed': passed if passed in ('1', '0') else None,
+        'score_min': _int_arg(args, 'score_min'),
+        'score_max': _int_arg(args, 'score_max'),
+        'name': (args.get('name') or '').strip(),
+    }
+
+
+def _where(filters):
+    conditions = []
+    params = []
+
+    if filters['topic_id'] is not None:
+        conditions.append("course_progress.topic_id = %s")
+        params.append(filters['topic_id'])
+    if filters['passed'] == '1':
+        conditions.append("course_progress.passed_test = TRUE")
+    elif filters['passed'] == '0':
+        conditions.append("(course_progress.passed_test = FALSE OR course_progress.passed_test IS NULL)")
+    if filters['score_min'] is not None:
+        conditions.append("course_progress.test_score >= %s")
+        params.append(filters['score_min'])
+    if filters['score_max'] is not None:
+        conditions.append("course_progress.test_score <= %s")
+        params.append(filters['score_max'])
+    if filters['name']:
+        # Без ESCAPE экранирование в SQLite не действует. '!' вместо обратной косой:
+        # '\\' в MySQL — один символ, а в SQLite — два, и ESCAPE его не примет
+        prefix = filters['name'].replace('!', '!!').replace('%', '!%').replace('_', '!_')
+        conditions.append("users.full_name LIKE %s ESCAPE '!'")
+        params.append(prefix + '%')
+
+    return conditions, params
+
+
+def encode_cursor(row):
+    raw = json.dumps([row['email'], row['course'], row['topic_id']])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(value):
+    if not value:
+        return None
+    try:
+        email, title, topic_id = json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+        return email, title, int(topic_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def progress_page_sql(filters, after=None, before=None, limit=None):
+    """SQL и параметры страницы отчёта; их же проверяет flask db-check."""
+    limit = limit or config.PROGRESS_PAGE_SIZE
+    conditions, params = _where(filters)
+
+    if before:
+        conditions.append(KEYSET_COLUMNS + " < (%s, %s, %s)")
+        params.extend(before)
+        order = "DESC"
+    else:
+        if after:
+            conditions.append(KEYSET_COLUMNS + " > (%s, %s, %s)")
+            params.extend(after)
+        order = "ASC"
+
+    sql = PROGRESS_PAGE_SELECT
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY users.email {order}, topics.title {order}, topics.id {order} LIMIT %s"
+    params.append(limit + 1)
+    return sql, params
+
+
+def fetch_progress_page(cursor, filters, after=None, before=None, limit=None):
+    """Страница отчёта о прогрессе с keyset-пагинацией вместо OFFSET.
+
+    after/before — ключ последней/первой строки соседней страницы.
+    Возвращает (rows, has_prev, has_next).
+    """
+    limit = limit or config.PROGRESS_PAGE_SIZE
+    cursor.execute(*progress_page_sql(filters, after, before, limit))
+    rows = list(cursor.fetchall())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if before:
+        rows.reverse()
+        return rows, has_more, True
+    return rows, after is not None, has_more
+
+
+def progress_count_sql(filters):
+    conditions, params = _where(filters)
+    sql = PROGRESS_COUNT_SELECT
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return sql, params
+
+
+def count_progress(cursor, filters):
+    """Общее число строк для фильтров; кэшируется на PROGRESS_COUNT_TTL секунд."""
+    key = tuple(sorted(filters.items()))
+    with _count_lock:
+        cached = _count_cache.get(key)
+    if cached and time.monotonic() - cached[0] < config.PROGRESS_COUNT_TTL:
+        return cached[1]
+
+    cursor.execute(*progress_count_sql(filters))
+    total = cursor.fetchone()['total']
+
+    with _count_lock:
+        _count_cache[key] = (time.monotonic(), total)
+    return total
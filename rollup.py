@@ -0,0 +1,123 @@
+# Сводка прогресса по темам (таблица progress_rollup).
+# Обновляется инкрементально при каждой записи в course_progress:
+# вызывающий код передаёт старое и новое состояние строки прогресса,
+# а сюда попадает только разница. rebuild() пересчитывает всё с нуля.
+
+# Гистограмма результатов теста: 0–9, 10–19, ..., 90–100
+HISTOGRAM_BUCKETS = 10
+
+HIST_COLUMNS = [f"hist_{i}" for i in range(HISTOGRAM_BUCKETS)]
+COUNTER_COLUMNS = ["viewed_count", "passed_count", "score_sum", "score_count"] + HIST_COLUMNS
+
+_COUNTERS = ", ".join(COUNTER_COLUMNS)
+_COUNTER_PLACEHOLDERS = ", ".join(["%s"] * (len(COUNTER_COLUMNS) + 1))
+_COUNTER_INCREMENTS = ", ".join(f"{col} = {col} + VALUES({col})" for col in COUNTER_COLUMNS)
+_COUNTER_VALUES = ", ".join(f"COALESCE(r.{col}, 0) AS {col}" for col in COUNTER_COLUMNS)
+
+APPLY_DELTA_QUERY = f"""
+    INSERT INTO progress_rollup (topic_id, {_COUNTERS}) VALUES ({_COUNTER_PLACEHOLDERS})
+    ON DUPLICATE KEY UPDATE {_COUNTER_INCREMENTS}
+"""
+
+ADD_VIEWS_QUERY = """
+    INSERT INTO progress_rollup (topic_id, viewed_count) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE viewed_count = viewed_count + VALUES(viewed_count)
+"""
+
+CLEAR_QUERY = "DELETE FROM progress_rollup"
+
+_HIST_SUMS = ", ".join(
+    f"SUM(test_score IS NOT NULL AND LEAST(FLOOR(test_score / 10), {HISTOGRAM_BUCKETS - 1}) = {i})"
+    for i in range(HISTOGRAM_BUCKETS)
+)
+
+REBUILD_QUERY = f"""
+    INSERT INTO progress_rollup (topic_id, {_COUNTERS})
+    SELECT topic_id,
+           SUM(viewed_materials = TRUE),
+           SUM(passed_test = TRUE),
+           COALESCE(SUM(test_score), 0),
+           COUNT(test_score),
+           {_HIST_SUMS}
+    FROM course_progress
+    GROUP BY topic_id
+"""
+
+ROLLUP_QUERY = f"""
+    SELECT t.id AS topic_id, t.title,
+           {_COUNTER_VALUES}
+    FROM topics t
+    LEFT JOIN progress_rollup r ON r.topic_id = t.id
+    ORDER BY t.id
+"""
+
+# Подсказки для flask db-check (migrations.route_queries): сводка — строка
+# на тему, а пересчёт намеренно читает весь прогресс
+EXPLAIN_HINTS = {
+    'CLEAR_QUERY': {'scans': {'progress_rollup'}},
+    'REBUILD_QUERY': {'scans': {'course_progress'}},
+    'ROLLUP_QUERY': {'scans': {'t'}},
+}
+
+
+def _bucket(score):
+    return min(int(score) // 10, HISTOGRAM_BUCKETS - 1)
+
+
+def _counters(row):
+    counters = dict.fromkeys(COUNTER_COLUMNS, 0)
+    if not row:
+        return counters
+
+    counters['viewed_count'] = 1 if row.get('viewed_materials') else 0
+    counters['passed_count'] = 1 if row.get('passed_test') else 0
+    score = row.get('test_score')
+    if score is not None:
+        counters['score_sum'] = int(score)
+        counters['score_count'] = 1
+        counters[HIST_COLUMNS[_bucket(score)]] = 1
+    return counters
+
+
+def record_change(cursor, topic_id, old, new):
+    """Применяет к сводке разницу между старой и новой строкой course_progress.
+
+    old — строка до изменения (None, если её не было), new — после.
+    Выполняется в той же транзакции, что и сама запись прогресса.
+    """
+    before = _counters(old)
+    after = _counters(new)
+    delta = {col: after[col] - before[col] for col in COUNTER_COLUMNS}
+    if not any(delta.values()):
+        return
+
+    cursor.execute(APPLY_DELTA_QUERY, [topic_id] + [delta[col] for col in COUNTER_COLUMNS])
+
+
+def record_views(cursor, new_views):
+    """Увеличивает viewed_count пачкой: new_views — {topic_id: число новых просмотров}."""
+    if not new_views:
+        return
+    cursor.executemany(ADD_VIEWS_QUERY, sorted(new_views.items()))
+
+
+def rebuild(db):
+    """Пересчитывает сводку целиком по course_progress."""
+    cursor = db.cursor()
+    cursor.execute(CLEAR_QUERY)
+    cursor.execute(REBUILD_QUERY)
+    rebuilt = cursor.rowcount
+    db.commit()
+    cursor.close()
+    return rebuilt
+
+
+def read_rollup(cursor):
+    """Сводка по всем темам: O(число тем) строк вместо скана course_progress."""
+    cursor.execute(ROLLUP_QUERY)
+    rows = []
+    for row in cursor.fetchall():
+        row['average_score'] = round(row['score_sum'] / row['score_count'], 1) if row['score_count'] else None
+        row['histogram'] = [row[col] for col in HIST_COLUMNS]
+        rows.append(row)
+    return rows
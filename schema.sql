@@ -1,38 +1,62 @@
+-- Итоговая схема для новой установки. Существующая БД приводится к ней
+-- миграциями из migrations.py: flask --app app db-upgrade
 CREATE DATABASE IF NOT EXISTS corporate_training;
 USE corporate_training;
 
 CREATE TABLE users (
     id INT AUTO_INCREMENT PRIMARY KEY,
     name VARCHAR(255),
+    full_name VARCHAR(255),
     email VARCHAR(255) UNIQUE,
     password VARCHAR(255),
-    role ENUM('user', 'admin') DEFAULT 'user'
+    role ENUM('user', 'admin') DEFAULT 'user',
+    is_confirmed BOOLEAN DEFAULT FALSE,
+    invite_token VARCHAR(64),
+    UNIQUE INDEX uq_users_invite_token (invite_token),
+    INDEX idx_users_full_name (full_name)
 );
 
-CREATE TABLE topics (
+CREATE TABLE courses (
     id INT AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255),
     title VARCHAR(255)
 );
 
+CREATE TABLE topics (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    title VARCHAR(255),
+    course_id INT,
+    questions_per_test INT,
+    shuffle_answers BOOLEAN NOT NULL DEFAULT FALSE,
+    INDEX idx_topics_course (course_id)
+);
+
 CREATE TABLE materials (
     id INT AUTO_INCREMENT PRIMARY KEY,
     topic_id INT,
     content TEXT,
+    body TEXT,
+    file_path VARCHAR(512),
+    file_sha256 CHAR(64),
+    INDEX idx_materials_topic (topic_id),
+    INDEX idx_materials_file_sha256 (file_sha256),
     FOREIGN KEY (topic_id) REFERENCES topics(id)
 );
 
 CREATE TABLE questions (
     id INT AUTO_INCREMENT PRIMARY KEY,
     topic_id INT,
-    question TEXT,
+    question_text TEXT,
+    INDEX idx_questions_topic (topic_id),
     FOREIGN KEY (topic_id) REFERENCES topics(id)
 );
 
 CREATE TABLE answers (
     id INT AUTO_INCREMENT PRIMARY KEY,
     question_id INT,
-    answer TEXT,
+    answer_text TEXT,
     is_correct BOOLEAN,
+    INDEX idx_answers_question (question_id),
     FOREIGN KEY (question_id) REFERENCES questions(id)
 );
 
@@ -41,6 +65,89 @@ CREATE TABLE results (
     user_id INT,
     topic_id INT,
     score INT,
+    created_at DATETIME,
+    INDEX idx_results_topic (topic_id),
+    INDEX idx_results_user_topic (user_id, topic_id),
     FOREIGN KEY (user_id) REFERENCES users(id),
     FOREIGN KEY (topic_id) REFERENCES topics(id)
 );
+
+-- Ответы попытки: строка на каждый выданный вопрос (answer_id NULL — без ответа)
+CREATE TABLE result_answers (
+    result_id INT NOT NULL,
+    question_id INT NOT NULL,
+    answer_id INT,
+    is_correct BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (result_id, question_id)
+);
+
+-- Прогресс сотрудника по теме: одна строка на пару (user_id, topic_id)
+CREATE TABLE course_progress (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    topic_id INT NOT NULL,
+    viewed_materials BOOLEAN DEFAULT FALSE,
+    passed_test BOOLEAN DEFAULT FALSE,
+    test_score INT,
+    UNIQUE KEY uq_course_progress_user_topic (user_id, topic_id),
+    INDEX idx_course_progress_topic (topic_id),
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    FOREIGN KEY (topic_id) REFERENCES topics(id)
+);
+
+-- Сводка прогресса по темам, поддерживается приложением инкрементально
+-- (пересчёт с нуля: flask --app app rebuild-rollup)
+CREATE TABLE progress_rollup (
+    topic_id INT PRIMARY KEY,
+    viewed_count INT NOT NULL DEFAULT 0,
+    passed_count INT NOT NULL DEFAULT 0,
+    score_sum BIGINT NOT NULL DEFAULT 0,
+    score_count INT NOT NULL DEFAULT 0,
+    hist_0 INT NOT NULL DEFAULT 0,
+    hist_1 INT NOT NULL DEFAULT 0,
+    hist_2 INT NOT NULL DEFAULT 0,
+    hist_3 INT NOT NULL DEFAULT 0,
+    hist_4 INT NOT NULL DEFAULT 0,
+    hist_5 INT NOT NULL DEFAULT 0,
+    hist_6 INT NOT NULL DEFAULT 0,
+    hist_7 INT NOT NULL DEFAULT 0,
+    hist_8 INT NOT NULL DEFAULT 0,
+    hist_9 INT NOT NULL DEFAULT 0
+);
+
+-- Статистика вопросов по истории попыток
+-- (пересчёт: flask --app app item-analysis)
+CREATE TABLE item_stats (
+    question_id INT PRIMARY KEY,
+    topic_id INT NOT NULL,
+    responses INT NOT NULL,
+    difficulty DOUBLE,
+    discrimination DOUBLE,
+    skip_rate DOUBLE,
+    INDEX idx_item_stats_topic (topic_id)
+);
+
+CREATE TABLE answer_stats (
+    answer_id INT PRIMARY KEY,
+    question_id INT NOT NULL,
+    selection_rate DOUBLE NOT NULL,
+    INDEX idx_answer_stats_question (question_id)
+);
+
+CREATE TABLE topic_score_stats (
+    topic_id INT PRIMARY KEY,
+    attempts INT NOT NULL,
+    mean_score DOUBLE,
+    median_score DOUBLE,
+    hist_0 INT NOT NULL DEFAULT 0,
+    hist_1 INT NOT NULL DEFAULT 0,
+    hist_2 INT NOT NULL DEFAULT 0,
+    hist_3 INT NOT NULL DEFAULT 0,
+    hist_4 INT NOT NULL DEFAULT 0,
+    hist_5 INT NOT NULL DEFAULT 0,
+    hist_6 INT NOT NULL DEFAULT 0,
+    hist_7 INT NOT NULL DEFAULT 0,
+    hist_8 INT NOT NULL DEFAULT 0,
+    hist_9 INT NOT NULL DEFAULT 0,
+    computed_at DATETIME
+);
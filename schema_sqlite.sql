@@ -0,0 +1,161 @@
+-- Итоговая схема для режима DB_BACKEND=sqlite (та же, что schema.sql).
+-- Выполняется при каждом открытии соединения, поэтому всё через IF NOT EXISTS;
+-- версии из списка в конце сразу помечены применёнными, новые миграции идут через migrations.py.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255),
+    full_name VARCHAR(255),
+    -- В MySQL сравнение строк по умолчанию без учёта регистра
+    email VARCHAR(255) UNIQUE COLLATE NOCASE,
+    password VARCHAR(255),
+    role TEXT DEFAULT 'user' CHECK (role IN ('user', 'admin')),
+    is_confirmed BOOLEAN DEFAULT FALSE,
+    invite_token VARCHAR(64)
+);
+-- Частичный: у подтверждённых сотрудников токена нет
+CREATE UNIQUE INDEX IF NOT EXISTS uq_users_invite_token ON users (invite_token) WHERE invite_token IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_users_full_name ON users (full_name COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255),
+    title VARCHAR(255)
+);
+
+CREATE TABLE IF NOT EXISTS topics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title VARCHAR(255),
+    course_id INT,
+    questions_per_test INT,
+    shuffle_answers BOOLEAN NOT NULL DEFAULT FALSE
+);
+CREATE INDEX IF NOT EXISTS idx_topics_course ON topics (course_id);
+
+CREATE TABLE IF NOT EXISTS materials (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic_id INT REFERENCES topics(id),
+    content TEXT,
+    body TEXT,
+    file_path VARCHAR(512),
+    file_sha256 CHAR(64)
+);
+CREATE INDEX IF NOT EXISTS idx_materials_topic ON materials (topic_id);
+CREATE INDEX IF NOT EXISTS idx_materials_file_sha256 ON materials (file_sha256);
+
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic_id INT REFERENCES topics(id),
+    question_text TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_questions_topic ON questions (topic_id);
+
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question_id INT REFERENCES questions(id),
+    answer_text TEXT,
+    is_correct BOOLEAN
+);
+CREATE INDEX IF NOT EXISTS idx_answers_question ON answers (question_id);
+
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT REFERENCES users(id),
+    topic_id INT REFERENCES topics(id),
+    score INT,
+    created_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_results_topic ON results (topic_id);
+CREATE INDEX IF NOT EXISTS idx_results_user_topic ON results (user_id, topic_id);
+
+-- Ответы попытки: по строке на каждый выданный вопрос
+CREATE TABLE IF NOT EXISTS result_answers (
+    result_id INT NOT NULL,
+    question_id INT NOT NULL,
+    answer_id INT,
+    is_correct BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (result_id, question_id)
+);
+
+-- Результаты item_analysis.run(): таблицы целиком пересчитываются заданием
+CREATE TABLE IF NOT EXISTS item_stats (
+    question_id INTEGER PRIMARY KEY,
+    topic_id INT NOT NULL,
+    responses INT NOT NULL,
+    difficulty DOUBLE,
+    discrimination DOUBLE,
+    skip_rate DOUBLE
+);
+CREATE INDEX IF NOT EXISTS idx_item_stats_topic ON item_stats (topic_id);
+
+CREATE TABLE IF NOT EXISTS answer_stats (
+    answer_id INTEGER PRIMARY KEY,
+    question_id INT NOT NULL,
+    selection_rate DOUBLE NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_answer_stats_question ON answer_stats (question_id);
+
+CREATE TABLE IF NOT EXISTS topic_score_stats (
+    topic_id INTEGER PRIMARY KEY,
+    attempts INT NOT NULL,
+    mean_score DOUBLE,
+    median_score DOUBLE,
+    hist_0 INT NOT NULL DEFAULT 0,
+    hist_1 INT NOT NULL DEFAULT 0,
+    hist_2 INT NOT NULL DEFAULT 0,
+    hist_3 INT NOT NULL DEFAULT 0,
+    hist_4 INT NOT NULL DEFAULT 0,
+    hist_5 INT NOT NULL DEFAULT 0,
+    hist_6 INT NOT NULL DEFAULT 0,
+    hist_7 INT NOT NULL DEFAULT 0,
+    hist_8 INT NOT NULL DEFAULT 0,
+    hist_9 INT NOT NULL DEFAULT 0,
+    computed_at DATETIME
+);
+
+-- Прогресс сотрудника по теме: одна строка на пару (user_id, topic_id)
+CREATE TABLE IF NOT EXISTS course_progress (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id),
+    topic_id INT NOT NULL REFERENCES topics(id),
+    viewed_materials BOOLEAN DEFAULT FALSE,
+    passed_test BOOLEAN DEFAULT FALSE,
+    test_score INT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_course_progress_user_topic ON course_progress (user_id, topic_id);
+CREATE INDEX IF NOT EXISTS idx_course_progress_topic ON course_progress (topic_id);
+
+CREATE TABLE IF NOT EXISTS progress_rollup (
+    topic_id INTEGER PRIMARY KEY,
+    viewed_count INT NOT NULL DEFAULT 0,
+    passed_count INT NOT NULL DEFAULT 0,
+    score_sum BIGINT NOT NULL DEFAULT 0,
+    score_count INT NOT NULL DEFAULT 0,
+    hist_0 INT NOT NULL DEFAULT 0,
+    hist_1 INT NOT NULL DEFAULT 0,
+    hist_2 INT NOT NULL DEFAULT 0,
+    hist_3 INT NOT NULL DEFAULT 0,
+    hist_4 INT NOT NULL DEFAULT 0,
+    hist_5 INT NOT NULL DEFAULT 0,
+    hist_6 INT NOT NULL DEFAULT 0,
+    hist_7 INT NOT NULL DEFAULT 0,
+    hist_8 INT NOT NULL DEFAULT 0,
+    hist_9 INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INT PRIMARY KEY,
+    description VARCHAR(255),
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+INSERT OR IGNORE INTO schema_version (version, description) VALUES
+    (1, 'Таблицы, которые использует app.py'),
+    (2, 'Недостающие и переименованные колонки'),
+    (3, 'Вторичные индексы для выборок по id'),
+    (4, 'Уникальный ключ course_progress (user_id, topic_id)'),
+    (5, 'Сводка progress_rollup'),
+    (6, 'Хэш файла материала (хранилище загрузок)'),
+    (7, 'Настройки теста темы: число вопросов и перемешивание ответов'),
+    (8, 'История попыток и статистика вопросов'),
+    (9, 'Индекс ФИО для фильтра отчёта о прогрессе'),
+    (10, 'Уникальный индекс ссылки приглашения');
@@ -0,0 +1,320 @@
+# Полнотекстовый поиск по материалам (заголовок, текст, содержимое
+# PDF/PPTX) и вопросам тестов. Инвертированный индекс в памяти воркера,
+# русский стемминг, ранжирование BM25. Индекс обновляется точечно при
+# изменениях через админку и целиком пересобирается раз в
+# SEARCH_REBUILD_INTERVAL секунд, чтобы подхватить правки из других воркеров.
+
+import logging
+import math
+import os
+import re
+import subprocess
+import threading
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree import ElementTree
+
+import blobstore
+import config
+import database
+from stemmer import stem
+
+log = logging.getLogger(__name__)
+
+STOP_WORDS = {
+    "и", "в", "во", "не", "что", "он", "на", "я", "с", "со", "как", "а", "то", "все", "она", "так",
+    "его", "но", "да", "ты", "к", "у", "же", "вы", "за", "бы", "по", "только", "ее", "мне", "было",
+    "вот", "от", "меня", "еще", "нет", "о", "из", "ему", "ли", "если", "или", "ни", "быть", "был",
+    "до", "для", "при", "это", "этот", "эти", "их", "мы", "они", "под", "над", "об", "без",
+}
+
+TOKEN_RE = re.compile(r"\w+")
+DRAWING_NS = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+SNIPPET_LENGTH = 200
+
+# rebuild() загружает весь контент: полный проход по таблицам здесь ожидаем
+MATERIALS_QUERY = "SELECT id, topic_id, content, body, file_path, file_sha256 FROM materials"
+QUESTIONS_QUERY = "SELECT id, topic_id, question_text FROM questions"
+
+# Подсказки для flask db-check (migrations.route_queries): параметры EXPLAIN
+# и таблицы, которые запрос намеренно читает целиком
+EXPLAIN_HINTS = {
+    'MATERIALS_QUERY': {'scans': {'materials'}},
+    'QUESTIONS_QUERY': {'scans': {'questions'}},
+}
+
+
+def tokenize(text):
+    words = TOKEN_RE.findall((text or "").lower().replace("ё", "е"))
+    return [stem(w) for w in words if w not in STOP_WORDS and (len(w) > 1 or w.isdigit())]
+
+
+def _pptx_text(path):
+    parts = []
+    with zipfile.ZipFile(path) as archive:
+        slides = [n for n in archive.namelist() if re.match(r"ppt/slides/slide\d+\.xml$", n)]
+        for name in sorted(slides, key=lambda n: int(re.findall(r"\d+", n)[-1])):
+            root = ElementTree.fromstring(archive.read(name))
+            parts.extend(node.text for node in root.iter(DRAWING_NS + "t") if node.text)
+    return " ".join(parts)
+
+
+def extract_text(path):
+    """Текст из PDF (pdftotext) или PPTX (разбор XML слайдов)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        result = subprocess.run([config.SEARCH_PDFTOTEXT, "-enc", "UTF-8", path, "-"],
+                                check=True, timeout=120, capture_output=True)
+        return result.stdout.decode("utf-8", "replace")
+    if ext == ".pptx":
+        return _pptx_text(path)
+    return ""
+
+
+def _text_cache_path(sha256):
+    return os.path.join(config.SEARCH_TEXT_CACHE_DIR, sha256 + ".txt")
+
+
+def cached_file_text(sha256):
+    try:
+        with open(_text_cache_path(sha256), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def file_text(sha256, path):
+    """Извлечённый текст файла; кэшируется на диске по хэшу содержимого."""
+    text = cached_file_text(sha256)
+    if text is not None:
+        return text
+    try:
+        text = extract_text(path)
+    except Exception as e:
+        log.warning("Не удалось извлечь текст из %s: %s", path, e)
+        text = ""
+    os.makedirs(config.SEARCH_TEXT_CACHE_DIR, exist_ok=True)
+    tmp = _text_cache_path(sha256) + f".{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, _text_cache_path(sha256))
+    return text
+
+
+class SearchIndex:
+    """Инвертированный индекс: термин -> {ключ документа: частота}."""
+
+    K1 = 1.5
+    B = 0.75
+
+    def __init__(self):
+        self._postings = {}
+        self._docs = {}
+        self._doc_terms = {}
+        self._lengths = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def add(self, key, meta, text):
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove(key)
+            self._docs[key] = meta
+            self._doc_terms[key] = list(terms)
+            self._lengths[key] = sum(terms.values())
+            self._total_length += self._lengths[key]
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[key] = tf
+
+    def _remove(self, key):
+        if key not in self._docs:
+            return
+        del self._docs[key]
+        self._total_length -= self._lengths.pop(key)
+        for term in self._doc_terms.pop(key):
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def remove_where(self, predicate):
+        with self._lock:
+            for key in [k for k, meta in self._docs.items() if predicate(meta)]:
+                self._remove(key)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, key):
+        return key in self._docs
+
+    def search(self, query, kinds=None, limit=20):
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._docs)
+            if not terms or not n_docs:
+                return []
+            avg_length = self._total_length / n_docs or 1
+
+            scores = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, tf in postings.items():
+                    norm = self.K1 * (1 - self.B + self.B * self._lengths[key] / avg_length)
+                    scores[key] += idf * tf * (self.K1 + 1) / (tf + norm)
+
+            results = []
+            for key, score in scores.most_common():
+                meta = self._docs[key]
+                if kinds and meta['kind'] not in kinds:
+                    continue
+                results.append(dict(meta, score=round(score, 3)))
+                if len(results) >= limit:
+                    break
+        return results
+
+
+def _snippet(*parts):
+    text = " ".join(p for p in parts if p).strip()
+    return text[:SNIPPET_LENGTH] + ("…" if len(text) > SNIPPET_LENGTH else "")
+
+
+_index = None
+_built_at = 0.0
+_build_lock = threading.Lock()
+_extractor = None
+_extractor_pid = None
+
+
+def _get_extractor():
+    global _extractor, _extractor_pid
+    if _extractor is None or _extractor_pid != os.getpid():
+        _extractor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='search-extract')
+        _extractor_pid = os.getpid()
+    return _extractor
+
+
+def _material_doc(row, pending=None):
+    key = ('material', row['id'])
+    meta = {
+        'kind': 'material',
+        'id': row['id'],
+        'topic_id': row['topic_id'],
+        'title': row['content'] or 'Без названия',
+        'snippet': _snippet(row['body']),
+    }
+    # Заголовок повторяется, чтобы совпадения в нём весили больше
+    text = " ".join(p for p in (row['content'], row['content'], row['body']) if p)
+
+    sha256 = row.get('file_sha256')
+    if sha256 and row.get('file_path'):
+        extracted = cached_file_text(sha256)
+        if extracted is None and pending is not None:
+            pending.append(row)
+        if extracted:
+            text += " " + extracted
+    return key, meta, text
+
+
+def _extract_and_update(row):
+    try:
+        file_text(row['file_sha256'], blobstore.full_path(blobstore.static_path(row['file_path'])))
+        key, meta, text = _material_doc(row)
+        # Материал могли удалить, пока извлекался текст
+        if _index is not None and key in _index:
+            _index.add(key, meta, text)
+    except Exception:
+        log.exception("Ошибка индексации файла материала %s", row['id'])
+
+
+def _extract_later(rows):
+    # Текст из файлов извлекается в фоне, документы потом дообновляются
+    for row in rows:
+        _get_extractor().submit(_extract_and_update, row)
+
+
+def _question_doc(row):
+    key = ('question', row['id'])
+    meta = {
+        'kind': 'question',
+        'id': row['id'],
+        'topic_id': row['topic_id'],
+        'title': _snippet(row['question_text']),
+        'snippet': '',
+    }
+    return key, meta, row['question_text'] or ''
+
+
+def rebuild(cursor):
+    """Собирает индекс заново из БД (два запроса) и подменяет текущий."""
+    global _index, _built_at
+    index = SearchIndex()
+    pending = []
+
+    cursor.execute(MATERIALS_QUERY)
+    for row in cursor.fetchall():
+        index.add(*_material_doc(row, pending))
+
+    cursor.execute(QUESTIONS_QUERY)
+    for row in cursor.fetchall():
+        index.add(*_question_doc(row))
+
+    _index = index
+    _built_at = time.monotonic()
+    _extract_later(pending)
+    return index
+
+
+def get_index():
+    if _index is None or time.monotonic() - _built_at > config.SEARCH_REBUILD_INTERVAL:
+        with _build_lock:
+            if _index is None or time.monotonic() - _built_at > config.SEARCH_REBUILD_INTERVAL:
+                # Индекс живёт SEARCH_REBUILD_INTERVAL — строим его с основной БД, не с реплики
+                with database.get_primary_db().cursor() as cursor:
+                    rebuild(cursor)
+    return _index
+
+
+# Точечные обновления. Если индекс в этом воркере ещё не построен,
+# ничего делать не нужно: изменения попадут в него при первой сборке.
+
+def index_material(row):
+    if _index is not None:
+        pending = []
+        _index.add(*_material_doc(row, pending))
+        _extract_later(pending)
+
+
+def remove_material(material_id):
+    if _index is not None:
+        _index.remove(('material', material_id))
+
+
+def index_question(row):
+    if _index is not None:
+        _index.add(*_question_doc(row))
+
+
+def remove_question(question_id):
+    if _index is not None:
+        _index.remove(('question', question_id))
+
+
+def remove_topic(topic_id):
+    remove_topics([topic_id])
+
+
+def remove_topics(topic_ids):
+    # Один проход по индексу на все темы (удаление курса)
+    topic_ids = set(topic_ids)
+    if _index is not None and topic_ids:
+        _index.remove_where(lambda meta: meta['topic_id'] in topic_ids)
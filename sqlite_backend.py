@@ -0,0 +1,267 @@
+# Встраиваемый режим хранения: файл SQLite вместо удалённого MySQL
+# (DB_BACKEND=sqlite). Для небольших установок без отдельного сервера БД.
+#
+# SQLiteConnection повторяет ту часть интерфейса pymysql.Connection,
+# на которую опираются курсоры pymysql, поэтому DictCursor, кэш запросов
+# и метрики работают без изменений. Параметры подставляются в текст
+# запроса (литералы в синтаксисе SQLite), затем translate() переписывает
+# MySQL-конструкции, которые использует приложение:
+#   ON DUPLICATE KEY UPDATE c = VALUES(c)  ->  ON CONFLICT DO UPDATE SET c = excluded.c
+#   SELECT ... FOR UPDATE                  ->  BEGIN IMMEDIATE + SELECT
+#   LEAST/GREATEST                         ->  MIN/MAX
+
+import os
+import re
+import sqlite3
+
+import pymysql
+from pymysql import converters
+
+import config
+import querycache
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema_sqlite.sql')
+
+_LITERAL_RE = re.compile(r"('(?:[^']|'')*')")
+_UPSERT_RE = re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE)
+_VALUES_FN_RE = re.compile(r"\bVALUES\((\w+)\)", re.IGNORECASE)
+_LOCKING_RE = re.compile(r"\s+(?:FOR\s+UPDATE|LOCK\s+IN\s+SHARE\s+MODE)\b", re.IGNORECASE)
+_FUNCTIONS = ((re.compile(r"\bLEAST\(", re.IGNORECASE), "MIN("),
+              (re.compile(r"\bGREATEST\(", re.IGNORECASE), "MAX("))
+_WRITE_RE = re.compile(r"^\s*(?:INSERT|UPDATE|DELETE|REPLACE|CREATE|ALTER|DROP)\b", re.IGNORECASE)
+
+
+def _split_top_level(text):
+    """Делит по запятым вне скобок."""
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(text):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _upsert_clause(assignments):
+    # MySQL не считает строку изменённой, если значения не поменялись (rowcount 0);
+    # WHERE даёт то же поведение, progress.record_view на это опирается
+    sets, changed = [], []
+    for assignment in _split_top_level(assignments):
+        column, _, expr = assignment.partition('=')
+        column, expr = column.strip(), _VALUES_FN_RE.sub(r"excluded.\1", expr.strip())
+        sets.append(f"{column} = {expr}")
+        changed.append(f"{column} IS NOT ({expr})")
+    return f"ON CONFLICT DO UPDATE SET {', '.join(sets)} WHERE {' OR '.join(changed)}"
+
+
+def translate(sql):
+    """MySQL -> SQLite для запроса с уже подставленными литералами.
+
+    Возвращает (sql, нужна ли блокировка на запись). Строковые литералы не трогаются.
+    """
+    pieces = _LITERAL_RE.split(sql)
+    code = pieces[0::2]
+    locking = False
+
+    for i, chunk in enumerate(code):
+        chunk, n = _LOCKING_RE.subn("", chunk)
+        locking = locking or bool(n)
+        for pattern, replacement in _FUNCTIONS:
+            chunk = pattern.sub(replacement, chunk)
+        code[i] = chunk
+
+    # Присваивания ON DUPLICATE KEY UPDATE не содержат строковых литералов
+    for i, chunk in enumerate(code):
+        match = _UPSERT_RE.search(chunk)
+        if match and i == len(code) - 1:
+            code[i] = chunk[:match.start()] + _upsert_clause(chunk[match.end():])
+
+    pieces[0::2] = code
+    return "".join(pieces), locking
+
+
+class _Field:
+    def __init__(self, name):
+        self.name = name
+        self.table_name = ''
+
+
+class _Result:
+    """То, что курсоры pymysql читают из connection._result."""
+
+    warning_count = 0
+    has_next = False
+
+    def __init__(self, cursor):
+        self.insert_id = cursor.lastrowid
+        if cursor.description:
+            self.rows = tuple(cursor.fetchall())
+            self.description = tuple((d[0], None, None, None, None, None, True) for d in cursor.description)
+            self.fields = [_Field(d[0]) for d in cursor.description]
+            self.affected_rows = len(self.rows)
+        else:
+            self.rows = None
+            self.description = None
+            self.fields = []
+            self.affected_rows = cursor.rowcount
+
+
+class StreamingCursor:
+    """Замена SSCursor/SSDictCursor: строки читаются из SQLite по мере итерации."""
+
+    def __init__(self, connection, as_dict=True):
+        self.connection = connection
+        self.as_dict = as_dict
+        self._cursor = None
+        self._names = []
+
+    def execute(self, query, args=None):
+        if args is not None:
+            query = query % tuple(self.connection.escape(a) for a in args)
+        self._cursor = self.connection.raw_execute(query)
+        self._names = [d[0] for d in self._cursor.description or ()]
+
+    def __iter__(self):
+        if not self.as_dict:
+            yield from self._cursor
+            return
+        for row in self._cursor:
+            yield dict(zip(self._names, row))
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is None or not self.as_dict:
+            return row
+        return dict(zip(self._names, row))
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size or self._cursor.arraysize)
+        if not self.as_dict:
+            return rows
+        return [dict(zip(self._names, row)) for row in rows]
+
+    def fetchall(self):
+        return list(self)
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+
+
+class _Connection:
+    encoding = 'utf-8'
+
+    def __init__(self, path, cursorclass):
+        self.cursorclass = cursorclass
+        self._result = None
+        # Транзакциями управляем сами (BEGIN IMMEDIATE), как pymysql без autocommit
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False,
+                                   timeout=config.SQLITE_BUSY_TIMEOUT)
+        for pragma in config.SQLITE_PRAGMAS:
+            self._db.execute(f"PRAGMA {pragma}")
+
+    @property
+    def open(self):
+        return self._db is not None
+
+    def ping(self, reconnect=True):
+        self._db.execute("SELECT 1")
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def cursor(self, cursor=None):
+        if cursor is not None and issubclass(cursor, pymysql.cursors.SSCursor):
+            return StreamingCursor(self, as_dict=issubclass(cursor, pymysql.cursors.DictCursorMixin))
+        return (cursor or self.cursorclass)(self)
+
+    def escape(self, obj, mapping=None):
+        if isinstance(obj, str):
+            return "'" + obj.replace("'", "''") + "'"
+        if isinstance(obj, (bytes, bytearray)):
+            return f"X'{bytes(obj).hex()}'"
+        if isinstance(obj, bool):
+            return '1' if obj else '0'
+        if isinstance(obj, (list, tuple, set, frozenset)):
+            return "(" + ",".join(self.escape(item) for item in obj) + ")"
+        return converters.escape_item(obj, 'utf8')
+
+    def literal(self, obj):
+        return self.escape(obj)
+
+    def raw_execute(self, sql):
+        sql = querycache.as_text(sql, self.encoding)
+        sql, locking = translate(sql)
+        if (locking or _WRITE_RE.match(sql)) and not self._db.in_transaction:
+            self._db.execute("BEGIN IMMEDIATE")
+        try:
+            return self._db.execute(sql)
+        except sqlite3.IntegrityError as e:
+            # Код ожидает исключения pymysql (например, дубликат email)
+            raise pymysql.err.IntegrityError(str(e)) from e
+        except sqlite3.OperationalError as e:
+            raise pymysql.err.OperationalError(str(e)) from e
+
+    def query(self, sql, unbuffered=False):
+        self._result = _Result(self.raw_execute(sql))
+        return self._result.affected_rows
+
+    def executescript(self, script):
+        self._db.executescript(script)
+
+    def commit(self):
+        if self._db.in_transaction:
+            self._db.execute("COMMIT")
+
+    def rollback(self):
+        if self._db.in_transaction:
+            self._db.execute("ROLLBACK")
+
+
+class SQLiteConnection(querycache.InvalidateOnCommit, _Connection):
+    """Соединение с SQLite, которое после COMMIT сбрасывает кэш по изменённым таблицам."""
+
+
+def connect(cursorclass):
+    path = config.SQLITE_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = SQLiteConnection(path, cursorclass)
+    ensure_schema(conn)
+    return conn
+
+
+def ensure_schema(conn):
+    """Создаёт таблицы новой БД (итоговая схема) и доводит старую БД до последней миграции."""
+    # migrations -> progress -> database импортирует этот модуль
+    import migrations
+
+    exists = conn.raw_execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone()
+    if not exists:
+        # Новая БД: schema_sqlite.sql создаёт итоговую схему и отмечает свои версии
+        with open(SCHEMA_PATH, encoding='utf-8') as f:
+            conn.executescript(f.read())
+    # Здесь применятся только миграции, которых ещё нет в БД (или в файле схемы)
+    migrations.upgrade(conn)
+    _ensure_stats(conn)
+
+
+def _ensure_stats(conn):
+    # Без статистики планировщик SQLite выбирает порядок соединения наугад:
+    # страница отчёта о прогрессе начинает с полного прохода по course_progress.
+    # Дальше статистику обновляет PRAGMA optimize из SQLITE_PRAGMAS
+    analyzed = conn.raw_execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'").fetchone()
+    if analyzed:
+        analyzed = conn.raw_execute("SELECT 1 FROM sqlite_stat1 WHERE tbl = 'course_progress'").fetchone()
+    if not analyzed and conn.raw_execute("SELECT 1 FROM course_progress LIMIT 1").fetchone():
+        conn.raw_execute("ANALYZE")
@@ -0,0 +1,118 @@
+# Стеммер для русского языка по алгоритму Snowball (Porter, russian).
+# Латиница и цифры возвращаются как есть.
+
+import re
+
+VOWELS = "аеиоуыэюя"
+
+PERFECTIVE_GERUND_1 = ("вшись", "вши", "в")
+PERFECTIVE_GERUND_2 = ("ывшись", "ившись", "ывши", "ивши", "ыв", "ив")
+REFLEXIVE = ("ся", "сь")
+ADJECTIVE = ("ими", "ыми", "его", "ого", "ему", "ому", "ее", "ие", "ые", "ое", "ей", "ий", "ый", "ой",
+             "ем", "им", "ым", "ом", "их", "ых", "ую", "юю", "ая", "яя", "ою", "ею")
+PARTICIPLE_1 = ("ем", "нн", "вш", "ющ", "щ")
+PARTICIPLE_2 = ("ивш", "ывш", "ующ")
+VERB_1 = ("ете", "йте", "ешь", "нно", "ла", "на", "ли", "ем", "ло", "но", "ет", "ют", "ны", "ть", "й", "л", "н")
+VERB_2 = ("ейте", "уйте", "ила", "ыла", "ена", "ите", "или", "ыли", "ило", "ыло", "ено", "ует", "уют",
+          "ены", "ить", "ыть", "ишь", "ей", "уй", "ил", "ыл", "им", "ым", "ен", "ят", "ит", "ыт", "ую", "ю")
+NOUN = ("иями", "ями", "ами", "ией", "иям", "ием", "иях", "ев", "ов", "ие", "ье", "еи", "ии", "ей", "ой",
+        "ий", "ям", "ем", "ам", "ом", "ах", "ях", "ию", "ью", "ия", "ья", "а", "е", "и", "й", "о", "у",
+        "ы", "ь", "ю", "я")
+SUPERLATIVE = ("ейше", "ейш")
+DERIVATIONAL = ("ость", "ост")
+
+_CYRILLIC = re.compile(r"[а-я]")
+
+
+def _longest(suffixes):
+    return tuple(sorted(suffixes, key=len, reverse=True))
+
+
+PERFECTIVE_GERUND_1, PERFECTIVE_GERUND_2 = _longest(PERFECTIVE_GERUND_1), _longest(PERFECTIVE_GERUND_2)
+ADJECTIVE, NOUN = _longest(ADJECTIVE), _longest(NOUN)
+PARTICIPLE_1, PARTICIPLE_2 = _longest(PARTICIPLE_1), _longest(PARTICIPLE_2)
+VERB_1, VERB_2 = _longest(VERB_1), _longest(VERB_2)
+
+
+def _regions(word):
+    """Начала областей RV и R2 (индексы в слове)."""
+    rv = len(word)
+    for i, ch in enumerate(word):
+        if ch in VOWELS:
+            rv = i + 1
+            break
+
+    def next_region(start):
+        for i in range(start + 1, len(word)):
+            if word[i] not in VOWELS and word[i - 1] in VOWELS:
+                return i + 1
+        return len(word)
+
+    r1 = next_region(0)
+    r2 = next_region(r1)
+    return rv, r2
+
+
+def _strip(rv, group_1=(), group_2=()):
+    """Отрезает самое длинное подходящее окончание; для группы 1 перед ним должна быть а/я."""
+    best = None
+    for suffix in group_2:
+        if rv.endswith(suffix):
+            best = suffix
+            break
+    for suffix in group_1:
+        if (best is None or len(suffix) > len(best)) and rv.endswith(suffix) \
+                and len(rv) > len(suffix) and rv[-len(suffix) - 1] in "ая":
+            best = suffix
+            break
+    if best is None:
+        return rv, False
+    return rv[:-len(best)], True
+
+
+def _strip_adjectival(rv):
+    rv, found = _strip(rv, group_2=ADJECTIVE)
+    if found:
+        rv, _ = _strip(rv, PARTICIPLE_1, PARTICIPLE_2)
+    return rv, found
+
+
+def stem(word):
+    word = word.lower().replace("ё", "е")
+    if not _CYRILLIC.search(word):
+        return word
+
+    rv_start, r2_start = _regions(word)
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    # Шаг 1
+    rv, found = _strip(rv, PERFECTIVE_GERUND_1, PERFECTIVE_GERUND_2)
+    if not found:
+        rv, _ = _strip(rv, group_2=REFLEXIVE)
+        rv, found = _strip_adjectival(rv)
+        if not found:
+            rv, found = _strip(rv, VERB_1, VERB_2)
+        if not found:
+            rv, _ = _strip(rv, group_2=NOUN)
+
+    # Шаг 2
+    if rv.endswith("и"):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательный суффикс, только внутри R2
+    for suffix in DERIVATIONAL:
+        if rv.endswith(suffix) and len(prefix) + len(rv) - len(suffix) >= r2_start:
+            rv = rv[:-len(suffix)]
+            break
+
+    # Шаг 4
+    if rv.endswith("нн"):
+        rv = rv[:-1]
+    else:
+        rv, found = _strip(rv, group_2=SUPERLATIVE)
+        if found and rv.endswith("нн"):
+            rv = rv[:-1]
+        elif rv.endswith("ь"):
+            rv = rv[:-1]
+
+    return prefix + rv
@@ -0,0 +1,57 @@
+# Чтение таблиц для массовой загрузки: XLSX (первый лист) или CSV.
+# Возвращает строки как списки строковых значений без пробелов по краям.
+
+import csv
+import io
+import os
+
+
+class TableFormatError(ValueError):
+    pass
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _xlsx_rows(fileobj):
+    import openpyxl
+
+    wb = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for row in wb.worksheets[0].iter_rows(values_only=True):
+            yield [_cell(v) for v in row]
+    finally:
+        wb.close()
+
+
+def _csv_rows(fileobj):
+    try:
+        text = fileobj.read().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        # CSV из русского Excel по умолчанию сохраняется в cp1251
+        fileobj.seek(0)
+        text = fileobj.read().decode('cp1251')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    for row in csv.reader(io.StringIO(text, newline=''), dialect):
+        yield [_cell(v) for v in row]
+
+
+def read_rows(fileobj, filename):
+    """Строки таблицы; полностью пустые строки пропускаются."""
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext == '.xlsx':
+        rows = _xlsx_rows(fileobj)
+    elif ext in ('.csv', '.txt'):
+        rows = _csv_rows(fileobj)
+    else:
+        raise TableFormatError("Поддерживаются только файлы .xlsx и .csv")
+
+    return [row for row in rows if any(row)]
@@ -0,0 +1,67 @@
+# Тесты идут на SQLite во временном каталоге: MySQL и внешние утилиты не нужны.
+# Переменные окружения задаются до импорта config.
+
+import os
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix='training-tests-')
+os.environ.update(
+    DB_BACKEND='sqlite',
+    SQLITE_PATH=os.path.join(_tmp, 'training.sqlite3'),
+    REPORT_DIR=os.path.join(_tmp, 'reports'),
+    BLOB_DIR=os.path.join(_tmp, 'blobs'),
+    PREVIEW_CACHE_DIR=os.path.join(_tmp, 'previews'),
+    PROGRESS_WRITE_BEHIND='0',
+)
+
+import database  # noqa: E402
+import pagecache  # noqa: E402
+import querycache  # noqa: E402
+import quiz  # noqa: E402
+from app import create_app  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = create_app()
+    app.config['TESTING'] = True
+    yield app
+    querycache.get_cache().clear()
+    pagecache._pages.clear()
+    quiz._pools.clear()
+
+
+@pytest.fixture
+def db(app):
+    with database.connection() as conn:
+        yield conn
+
+
+def insert(db, sql, args=()):
+    cursor = db.cursor()
+    cursor.execute(sql, args)
+    row_id = cursor.lastrowid
+    db.commit()
+    cursor.close()
+    return row_id
+
+
+@pytest.fixture
+def employee(app, db):
+    """Клиент, вошедший как сотрудник; user_id — в client.user_id."""
+    user_id = insert(db, "INSERT INTO users (name, email, role, is_confirmed) VALUES (%s, %s, 'user', TRUE)",
+                     ('Сотрудник', f'user{os.urandom(4).hex()}@test.local'))
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['role'] = 'user'
+    client.user_id = user_id
+    return client
+
+
+@pytest.fixture
+def topic(db):
+    course_id = insert(db, "INSERT INTO courses (name, title) VALUES ('Курс', 'Курс')")
+    return insert(db, "INSERT INTO topics (title, course_id) VALUES ('Тема', %s)", (course_id,))
@@ -0,0 +1,51 @@
+import pytest
+
+import blobstore
+from conftest import insert
+
+
+@pytest.fixture
+def admin(app, db):
+    user_id = insert(db, "INSERT INTO users (name, email, role, is_confirmed) VALUES ('Админ', %s, 'admin', TRUE)",
+                     (f'admin{id(app)}@test.local',))
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+        session['role'] = 'admin'
+    return client
+
+
+def add_file_material(db, topic_id, tmp_path, text):
+    path = tmp_path / f'{abs(hash(text))}.txt'
+    path.write_text(text)
+    sha256, rel_path = blobstore.store_path(str(path))
+    insert(db, "INSERT INTO materials (topic_id, content, file_path, file_sha256) VALUES (%s, 'Файл', %s, %s)",
+           (topic_id, rel_path, sha256))
+    return sha256
+
+
+def test_delete_topic_collects_files(admin, db, topic, tmp_path):
+    own = add_file_material(db, topic, tmp_path, 'только в этой теме')
+    shared = add_file_material(db, topic, tmp_path, 'общий файл')
+    other_topic = insert(db, "INSERT INTO topics (title) VALUES ('Другая тема')")
+    add_file_material(db, other_topic, tmp_path, 'общий файл')
+
+    assert admin.post(f'/admin/delete_topic/{topic}').status_code == 302
+    assert blobstore.find(own) is None
+    # Файл ещё нужен материалу другой темы
+    assert blobstore.find(shared) is not None
+
+
+def test_delete_course_collects_files(admin, db, topic, tmp_path):
+    sha256 = add_file_material(db, topic, tmp_path, 'материал курса')
+    question_id = insert(db, "INSERT INTO questions (topic_id, question_text) VALUES (%s, 'Вопрос?')", (topic,))
+    insert(db, "INSERT INTO answers (question_id, answer_text, is_correct) VALUES (%s, 'Да', TRUE)", (question_id,))
+    cursor = db.cursor()
+    cursor.execute("SELECT course_id FROM topics WHERE id = %s", (topic,))
+    course_id = cursor.fetchone()['course_id']
+
+    assert admin.post(f'/admin/delete_course/{course_id}').status_code == 302
+    assert blobstore.find(sha256) is None
+    cursor.execute("SELECT COUNT(*) AS n FROM answers WHERE question_id = %s", (question_id,))
+    assert cursor.fetchone()['n'] == 0
+    cursor.close()
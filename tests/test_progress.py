@@ -0,0 +1,15 @@
+import jobs
+from conftest import insert
+
+
+def test_repeat_view_keeps_report_version(employee, db, topic):
+    insert(db, "INSERT INTO materials (topic_id, content, body) VALUES (%s, 'Материал', 'Текст')", (topic,))
+    before = jobs.version_key('progress_xlsx')
+
+    assert employee.get(f'/courses/{topic}/materials').status_code == 200
+    first = jobs.version_key('progress_xlsx')
+    assert first != before
+
+    for _ in range(3):
+        assert employee.get(f'/courses/{topic}/materials').status_code == 200
+        assert jobs.version_key('progress_xlsx') == first
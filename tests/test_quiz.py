@@ -0,0 +1,97 @@
+import re
+
+import quiz
+from conftest import insert
+
+RADIO_RE = re.compile(r'name="question_(\d+)" value="(\d+)"')
+
+
+def add_question(db, topic_id, number):
+    question_id = insert(db, "INSERT INTO questions (topic_id, question_text) VALUES (%s, %s)",
+                         (topic_id, f'Вопрос {number}'))
+    insert(db, "INSERT INTO answers (question_id, answer_text, is_correct) VALUES (%s, 'Да', TRUE)",
+           (question_id,))
+    insert(db, "INSERT INTO answers (question_id, answer_text, is_correct) VALUES (%s, 'Нет', FALSE)",
+           (question_id,))
+    return question_id
+
+
+def sampled_topic(db, topic_id, questions=20, per_test=5):
+    insert(db, "UPDATE topics SET questions_per_test = %s WHERE id = %s", (per_test, topic_id))
+    return [add_question(db, topic_id, n) for n in range(questions)]
+
+
+def shown(page):
+    """{question_id: первый вариант ответа} со страницы теста."""
+    questions = {}
+    for question_id, answer_id in RADIO_RE.findall(page.get_data(as_text=True)):
+        questions.setdefault(int(question_id), int(answer_id))
+    return questions
+
+
+def submit(client, topic_id, questions):
+    return client.post(f'/user/test/{topic_id}',
+                       data={f'question_{q}': a for q, a in questions.items()})
+
+
+def graded(db, user_id):
+    cursor = db.cursor()
+    cursor.execute("SELECT ra.question_id FROM result_answers ra JOIN results r ON r.id = ra.result_id "
+                   "WHERE r.user_id = %s", (user_id,))
+    ids = {row['question_id'] for row in cursor.fetchall()}
+    db.commit()
+    cursor.close()
+    return ids
+
+
+def test_grades_only_issued_questions(employee, db, topic):
+    sampled_topic(db, topic)
+    questions = shown(employee.get(f'/user/test/{topic}'))
+    assert len(questions) == 5
+    # Перезагрузка страницы выдаёт тот же набор
+    assert shown(employee.get(f'/user/test/{topic}')) == questions
+
+    assert submit(employee, topic, questions).status_code == 200
+    assert graded(db, employee.user_id) == set(questions)
+
+
+def test_pool_change_between_get_and_post_is_not_graded(employee, db, topic):
+    sampled_topic(db, topic)
+    questions = shown(employee.get(f'/user/test/{topic}'))
+
+    # Админ удаляет выданный вопрос, пока сотрудник отвечает
+    removed = next(iter(questions))
+    insert(db, "DELETE FROM answers WHERE question_id = %s", (removed,))
+    insert(db, "DELETE FROM questions WHERE id = %s", (removed,))
+    quiz.invalidate(topic)
+
+    response = submit(employee, topic, questions)
+    assert response.status_code == 409
+    assert graded(db, employee.user_id) == set()
+    # Выдан новый набор из актуального пула, и его можно сдать
+    again = shown(response)
+    assert len(again) == 5 and removed not in again
+    assert submit(employee, topic, again).status_code == 200
+    assert graded(db, employee.user_id) == set(again)
+
+
+def test_stale_worker_pool_is_rechecked_against_primary(employee, db, topic):
+    sampled_topic(db, topic)
+    with db.cursor() as cursor:
+        stale = quiz.load_pool(cursor, topic)
+    db.commit()
+    add_question(db, topic, 'новый')
+    quiz.invalidate(topic)
+    questions = shown(employee.get(f'/user/test/{topic}'))
+
+    # Отправка попала в воркер, где пул ещё старый
+    quiz._pools[topic] = (quiz._pools[topic][0], stale)
+    assert submit(employee, topic, questions).status_code == 200
+    assert graded(db, employee.user_id) == set(questions)
+
+
+def test_submit_without_started_attempt_is_not_graded(employee, db, topic):
+    ids = sampled_topic(db, topic)
+    response = submit(employee, topic, {q: 0 for q in ids})
+    assert response.status_code == 409
+    assert graded(db, employee.user_id) == set()
@@ -0,0 +1,51 @@
+import os
+import sqlite3
+
+import pytest
+
+import catalog
+import config
+import database
+import metrics
+import sqlite_backend
+from conftest import insert
+from test_quiz import RADIO_RE, add_question
+
+
+@pytest.fixture
+def lagging_replica(monkeypatch, db, tmp_path):
+    """Реплика, застывшая на текущем состоянии основной БД: вызвать snapshot()."""
+    path = str(tmp_path / 'replica.sqlite3')
+
+    def connect():
+        conn = sqlite_backend.SQLiteConnection(path, metrics.InstrumentedCursor)
+        conn.fills_cache = False
+        return conn
+
+    def snapshot():
+        source = sqlite3.connect(os.environ['SQLITE_PATH'])
+        with sqlite3.connect(path) as target:
+            source.backup(target)
+        source.close()
+        pool = database.ConnectionPool(connect=connect, size=1)
+        monkeypatch.setattr(database, 'replica_pools', lambda: [pool])
+        monkeypatch.setattr(config, 'DB_REPLICAS', ['replica'])
+
+    return snapshot
+
+
+def test_quiz_pool_is_loaded_from_primary(employee, db, topic, lagging_replica):
+    add_question(db, topic, 1)
+    lagging_replica()
+    fresh = add_question(db, topic, 2)
+
+    page = employee.get(f'/user/test/{topic}').get_data(as_text=True)
+    assert str(fresh) in {question_id for question_id, _ in RADIO_RE.findall(page)}
+
+
+def test_catalog_is_loaded_from_primary(employee, db, topic, lagging_replica):
+    lagging_replica()
+    insert(db, "INSERT INTO courses (name, title) VALUES ('Новый курс', 'Новый курс')")
+    catalog.invalidate()
+
+    assert 'Новый курс' in employee.get('/user/courses').get_data(as_text=True)
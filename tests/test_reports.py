@@ -0,0 +1,21 @@
+import reports
+from conftest import insert
+
+
+def test_name_filter_matches_wildcards_literally(db, topic):
+    for full_name in ('Иван_Петров', 'ИванXПетров', 'Иван%Сидоров', 'Иванов Иван', 'Иван!Орлов', 'Иван!!Орлов'):
+        user_id = insert(db, "INSERT INTO users (name, email, full_name, role) VALUES (%s, %s, %s, 'user')",
+                         (full_name, f'{full_name}@test.local', full_name))
+        insert(db, "INSERT INTO course_progress (user_id, topic_id) VALUES (%s, %s)", (user_id, topic))
+
+    def names(prefix):
+        filters = reports.progress_filters({'name': prefix})
+        cursor = db.cursor()
+        rows, _, _ = reports.fetch_progress_page(cursor, filters)
+        cursor.close()
+        return sorted(row['full_name'] for row in rows)
+
+    assert names('Иван_') == ['Иван_Петров']
+    assert names('Иван%') == ['Иван%Сидоров']
+    assert names('Иван!') == ['Иван!!Орлов', 'Иван!Орлов']
+    assert names('Иван!!') == ['Иван!!Орлов']
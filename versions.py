@@ -0,0 +1,74 @@
+# Версии данных для кэшей: админка вызывает bump(), кэш сравнивает
+# сохранённую версию с current() и перечитывает данные, если она сменилась.
+#
+# Без CACHE_SHARED_DIR версии живут в памяти воркера, и bump() в одном
+# воркере gunicorn не виден остальным — там устаревание ограничено TTL
+# конкретного кэша. С CACHE_SHARED_DIR версия хранится файлом в общем
+# каталоге и видна всем воркерам сразу; там же можно держать сами данные
+# (load_shared/store_shared), чтобы воркеры не ходили в БД каждый за своей копией.
+
+import os
+import pickle
+import secrets
+import threading
+import time
+
+import config
+
+# Префикс отличает версии разных процессов, пока общего каталога нет
+_boot = secrets.token_hex(4)
+_local = {}
+_lock = threading.Lock()
+
+
+def _path(name, suffix):
+    return os.path.join(config.CACHE_SHARED_DIR, f"{name}.{suffix}")
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def current(name):
+    """Текущая версия данных name (непрозрачная строка)."""
+    if config.CACHE_SHARED_DIR:
+        try:
+            with open(_path(name, 'version'), encoding='ascii') as f:
+                return f.read()
+        except FileNotFoundError:
+            return '0'
+    with _lock:
+        return f"{_boot}-{_local.get(name, 0)}"
+
+
+def bump(name):
+    """Отмечает, что данные name изменились; возвращает новую версию."""
+    if config.CACHE_SHARED_DIR:
+        os.makedirs(config.CACHE_SHARED_DIR, exist_ok=True)
+        version = f"{time.time_ns():x}-{os.getpid()}"
+        _write_atomic(_path(name, 'version'), version.encode('ascii'))
+        return version
+    with _lock:
+        _local[name] = _local.get(name, 0) + 1
+        return f"{_boot}-{_local[name]}"
+
+
+def load_shared(name, version):
+    """Данные из общего каталога, если они сохранены для этой версии."""
+    if not config.CACHE_SHARED_DIR:
+        return None
+    try:
+        with open(_path(name, 'data'), 'rb') as f:
+            stored_version, data = pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return None
+    return data if stored_version == version else None
+
+
+def store_shared(name, version, data):
+    if config.CACHE_SHARED_DIR:
+        os.makedirs(config.CACHE_SHARED_DIR, exist_ok=True)
+        _write_atomic(_path(name, 'data'), pickle.dumps((version, data)))
@@ -0,0 +1 @@
+# Blueprint'ы приложения; регистрируются в app.create_app().
@@ -0,0 +1,621 @@
+# Админка: курсы, темы, материалы, вопросы тестов, приглашения сотрудников.
+
+import secrets
+
+from flask import Blueprint, Response, jsonify, redirect, render_template, request, session, url_for
+
+import blobstore
+import catalog
+import invites
+import previews
+import querycache
+import question_import
+import quiz
+import reports
+import search
+import tabular
+from database import get_db, get_pool, route_stats
+from helpers import require_admin
+
+bp = Blueprint('admin', __name__)
+
+COURSES_QUERY = "SELECT id, name, title FROM courses"
+COURSE_QUERY = "SELECT * FROM courses WHERE id = %s"
+COURSE_TOPICS_QUERY = "SELECT * FROM topics WHERE course_id = %s"
+TOPICS_QUERY = "SELECT id, title, course_id FROM topics"
+TOPIC_QUERY = "SELECT id, title, course_id, questions_per_test, shuffle_answers FROM topics WHERE id = %s"
+MATERIALS_QUERY = "SELECT id, topic_id, content, file_path FROM materials"
+TOPIC_MATERIALS_QUERY = "SELECT * FROM materials WHERE topic_id = %s"
+MATERIAL_FILE_QUERY = "SELECT file_sha256 FROM materials WHERE id = %s"
+TOPIC_QUESTIONS_QUERY = "SELECT id, question_text FROM questions WHERE topic_id = %s"
+QUESTION_ANSWERS_QUERY = "SELECT answer_text, is_correct FROM answers WHERE question_id = %s"
+QUESTION_TOPIC_QUERY = "SELECT topic_id FROM questions WHERE id = %s"
+INVITED_USERS_QUERY = "SELECT id, email, full_name, is_confirmed, invite_token FROM users WHERE role = 'user'"
+
+INSERT_COURSE_QUERY = "INSERT INTO courses (name) VALUES (%s)"
+RENAME_COURSE_QUERY = "UPDATE courses SET title = %s WHERE id = %s"
+DELETE_COURSE_QUERY = "DELETE FROM courses WHERE id = %s"
+INSERT_TOPIC_QUERY = "INSERT INTO topics (title, course_id) VALUES (%s, %s)"
+INSERT_LOOSE_TOPIC_QUERY = "INSERT INTO topics (title) VALUES (%s)"
+UPDATE_TOPIC_QUERY = "UPDATE topics SET title = %s, questions_per_test = %s, shuffle_answers = %s WHERE id = %s"
+# Удаление тем вместе с содержимым (_delete_topics). FOR UPDATE держит материалы
+# тем до COMMIT: файл, добавленный параллельно, не останется без collect()
+TOPICS_FILES_QUERY = """
+    SELECT DISTINCT file_sha256 FROM materials
+    WHERE topic_id IN ({placeholders}) AND file_sha256 IS NOT NULL FOR UPDATE
+"""
+DELETE_TOPICS_MATERIALS_QUERY = "DELETE FROM materials WHERE topic_id IN ({placeholders})"
+DELETE_TOPICS_ANSWERS_QUERY = """
+    DELETE FROM answers WHERE question_id IN (SELECT id FROM questions WHERE topic_id IN ({placeholders}))
+"""
+DELETE_TOPICS_QUESTIONS_QUERY = "DELETE FROM questions WHERE topic_id IN ({placeholders})"
+DELETE_TOPICS_QUERY = "DELETE FROM topics WHERE id IN ({placeholders})"
+INSERT_MATERIAL_QUERY = """
+    INSERT INTO materials (topic_id, content, body, file_path, file_sha256) VALUES (%s, %s, %s, %s, %s)
+"""
+DELETE_MATERIAL_QUERY = "DELETE FROM materials WHERE id = %s"
+INSERT_QUESTION_QUERY = "INSERT INTO questions (topic_id, question_text) VALUES (%s, %s)"
+INSERT_ANSWER_QUERY = "INSERT INTO answers (question_id, answer_text, is_correct) VALUES (%s, %s, %s)"
+DELETE_QUESTION_ANSWERS_QUERY = "DELETE FROM answers WHERE question_id = %s"
+DELETE_QUESTION_QUERY = "DELETE FROM questions WHERE id = %s"
+INSERT_INVITE_QUERY = """
+    INSERT INTO users (email, role, is_confirmed, invite_token, full_name) VALUES (%s, %s, %s, %s, %s)
+"""
+DELETE_INVITED_USER_QUERY = "DELETE FROM users WHERE id = %s AND is_confirmed = FALSE"
+UPDATE_FULL_NAME_QUERY = "UPDATE users SET full_name = %s WHERE id = %s"
+
+# Подсказки для flask db-check (migrations.route_queries): списки в админке
+# показывают таблицу целиком, полный проход здесь ожидаем
+EXPLAIN_HINTS = {
+    'COURSES_QUERY': {'scans': {'courses'}},
+    'TOPICS_QUERY': {'scans': {'topics'}},
+    'MATERIALS_QUERY': {'scans': {'materials'}},
+    # Почти все пользователи — сотрудники, индекс по role не сузил бы выборку
+    'INVITED_USERS_QUERY': {'scans': {'users'}},
+}
+
+
+def _delete_topics(cursor, topic_ids):
+    """Удаляет темы с материалами, вопросами и ответами, не коммитит.
+
+    Возвращает sha256 файлов удалённых материалов: после COMMIT их нужно
+    передать в _collect_files, иначе файлы останутся в BLOB_DIR навсегда.
+    """
+    if not topic_ids:
+        return set()
+    placeholders = ", ".join(["%s"] * len(topic_ids))
+    cursor.execute(TOPICS_FILES_QUERY.format(placeholders=placeholders), topic_ids)
+    files = {row['file_sha256'] for row in cursor.fetchall()}
+    for query in (DELETE_TOPICS_MATERIALS_QUERY, DELETE_TOPICS_ANSWERS_QUERY,
+                  DELETE_TOPICS_QUESTIONS_QUERY, DELETE_TOPICS_QUERY):
+        cursor.execute(query.format(placeholders=placeholders), topic_ids)
+    return files
+
+
+def _collect_files(cursor, files):
+    # Как в delete_material: файл удаляется, только если на него не ссылаются другие материалы
+    for sha256 in sorted(files):
+        blobstore.collect(cursor, sha256)
+
+
+@bp.route('/admin')
+def admin_panel():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+    return render_template('admin.html')
+
+
+@bp.route('/admin/courses')
+@require_admin
+def admin_courses():
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(COURSES_QUERY)
+    courses = cursor.fetchall()
+    return render_template('admin_courses.html', courses=courses)
+
+
+@bp.route('/admin/add_course', methods=['GET', 'POST'])
+@require_admin
+def add_course():
+    if request.method == 'POST':
+        title = request.form['title']
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute(INSERT_COURSE_QUERY, (title,))
+        db.commit()
+        catalog.invalidate()
+        return redirect(url_for('admin.admin_courses'))
+    return render_template('admin_add_course.html')
+
+
+@bp.route('/admin/edit_course/<int:course_id>', methods=['GET', 'POST'])
+@require_admin
+def edit_course(course_id):
+    db = get_db()
+    cursor = db.cursor()
+
+    if request.method == 'POST':
+        new_title = request.form['title']
+        cursor.execute(RENAME_COURSE_QUERY, (new_title, course_id))
+        db.commit()
+        catalog.invalidate()
+        return redirect(url_for('admin.admin_courses'))
+
+    cursor.execute(COURSE_QUERY, (course_id,))
+    course = cursor.fetchone()
+    return render_template('admin_edit_course.html', course=course)
+
+
+@bp.route('/admin/delete_course/<int:course_id>', methods=['POST'])
+@require_admin
+def delete_course(course_id):
+    db = get_db()
+    cursor = db.cursor()
+
+    # Удалим все темы, связанные с курсом, вместе с их материалами и вопросами
+    cursor.execute(COURSE_TOPICS_QUERY, (course_id,))
+    topic_ids = [row['id'] for row in cursor.fetchall()]
+    files = _delete_topics(cursor, topic_ids)
+    cursor.execute(DELETE_COURSE_QUERY, (course_id,))
+    db.commit()
+    _collect_files(cursor, files)
+    # Как в delete_topic: пул вопросов и поисковый индекс не должны отдавать удалённые темы
+    for topic_id in topic_ids:
+        quiz.invalidate(topic_id)
+    search.remove_topics(topic_ids)
+    catalog.invalidate()
+    return redirect(url_for('admin.admin_courses'))
+
+
+@bp.route('/admin/courses/<int:course_id>/add_topic', methods=['GET', 'POST'])
+@require_admin
+def add_topic_to_course(course_id):
+    db = get_db()
+    cursor = db.cursor()
+
+    # Проверка: курс существует?
+    cursor.execute(COURSE_QUERY, (course_id,))
+    course = cursor.fetchone()
+    if not course:
+        return "Курс не найден", 404
+
+    if request.method == 'POST':
+        title = request.form['title']
+        cursor.execute(INSERT_TOPIC_QUERY, (title, course_id))
+        db.commit()
+        catalog.invalidate()
+        return redirect(url_for('admin.course_topics', course_id=course_id))
+
+    return render_template('admin_add_topic_to_course.html', course=course)
+
+
+@bp.route('/admin/topics/<int:topic_id>/materials')
+@require_admin
+def topic_materials(topic_id):
+    db = get_db()
+    cursor = db.cursor()
+
+    # Получаем тему
+    cursor.execute(TOPIC_QUERY, (topic_id,))
+    topic = cursor.fetchone()
+    if not topic:
+        return "Тема не найдена", 404
+
+    # Получаем материалы
+    cursor.execute(TOPIC_MATERIALS_QUERY, (topic_id,))
+    materials = cursor.fetchall()
+
+    return render_template('admin_topic_materials.html', topic=topic, materials=materials)
+
+
+@bp.route('/admin/courses/<int:course_id>/topics')
+@require_admin
+def course_topics(course_id):
+    db = get_db()
+    cursor = db.cursor()
+
+    # Получаем курс
+    cursor.execute(COURSE_QUERY, (course_id,))
+    course = cursor.fetchone()
+    if not course:
+        return "Курс не найден", 404
+
+    # Получаем темы по курсу
+    cursor.execute(COURSE_TOPICS_QUERY, (course_id,))
+    topics = cursor.fetchall()
+
+    return render_template('admin_course_topics.html', course=course, topics=topics)
+
+
+@bp.route('/admin/topics')
+def admin_topics():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(TOPICS_QUERY)
+    topics = cursor.fetchall()
+    cursor.close()
+
+    return render_template('admin_topics.html', topics=topics)
+
+
+@bp.route('/admin/add_topic', methods=['GET', 'POST'])
+def add_topic():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+
+    if request.method == 'POST':
+        title = request.form['title']
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute(INSERT_LOOSE_TOPIC_QUERY, (title,))
+        db = get_db()
+        db.commit()
+        cursor.close()
+        return redirect(url_for('admin.admin_topics'))
+
+    return render_template('admin_add_topic.html')
+
+
+@bp.route('/admin/edit_topic/<int:topic_id>', methods=['GET', 'POST'])
+def edit_topic(topic_id):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+
+    db = get_db()
+    cursor = db.cursor()
+    if request.method == 'POST':
+        new_title = request.form['title']
+        # Пустое поле или 0 — в тест попадают все вопросы темы
+        per_test = request.form.get('questions_per_test', '').strip()
+        per_test = int(per_test) if per_test.isdigit() and int(per_test) > 0 else None
+        shuffle = 'shuffle_answers' in request.form
+        cursor.execute(UPDATE_TOPIC_QUERY, (new_title, per_test, shuffle, topic_id))
+        db = get_db()
+        db.commit()
+        catalog.invalidate()
+        quiz.invalidate(topic_id)
+        cursor.close()
+        return redirect(url_for('admin.admin_topics'))
+
+    cursor.execute(TOPIC_QUERY, (topic_id,))
+    topic = cursor.fetchone()
+    cursor.close()
+
+    if not topic:
+        return "Тема не найдена"
+    return render_template('admin_edit_topic.html', topic=topic)
+
+
+@bp.route('/admin/delete_topic/<int:topic_id>', methods=['POST'])
+def delete_topic(topic_id):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+
+    db = get_db()
+    cursor = db.cursor()
+    # Вместе с темой удаляются её материалы, вопросы и ответы
+    files = _delete_topics(cursor, [topic_id])
+    db = get_db()
+    db.commit()
+    _collect_files(cursor, files)
+    cursor.close()
+    quiz.invalidate(topic_id)
+    search.remove_topic(topic_id)
+    catalog.invalidate()
+
+    return redirect(url_for('admin.admin_topics'))
+
+
+@bp.route('/admin/materials')
+def admin_materials():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(MATERIALS_QUERY)
+    materials = cursor.fetchall()
+    cursor.close()
+
+    return render_template('admin_materials.html', materials=materials)
+
+
+@bp.route('/admin/add_material/<int:topic_id>', methods=['GET', 'POST'])
+def add_material(topic_id):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+
+    if request.method == 'POST':
+        content = request.form['content']
+        body = request.form.get('body')
+        file = request.files.get('file')
+        file_path = None
+        file_sha256 = None
+
+        if file and file.filename:
+            # Файл уже записан на диск при разборе формы, хэш посчитан по ходу
+            file_sha256, file_path = blobstore.store(file)
+
+        db = get_db()
+        cursor = db.cursor()
+
+        cursor.execute(INSERT_MATERIAL_QUERY, (topic_id, content, body, file_path, file_sha256))
+        material_id = cursor.lastrowid
+        db.commit()
+        cursor.close()
+        if file_sha256:
+            blobstore.ensure(file, file_sha256)
+
+        search.index_material({'id': material_id, 'topic_id': topic_id, 'content': content, 'body': body,
+                               'file_path': file_path, 'file_sha256': file_sha256})
+
+        # Превью страниц/слайдов строится в фоне, ответ админу не ждёт рендера
+        if file_path:
+            previews.submit(file_sha256, blobstore.full_path(file_path))
+
+        return redirect(url_for('admin.admin_topics'))
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(TOPIC_QUERY, (topic_id,))
+    topic = cursor.fetchone()
+    cursor.close()
+
+    return render_template('admin_add_material.html', topic=topic)
+
+
+@bp.route('/admin/delete_material/<int:material_id>', methods=['POST'])
+def delete_material(material_id):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(MATERIAL_FILE_QUERY, (material_id,))
+    material = cursor.fetchone()
+    cursor.execute(DELETE_MATERIAL_QUERY, (material_id,))
+    db = get_db()
+    db.commit()
+
+    # Файл удаляется, только если на него не ссылаются другие материалы
+    if material:
+        blobstore.collect(cursor, material['file_sha256'])
+    cursor.close()
+    search.remove_material(material_id)
+
+    return redirect(url_for('admin.admin_materials'))
+
+
+@bp.route('/admin/add_question/<int:topic_id>', methods=['GET', 'POST'])
+def add_question(topic_id):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(TOPIC_QUERY, (topic_id,))
+    topic = cursor.fetchone()
+
+    if not topic:
+        return "Тема не найдена", 404
+
+    if request.method == 'POST':
+        question_text = request.form['question']
+        answers = [
+            request.form['answer1'],
+            request.form['answer2'],
+            request.form['answer3'],
+            request.form['answer4']
+        ]
+        correct = int(request.form['correct'])
+
+        # Сохраняем вопрос
+        cursor.execute(INSERT_QUESTION_QUERY, (topic_id, question_text))
+        question_id = cursor.lastrowid
+
+        # Сохраняем варианты ответа
+        for i in range(4):
+            is_correct = 1 if (i + 1) == correct else 0
+            cursor.execute(INSERT_ANSWER_QUERY, (question_id, answers[i], is_correct))
+
+        db.commit()
+        cursor.close()
+        quiz.invalidate(topic_id)
+        search.index_question({'id': question_id, 'topic_id': topic_id, 'question_text': question_text})
+        return redirect(url_for('admin.course_topics', course_id=topic['course_id']))
+
+    return render_template('admin_add_question.html', topic=topic)
+
+
+@bp.route('/admin/topics/<int:topic_id>/questions')
+@require_admin
+def view_questions(topic_id):
+    db = get_db()
+    cursor = db.cursor()
+
+    cursor.execute(TOPIC_QUERY, (topic_id,))
+    topic_row = cursor.fetchone()
+    if not topic_row:
+        return "Тема не найдена", 404
+
+    topic = {
+        "id": topic_row["id"],
+        "title": topic_row["title"],
+        "course_id": topic_row["course_id"]
+    }
+
+    cursor.execute(TOPIC_QUESTIONS_QUERY, (topic_id,))
+    questions = []
+    for row in cursor.fetchall():
+        q_id = row["id"]
+        q_text = row["question_text"]
+
+        cursor.execute(QUESTION_ANSWERS_QUERY, (q_id,))
+        answers = [{"text": a["answer_text"], "is_correct": a["is_correct"]} for a in cursor.fetchall()]
+
+        questions.append({"id": q_id, "text": q_text, "answers": answers})
+
+    return render_template("admin_view_questions.html", topic=topic, questions=questions)
+
+
+@bp.route('/admin/topics/<int:topic_id>/import_questions', methods=['GET', 'POST'])
+@require_admin
+def import_questions(topic_id):
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(TOPIC_QUERY, (topic_id,))
+    topic = cursor.fetchone()
+    cursor.close()
+    if not topic:
+        return "Тема не найдена", 404
+
+    errors, report = [], None
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            errors = ["Выберите файл"]
+        else:
+            try:
+                report = question_import.import_rows(db, topic_id, tabular.read_rows(file.stream, file.filename))
+            except (tabular.TableFormatError, question_import.QuestionImportError) as e:
+                errors = getattr(e, 'errors', [str(e)])
+            except Exception as e:
+                errors = [f"Не удалось прочитать файл: {e}"]
+
+    return render_template('admin_import_questions.html', topic=topic, errors=errors, report=report)
+
+
+@bp.route('/admin/delete_question/<int:question_id>', methods=['POST'])
+@require_admin
+def delete_question(question_id):
+    db = get_db()
+    cursor = db.cursor()
+
+    # Получаем topic_id для возврата обратно
+    cursor.execute(QUESTION_TOPIC_QUERY, (question_id,))
+    row = cursor.fetchone()
+    if not row:
+        return "Вопрос не найден", 404
+
+    topic_id = row["topic_id"]
+
+    # Удаляем ответы, потом вопрос
+    cursor.execute(DELETE_QUESTION_ANSWERS_QUERY, (question_id,))
+    cursor.execute(DELETE_QUESTION_QUERY, (question_id,))
+    db.commit()
+    quiz.invalidate(topic_id)
+    search.remove_question(question_id)
+
+    return redirect(url_for('admin.view_questions', topic_id=topic_id))
+
+
+@bp.route('/admin/invite', methods=['GET', 'POST'])
+def invite_user():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+
+    invite_link = None
+
+    if request.method == 'POST':
+        full_name = request.form.get('full_name')
+        email = request.form['email']
+        token = secrets.token_hex(16)
+
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute(INSERT_INVITE_QUERY, (email, 'user', False, token, full_name))
+        db.commit()
+        cursor.close()
+
+        invite_link = url_for('auth.complete_invite', token=token, _external=True)
+
+    return render_template('admin_invite_user.html', invite_link=invite_link)
+
+
+@bp.route('/admin/invite/bulk', methods=['GET', 'POST'])
+@require_admin
+def invite_bulk():
+    errors = []
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            errors = ["Выберите файл"]
+        else:
+            try:
+                people = invites.parse(tabular.read_rows(file.stream, file.filename))
+                invited, skipped = invites.invite_many(get_db(), people)
+            except (tabular.TableFormatError, invites.InviteImportError) as e:
+                errors = getattr(e, 'errors', [str(e)])
+            except Exception as e:
+                errors = [f"Не удалось прочитать файл: {e}"]
+            else:
+                path = invites.build_result_xlsx(
+                    invited, skipped, lambda token: url_for('auth.complete_invite', token=token, _external=True))
+                return Response(
+                    reports.iter_file_and_remove(path),
+                    mimetype=reports.XLSX_MIMETYPE,
+                    headers={"Content-Disposition": "attachment; filename=invites.xlsx"}
+                )
+
+    return render_template('admin_invite_bulk.html', errors=errors)
+
+
+@bp.route('/admin/invited_users')
+def invited_users():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(INVITED_USERS_QUERY)
+    users = cursor.fetchall()
+    cursor.close()
+
+    return render_template('admin_invited_users.html', users=users)
+
+
+@bp.route('/admin/delete_invited_user/<int:user_id>', methods=['POST'])
+def delete_invited_user(user_id):
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(DELETE_INVITED_USER_QUERY, (user_id,))
+    db = get_db()
+    db.commit()
+    cursor.close()
+
+    return redirect(url_for('admin.invited_users'))
+
+
+@bp.route('/admin/update_full_name', methods=['POST'])
+def update_full_name():
+    user_id = request.form.get('user_id')
+    full_name = request.form.get('full_name')
+
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(UPDATE_FULL_NAME_QUERY, (full_name, user_id))
+    db.commit()
+    cursor.close()
+
+    return redirect(url_for('admin.invited_users'))
+
+
+@bp.route('/admin/staff')
+def admin_staff():
+    if 'user_id' not in session or session.get('role') != 'admin':
+        return redirect(url_for('auth.login'))
+    return render_template('admin_staff.html')
+
+
+@bp.route('/admin/cache_stats')
+@require_admin
+def cache_stats():
+    return jsonify(query_cache=querycache.get_cache().stats(), db_pool=get_pool().stats(),
+                   db_routes=route_stats())
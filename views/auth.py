@@ -0,0 +1,96 @@
+# Вход, выход, главная и завершение приглашения.
+
+from flask import Blueprint, redirect, render_template, request, session, url_for
+
+from database import get_db, primary_db
+
+bp = Blueprint('auth', __name__)
+
+LOGIN_QUERY = "SELECT * FROM users WHERE email=%s AND password=%s"
+INVITE_QUERY = "SELECT * FROM users WHERE invite_token = %s AND is_confirmed = FALSE"
+CONFIRM_INVITE_QUERY = "UPDATE users SET password = %s, is_confirmed = TRUE, invite_token = NULL WHERE id = %s"
+
+# Подсказки для flask db-check (migrations.route_queries): параметры EXPLAIN
+# и таблицы, которые запрос намеренно читает целиком
+EXPLAIN_HINTS = {
+    'LOGIN_QUERY': {'params': ('admin@corp.com', 'admin')},
+    'INVITE_QUERY': {'params': ('x',)},
+}
+
+
+@bp.route('/')
+def index():
+    if 'user_id' in session:
+        return redirect(url_for('auth.user_dashboard'))
+    return render_template('login.html')
+
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        email = request.form['email']
+        password = request.form['password']
+
+        db = get_db()
+        cursor = db.cursor()
+        cursor.execute(LOGIN_QUERY, (email, password))
+        user = cursor.fetchone()
+        cursor.close()
+
+        if user:
+            session['user_id'] = user['id']  # или user['id'], если cursor возвращает dict
+            session['role'] = user['role']     # или user['role']
+            return redirect(url_for('auth.user_dashboard'))
+        else:
+            return 'Неверный логин или пароль'
+
+    return render_template('login.html')
+
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    return redirect(url_for('auth.login'))
+
+
+@bp.route('/dashboard')
+def dashboard():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+
+    # если админ — отправим в админку
+    if session.get('role') == 'admin':
+        return redirect(url_for('admin.admin_panel'))
+
+    return render_template('user_dashboard.html')
+
+
+@bp.route('/dashboard')
+def user_dashboard():  # ← новое имя функции
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    return render_template('user_dashboard.html')
+
+
+# Ссылку открывают сразу после приглашения — реплика может ещё не получить токен
+@bp.route('/invite/<token>', methods=['GET', 'POST'])
+@primary_db
+def complete_invite(token):
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(INVITE_QUERY, (token,))
+    user = cursor.fetchone()
+
+    if not user:
+        return "Ссылка недействительна или пользователь уже активирован."
+
+    if request.method == 'POST':
+        password = request.form['password']
+        cursor.execute(CONFIRM_INVITE_QUERY, (password, user['id']))
+        db = get_db()
+        db.commit()
+        cursor.close()
+        return redirect(url_for('auth.login'))
+
+    cursor.close()
+    return render_template('complete_invite.html', email=user['email'])
@@ -0,0 +1,140 @@
+# Отчёты по прогрессу (страница, диаграмма, выгрузка), анализ вопросов и /metrics.
+# Эти GET-маршруты только читают, поэтому при DB_REPLICAS идут на реплики.
+
+from flask import Blueprint, Response, abort, jsonify, redirect, render_template, request, send_file, url_for
+
+import item_analysis
+import jobs
+import metrics
+import querycache
+import reports
+from database import get_db, get_pool, route_stats
+from helpers import require_admin
+
+bp = Blueprint('reports', __name__)
+
+TOPICS_QUERY = "SELECT id, title FROM topics ORDER BY title"
+
+# Подсказки для flask db-check (migrations.route_queries): параметры EXPLAIN
+# и таблицы, которые запрос намеренно читает целиком
+EXPLAIN_HINTS = {
+    'TOPICS_QUERY': {'scans': {'topics'}},
+}
+
+
+@bp.route("/admin/progress")
+@require_admin
+def admin_progress():
+    db = get_db()
+    cursor = db.cursor()
+
+    filters = reports.progress_filters(request.args)
+    after = reports.decode_cursor(request.args.get('after'))
+    before = reports.decode_cursor(request.args.get('before'))
+
+    progress_data, has_prev, has_next = reports.fetch_progress_page(cursor, filters, after=after, before=before)
+    total = reports.count_progress(cursor, filters)
+
+    cursor.execute(TOPICS_QUERY)
+    topics = cursor.fetchall()
+
+    # Фильтры сохраняются в ссылках на соседние страницы
+    filter_args = {k: request.args[k] for k in ('topic_id', 'passed', 'score_min', 'score_max', 'name') if request.args.get(k)}
+    prev_url = next_url = None
+    if progress_data and has_prev:
+        prev_url = url_for('reports.admin_progress', before=reports.encode_cursor(progress_data[0]), **filter_args)
+    if progress_data and has_next:
+        next_url = url_for('reports.admin_progress', after=reports.encode_cursor(progress_data[-1]), **filter_args)
+
+    return render_template("admin_progress.html", progress_data=progress_data, topics=topics,
+                           filters=filters, total=total, prev_url=prev_url, next_url=next_url)
+
+
+@bp.route("/admin/progress/chart")
+@require_admin
+def progress_chart():
+    # Готовая сводка по темам, закэшированная файлом до следующей записи прогресса
+    data = jobs.load_json('progress_chart')
+    return render_template("admin_progress_chart.html", labels=data['labels'], values=data['values'],
+                           passed=data['passed'])
+
+
+@bp.route('/admin/progress/export')
+@require_admin
+def export_progress_excel():
+    kind = 'progress_csv' if request.args.get('format') == 'csv' else 'progress_xlsx'
+    # Данные не менялись с прошлой выгрузки — файл сразу с диска
+    key = jobs.version_key(kind)
+    if jobs.result_path(kind, key):
+        return redirect(url_for('reports.report_download', kind=kind, key=key))
+
+    # Иначе отчёт строится в фоне, страница ждёт его, обновляясь
+    key, state = jobs.submit(kind, key)
+    return render_template("admin_report_job.html", state=state, retry_url=request.full_path,
+                           status_url=url_for('reports.report_status', kind=kind, key=key),
+                           done_url=url_for('reports.report_download', kind=kind, key=key)), 202
+
+
+def _report_key(kind, key):
+    if kind not in jobs.REPORTS or not jobs.is_valid_key(key):
+        abort(404)
+
+
+@bp.route('/admin/reports/<kind>/<key>/status')
+@require_admin
+def report_status(kind, key):
+    _report_key(kind, key)
+    state = jobs.status(kind, key)
+    if state is None:
+        # Файл устарел или задание потерялось вместе с воркером — ставим заново
+        key, state = jobs.submit(kind, key)
+    return jsonify(status=state['status'], error=state.get('error'))
+
+
+@bp.route('/admin/reports/<kind>/<key>')
+@require_admin
+def report_download(kind, key):
+    _report_key(kind, key)
+    path = jobs.result_path(kind, key)
+    if not path:
+        abort(404)
+    report = jobs.REPORTS[kind]
+    # Ключ в URL однозначно задаёт содержимое файла
+    response = send_file(path, mimetype=report.mimetype, as_attachment=True,
+                         download_name=report.download_name, conditional=True)
+    response.cache_control.private = True
+    return response
+
+
+@bp.route('/admin/item_analysis')
+@require_admin
+def item_analysis_report():
+    cursor = get_db().cursor()
+    # Статистика посчитана заранее заданием item_analysis.run()
+    topics = item_analysis.read_topics(cursor)
+    topic_id = request.args.get('topic_id', type=int)
+    topic = next((row for row in topics if row['topic_id'] == topic_id), None)
+    items = item_analysis.read_items(cursor, topic_id) if topic else []
+    job = jobs.status('item_analysis', jobs.version_key('item_analysis'))
+    return render_template("admin_item_analysis.html", topics=topics, topic=topic, items=items, job=job,
+                           weak_discrimination=item_analysis.WEAK_DISCRIMINATION)
+
+
+@bp.route('/admin/item_analysis/refresh', methods=['POST'])
+@require_admin
+def refresh_item_analysis():
+    # Пересчёт идёт в фоне; если новых попыток не было, файл задания уже есть
+    # и задание не запускается
+    key, state = jobs.submit('item_analysis')
+    return render_template("admin_report_job.html", state=state,
+                           retry_url=url_for('reports.item_analysis_report'),
+                           status_url=url_for('reports.report_status', kind='item_analysis', key=key),
+                           done_url=url_for('reports.item_analysis_report',
+                                            topic_id=request.form.get('topic_id') or None)), 202
+
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    body = metrics.render(pool_stats=get_pool().stats(), cache_stats=querycache.get_cache().stats(),
+                          route_stats=route_stats())
+    return Response(body, mimetype='text/plain; version=0.0.4; charset=utf-8')
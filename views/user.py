@@ -0,0 +1,222 @@
+# Страницы сотрудника: каталог, материалы, файлы и превью, тест, поиск.
+
+from flask import Blueprint, jsonify, redirect, render_template, request, session, url_for
+
+import attempts
+import blobstore
+import catalog
+import downloads
+import pagecache
+import previews
+import progress
+import querycache
+import quiz
+import search
+from database import get_db, get_primary_db
+from helpers import require_login
+
+bp = Blueprint('user', __name__)
+
+TOPIC_QUERY = "SELECT id, title, course_id FROM topics WHERE id = %s"
+TOPIC_TITLE_QUERY = "SELECT title FROM topics WHERE id = %s"
+TOPIC_MATERIALS_QUERY = "SELECT id, content, body, file_path, file_sha256 FROM materials WHERE topic_id = %s"
+COURSE_MATERIALS_QUERY = "SELECT id, content AS title, file_path, file_sha256 FROM materials WHERE topic_id = %s"
+MATERIAL_QUERY = "SELECT * FROM materials WHERE id = %s"
+MATERIAL_FILE_QUERY = "SELECT id, file_path, file_sha256 FROM materials WHERE id = %s"
+
+
+@bp.route('/user/courses')
+def user_courses():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+
+    # Каталог берётся из кэша; в БД идём, только если его поменяли в админке
+    def render():
+        courses = catalog.get_catalog()
+        return render_template('user_courses.html', courses=courses)
+
+    return pagecache.cached_page(('courses',), render)
+
+
+@bp.route('/user/test/<int:topic_id>', methods=['GET', 'POST'])
+@querycache.no_query_cache  # у пула вопросов свой кэш в quiz.py
+def user_test(topic_id):
+    pool = quiz.get_pool(topic_id)
+    for key in quiz.LEGACY_SESSION_KEYS:
+        session.pop(key, None)
+    drawn = session.get(quiz.ATTEMPTS_SESSION_KEY, {})
+    started = quiz.started_attempt(drawn, topic_id)
+    if started is not None and started[1] != pool.version:
+        # Пул в памяти этого воркера мог устареть — сверяемся с основной БД
+        pool = quiz.load_pool(get_primary_db().cursor(), topic_id)
+    issued = quiz.issued_questions(pool, started)
+    notice = None
+
+    # Обработка отправки теста: проверяем только выданные вопросы
+    # по закэшированному ключу ответов
+    if request.method == 'POST':
+        if issued is not None:
+            attempt = quiz.responses(pool.key, request.form, issued)
+            percent = quiz.grade(attempt)
+            db = get_db()
+            cursor = db.cursor()
+            drawn.pop(str(topic_id))
+            session[quiz.ATTEMPTS_SESSION_KEY] = drawn
+            user_id = session.get("user_id")
+            # Попытка с ответами и последний балл в course_progress — одной транзакцией
+            attempts.record(cursor, user_id, topic_id, percent, attempt)
+            progress.record_test(db, user_id, topic_id, percent)
+
+            return render_template("user_result.html", score=percent)
+        # Попытка истекла или вопросы темы поменялись после выдачи: выданный
+        # набор уже не восстановить, поэтому не оцениваем, а выдаём тест заново
+        notice = "Вопросы теста изменились или попытка устарела. Пройдите тест заново."
+
+    # Зерно выборки и версия пула сохраняются в сессии: перезагрузка страницы
+    # не перевыбирает вопросы, а отправка проверяет именно их
+    if issued is None:
+        seed = quiz.open_attempt(drawn, topic_id, pool)
+        session[quiz.ATTEMPTS_SESSION_KEY] = drawn
+        issued = quiz.draw(pool, seed)
+    question_data = quiz.render_questions(pool, issued)
+    status = 409 if notice else 200
+    return render_template("user_test.html", questions=question_data, notice=notice), status
+
+
+@bp.route('/user/topic/<int:topic_id>/materials')
+def user_view_materials(topic_id):
+    def render():
+        db = get_db()
+        cursor = db.cursor()
+
+        cursor.execute(TOPIC_QUERY, (topic_id,))
+        topic = cursor.fetchone()
+
+        if not topic:
+            return "Тема не найдена", 404
+
+        cursor.execute(TOPIC_MATERIALS_QUERY, (topic_id,))
+        materials = cursor.fetchall()
+
+        return render_template("user_materials.html", materials=materials, topic=topic)
+
+    return pagecache.cached_page(('topic_materials', topic_id), render)
+
+
+@bp.route("/courses/<int:topic_id>/materials")
+@require_login
+def view_course_materials(topic_id):
+    def render():
+        cursor = get_db().cursor()
+
+        # Получаем тему
+        cursor.execute(TOPIC_TITLE_QUERY, (topic_id,))
+        topic = cursor.fetchone()
+        if not topic:
+            return "Курс не найден", 404
+
+        # Загружаем материалы
+        cursor.execute(COURSE_MATERIALS_QUERY, (topic_id,))
+        materials = cursor.fetchall()
+
+        return render_template("material_view.html", topic=topic, materials=materials)
+
+    response = pagecache.cached_page(('course_materials', topic_id), render)
+
+    # 📌 Обновляем/добавляем прогресс — и при 304 тоже: страницу открыли
+    if response.status_code in (200, 304):
+        progress.record_view(get_primary_db(), session.get("user_id"), topic_id)
+
+    return response
+
+
+@bp.route('/material/<int:material_id>')
+def view_material(material_id):
+    def render():
+        db = get_db()
+        cursor = db.cursor()
+
+        cursor.execute(MATERIAL_QUERY, (material_id,))
+        material = cursor.fetchone()
+
+        if not material:
+            return "Материал не найден", 404
+
+        cursor.execute(TOPIC_TITLE_QUERY, (material['topic_id'],))
+        topic_row = cursor.fetchone()
+        topic_title = topic_row['title'] if topic_row else 'Без названия'
+
+        materials = [dict(material, title=material['content'])]
+        return render_template("material_view.html", materials=materials, topic=topic_title)
+
+    return pagecache.cached_page(('material', material_id), render)
+
+
+def _load_material_file(material_id):
+    db = get_db()
+    cursor = db.cursor()
+    cursor.execute(MATERIAL_FILE_QUERY, (material_id,))
+    return cursor.fetchone()
+
+
+@bp.route('/material/<int:material_id>/file')
+@bp.route('/material/<int:material_id>/file/<version>')
+@require_login
+def material_file(material_id, version=None):
+    material = _load_material_file(material_id)
+    if not material:
+        return "Материал не найден", 404
+
+    # Ссылка на устаревшую версию файла — отправляем на актуальную
+    if version and version != material['file_sha256']:
+        return redirect(downloads.material_file_url(material))
+
+    return downloads.send_material_file(material, version)
+
+
+@bp.route('/material/<int:material_id>/preview')
+@require_login
+def material_preview(material_id):
+    material = _load_material_file(material_id)
+    if not material or not material['file_sha256'] or not previews.can_preview(material['file_path']):
+        return jsonify(status='unavailable', pages=0)
+
+    sha256 = material['file_sha256']
+    manifest = previews.status(sha256)
+    if manifest is None:
+        # Превью для файлов, загруженных до появления конвейера, строим по первому запросу
+        src_path = blobstore.full_path(blobstore.static_path(material['file_path']))
+        previews.submit(sha256, src_path)
+        manifest = previews.status(sha256) or {'status': 'pending', 'pages': 0}
+    # Текст ошибки рендера — для логов, не для сотрудников
+    return jsonify(status=manifest['status'], pages=manifest['pages'])
+
+
+@bp.route('/material/<int:material_id>/preview/<int:page>.png')
+@bp.route('/material/<int:material_id>/thumbnail.png')
+@require_login
+def material_preview_image(material_id, page=None):
+    material = _load_material_file(material_id)
+    if not material or not material['file_sha256']:
+        return "Превью не найдено", 404
+
+    sha256 = material['file_sha256']
+    path = previews.thumbnail_path(sha256) if page is None else previews.page_path(sha256, page)
+    if not path:
+        return "Превью не найдено", 404
+    return downloads.send_preview_image(path, f"{sha256}-{page or 'thumb'}")
+
+
+@bp.route('/search')
+@require_login
+@querycache.no_query_cache  # индекс целиком читает таблицы, кэшировать это незачем
+def search_page():
+    query = request.args.get('q', '').strip()
+    is_admin = session.get('role') == 'admin'
+    results = []
+    if query:
+        index = search.get_index()
+        # Сотрудникам — только материалы, вопросы тестов видит администратор
+        kinds = None if is_admin else {'material'}
+        results = index.search(query, kinds=kinds)
+    return render_template('search.html', query=query, results=results, is_admin=is_admin)